@@ -0,0 +1,399 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import resource
+import ssl
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# Kinds of hosts simulated by the stand-in server, picked from the first
+# segment of the path. Each URL of a run gets one of them in turn. Parking
+# domains are served by their own listener, answering 200 to any path like
+# real ones do, so that the random path probed by `check_parking_domain` gets
+# a 200 too.
+SCENARIOS = [
+    "fast",
+    "head405",
+    "multihop",
+    "relative",
+    "slow",
+    "reset",
+    "cloudflare",
+    "parking",
+]
+RUNNERS = ["is_reachable", "is_reachable_async", "taskpool"]
+
+BODY = b"<html><head><title>Reachable</title></head><body>Hello</body></html>"
+REASONS = {200: "OK", 301: "Moved Permanently", 302: "Found", 404: "Not Found"}
+
+
+async def _route(
+    method: str, path: str, base_url: str, slow_ttfb: float, catch_all: bool
+) -> Optional[Tuple[int, Dict[str, str]]]:
+    # Status and headers of the response, None to reset the connection
+    if catch_all is True:
+        return 200, {}
+
+    segments = path.strip("/").split("/")
+    scenario = segments[0]
+    if scenario == "head405" and method == "HEAD":
+        return 405, {}
+    elif scenario == "multihop" and len(segments) == 3 and segments[2] != "0":
+        # /multihop/<id>/<hops left>, absolute redirects. The Host header
+        # can't be used, being empty for IP addresses when `include_host` is
+        # set.
+        hops = int(segments[2]) - 1
+        return 301, {"Location": f"{base_url}/multihop/{segments[1]}/{hops}"}
+    elif scenario == "relative" and segments[-1] != "end":
+        return 302, {"Location": f"/relative/{segments[1]}/end"}
+    elif scenario == "slow":
+        await asyncio.sleep(slow_ttfb)
+        return 200, {}
+    elif scenario == "reset":
+        return None
+    elif scenario == "cloudflare":
+        return 200, {"Server": "cloudflare", "CF-RAY": "0-CDG"}
+    elif scenario in SCENARIOS:
+        return 200, {}
+    return 404, {}
+
+
+async def _handle(
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    slow_ttfb: float,
+    catch_all: bool,
+) -> None:
+    # Minimal HTTP/1.1 server with keep-alive, GET and HEAD requests have no
+    # body so only the headers are read
+    host, port = writer.get_extra_info("sockname")[:2]
+    base_url = f"http://{host}:{port}"
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            method, path, _ = head.split(b"\r\n", 1)[0].decode().split(" ", 2)
+            response = await _route(method, path, base_url, slow_ttfb, catch_all)
+            if response is None:
+                writer.transport.abort()
+                return
+
+            status, headers = response
+            lines = [f"HTTP/1.1 {status} {REASONS.get(status, 'Unknown')}"]
+            headers = {**headers, "Content-Length": str(len(BODY))}
+            lines.extend(f"{name}: {value}" for name, value in headers.items())
+            data = ("\r\n".join(lines) + "\r\n\r\n").encode()
+            writer.write(data if method == "HEAD" else data + BODY)
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+class _H2Protocol(asyncio.Protocol):
+    # Same scenarios over HTTP/2, each stream being answered by its own task
+    # so slow ones don't hold back the others of the connection. A reset
+    # scenario resets its stream only.
+    def __init__(self, slow_ttfb: float, catch_all: bool) -> None:
+        import h2.config
+        import h2.connection
+
+        self.slow_ttfb = slow_ttfb
+        self.catch_all = catch_all
+        self.conn = h2.connection.H2Connection(
+            config=h2.config.H2Configuration(client_side=False, header_encoding="utf-8")
+        )
+        self.transport: Any = None
+        self.base_url = ""
+
+    def connection_made(self, transport: Any) -> None:
+        self.transport = transport
+        host, port = transport.get_extra_info("sockname")[:2]
+        self.base_url = f"https://{host}:{port}"
+        self.conn.initiate_connection()
+        self.transport.write(self.conn.data_to_send())
+
+    def data_received(self, data: bytes) -> None:
+        import h2.events
+        import h2.exceptions
+
+        try:
+            events = self.conn.receive_data(data)
+        except h2.exceptions.ProtocolError:
+            self.transport.write(self.conn.data_to_send())
+            self.transport.close()
+            return
+
+        for event in events:
+            if isinstance(event, h2.events.RequestReceived):
+                headers = dict(event.headers)
+                asyncio.ensure_future(
+                    self._respond(event.stream_id, headers[":method"], headers[":path"])
+                )
+            elif isinstance(event, h2.events.ConnectionTerminated):
+                self.transport.close()
+        self.transport.write(self.conn.data_to_send())
+
+    async def _respond(self, stream_id: int, method: str, path: str) -> None:
+        import h2.exceptions
+
+        response = await _route(
+            method, path, self.base_url, self.slow_ttfb, self.catch_all
+        )
+        try:
+            if response is None:
+                self.conn.reset_stream(stream_id)
+            else:
+                status, headers = response
+                fields = [(":status", str(status)), ("content-length", str(len(BODY)))]
+                fields.extend((name.lower(), value) for name, value in headers.items())
+                self.conn.send_headers(stream_id, fields, end_stream=method == "HEAD")
+                if method != "HEAD":
+                    self.conn.send_data(stream_id, BODY, end_stream=True)
+        except h2.exceptions.StreamClosedError:
+            # Cancelled by the client in the meantime
+            return
+        if not self.transport.is_closing():
+            self.transport.write(self.conn.data_to_send())
+
+
+def serve(port_queue: Any, slow_ttfb: float, cert_path: Optional[str]) -> None:
+    # Listeners for the scenarios and the parking catch-all, over HTTP/1.1 or,
+    # with a certificate, HTTP/2 over TLS since httpx only negotiates HTTP/2
+    # through ALPN
+    async def run() -> None:
+        servers = []
+        for catch_all in (False, True):
+            if cert_path is None:
+                server = await asyncio.start_server(
+                    lambda r, w, c=catch_all: _handle(r, w, slow_ttfb, c),
+                    "127.0.0.1",
+                    0,
+                    backlog=4096,
+                )
+            else:
+                context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+                context.load_cert_chain(cert_path)
+                context.set_alpn_protocols(["h2"])
+                server = await asyncio.get_running_loop().create_server(
+                    lambda c=catch_all: _H2Protocol(slow_ttfb, c),
+                    "127.0.0.1",
+                    0,
+                    ssl=context,
+                    backlog=4096,
+                )
+            servers.append(server)
+
+        port_queue.put([server.sockets[0].getsockname()[1] for server in servers])
+        await asyncio.gather(*[server.serve_forever() for server in servers])
+
+    asyncio.run(run())
+
+
+def make_certificate(directory: str) -> str:
+    # Self-signed certificate for 127.0.0.1, trusted by the clients through
+    # SSL_CERT_FILE
+    path = os.path.join(directory, "cert.pem")
+    subprocess.run(
+        [
+            "openssl",
+            "req",
+            "-x509",
+            "-newkey",
+            "rsa:2048",
+            "-nodes",
+            "-days",
+            "1",
+            "-subj",
+            "/CN=127.0.0.1",
+            "-addext",
+            "subjectAltName=IP:127.0.0.1",
+            "-keyout",
+            path,
+            "-out",
+            path,
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return path
+
+
+def build_urls(base_url: str, parking_url: str, count: int) -> List[str]:
+    urls: List[str] = []
+    for i in range(count):
+        scenario = SCENARIOS[i % len(SCENARIOS)]
+        if scenario == "multihop":
+            urls.append(f"{base_url}/multihop/{i}/3")
+        elif scenario == "relative":
+            urls.append(f"{base_url}/relative/{i}/start")
+        elif scenario == "parking":
+            urls.append(f"{parking_url}/parking/{i}")
+        else:
+            urls.append(f"{base_url}/{scenario}/{i}")
+    return urls
+
+
+def run_case(
+    runner: str, concurrency: int, urls: List[str], check_parking: bool
+) -> Dict[str, Any]:
+    from reachable import is_reachable, is_reachable_async
+    from reachable.client import AsyncClient
+    from reachable.pool import TaskPool
+
+    options: Dict[str, Any] = {
+        "sleep_between_requests": False,
+        "check_parking_domain": check_parking,
+        "timings": True,
+    }
+
+    async def taskpool() -> List[Dict[str, Any]]:
+        results: List[Dict[str, Any]] = []
+        async with AsyncClient(max_connections=concurrency) as client:
+            pool = TaskPool(
+                workers=concurrency,
+                use_tqdm=False,
+                on_result=lambda key, result: results.append(result),
+            )
+            for url in urls:
+                await pool.put(is_reachable_async(url, client=client, **options))
+            await pool.join()
+        return results
+
+    start = time.perf_counter()
+    if runner == "is_reachable":
+        results: Any = is_reachable(urls, **options)
+    elif runner == "is_reachable_async":
+        results = asyncio.run(
+            is_reachable_async(
+                urls, concurrency=concurrency, max_per_host=None, **options
+            )
+        )
+    else:
+        results = asyncio.run(taskpool())
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(r["timings"]["total"] for r in results)
+    return {
+        "runner": runner,
+        "concurrency": concurrency,
+        "urls": len(results),
+        "success": sum(1 for r in results if r["success"] is True),
+        "parked": sum(1 for r in results if r.get("is_parking_domain") is True),
+        "urls_per_s": len(results) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(0.99 * (len(latencies) - 1))] * 1000,
+        # Kilobytes on Linux, bytes on macOS
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        / (1024 if sys.platform != "darwin" else 1024 * 1024),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark reachable against a local stand-in server"
+    )
+    parser.add_argument("--urls", type=int, default=2000)
+    parser.add_argument(
+        "--sync-urls",
+        type=int,
+        default=200,
+        help="URLs checked by is_reachable, which is sequential",
+    )
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--runners", nargs="+", choices=RUNNERS, default=RUNNERS)
+    parser.add_argument("--slow-ttfb", type=float, default=0.2)
+    parser.add_argument("--check-parking", action="store_true")
+    parser.add_argument(
+        "--http2",
+        action="store_true",
+        help="Serve HTTP/2 over TLS with a self-signed certificate (needs openssl)",
+    )
+    # Used internally to run a single case in a fresh process, so the peak
+    # RSS is the one of the case
+    parser.add_argument(
+        "--case", nargs=4, metavar=("RUNNER", "CONCURRENCY", "URL", "PARKING_URL")
+    )
+    args = parser.parse_args()
+
+    if args.case is not None:
+        runner, concurrency, base_url, parking_url = args.case
+        count = args.sync_urls if runner == "is_reachable" else args.urls
+        result = run_case(
+            runner,
+            int(concurrency),
+            build_urls(base_url, parking_url, count),
+            args.check_parking,
+        )
+        print(json.dumps(result))
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        cert_path: Optional[str] = None
+        env: Dict[str, str] = dict(os.environ)
+        if args.http2 is True:
+            cert_path = make_certificate(directory)
+            env["SSL_CERT_FILE"] = cert_path
+        run_benchmark(args, cert_path, env)
+
+
+def run_benchmark(
+    args: argparse.Namespace, cert_path: Optional[str], env: Dict[str, str]
+) -> None:
+    port_queue: Any = multiprocessing.Queue()
+    server = multiprocessing.Process(
+        target=serve, args=(port_queue, args.slow_ttfb, cert_path), daemon=True
+    )
+    server.start()
+    scheme = "https" if cert_path is not None else "http"
+    base_url, parking_url = [
+        f"{scheme}://127.0.0.1:{port}" for port in port_queue.get(timeout=10)
+    ]
+
+    print(
+        f"{'runner':<20}{'concurrency':>12}{'urls':>8}{'success':>9}{'parked':>8}"
+        f"{'urls/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'peak RSS MB':>13}"
+    )
+    try:
+        for runner in args.runners:
+            # Concurrency doesn't apply to the sequential sync runner
+            levels = [1] if runner == "is_reachable" else args.concurrency
+            for concurrency in levels:
+                command = [
+                    sys.executable,
+                    __file__,
+                    "--case",
+                    runner,
+                    str(concurrency),
+                    base_url,
+                    parking_url,
+                    "--urls",
+                    str(args.urls),
+                    "--sync-urls",
+                    str(args.sync_urls),
+                ]
+                if args.check_parking:
+                    command.append("--check-parking")
+                output = subprocess.run(
+                    command, check=True, capture_output=True, text=True, env=env
+                ).stdout
+                r = json.loads(output.strip().splitlines()[-1])
+                print(
+                    f"{r['runner']:<20}{r['concurrency']:>12}{r['urls']:>8}"
+                    f"{r['success']:>9}{r['parked']:>8}{r['urls_per_s']:>10.1f}"
+                    f"{r['p50_ms']:>10.1f}{r['p99_ms']:>10.1f}"
+                    f"{r['peak_rss_mb']:>13.1f}"
+                )
+    finally:
+        server.terminate()
+
+
+if __name__ == "__main__":
+    main()
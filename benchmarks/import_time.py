@@ -0,0 +1,49 @@
+import argparse
+import statistics
+import subprocess
+import sys
+from typing import List
+
+
+STATEMENTS = [
+    "import reachable",
+    "from reachable import is_reachable",
+    "from reachable.client import AsyncClient; AsyncClient()",
+]
+
+
+def measure(statement: str, runs: int) -> List[float]:
+    # Each run uses a fresh interpreter so nothing is already imported
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"{statement}; "
+        "print(time.perf_counter() - start)"
+    )
+    timings: List[float] = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", code],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        timings.append(float(output.strip().splitlines()[-1]))
+    return timings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure reachable import time")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    for statement in STATEMENTS:
+        timings = measure(statement, args.runs)
+        print(
+            f"{statement:<60} "
+            f"median={statistics.median(timings) * 1000:8.1f}ms "
+            f"min={min(timings) * 1000:8.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
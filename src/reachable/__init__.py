@@ -1,11 +1,33 @@
 import os.path as osp
+from typing import TYPE_CHECKING, Any, List
 
-from reachable.main import is_reachable, is_reachable_async
 
+if TYPE_CHECKING:
+    from reachable.main import (
+        aiter_reachable,
+        is_reachable,
+        is_reachable_async,
+        iter_reachable,
+    )
 
-__all__ = ["is_reachable", "is_reachable_async"]
+
+__all__ = ["is_reachable", "is_reachable_async", "iter_reachable", "aiter_reachable"]
 
 version_path = osp.join(osp.dirname(__file__), "VERSION.md")
 if osp.exists(version_path):
     with open(version_path, "r") as f:
         __version__ = f.readline()
+
+
+def __getattr__(name: str) -> Any:
+    # httpx, tldextract, etc. are only imported when the functions are first
+    # accessed so that `import reachable` stays fast
+    if name in __all__:
+        from reachable import main
+
+        return getattr(main, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> List[str]:
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,6 @@
+import sys
+
+from reachable.cli import main
+
+
+sys.exit(main())
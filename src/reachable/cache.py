@@ -0,0 +1,193 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from reachable.url import canonicalize_url
+
+
+class BaseCache:
+    def __init__(self, ttl: float = 6 * 3600, negative_ttl: float = 15 * 60) -> None:
+        # Results with a network error (ConnectionError, ConnectTimeout, etc.) are
+        # more likely to change, so they are kept for a shorter time
+        self.ttl: float = ttl
+        self.negative_ttl: float = negative_ttl
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        value: Optional[Dict[str, Any]] = self._get(canonicalize_url(url), time.time())
+        if value is None:
+            return None
+
+        return {**value, "original_url": url, "cached": True}
+
+    def set(self, url: str, result: Dict[str, Any]) -> None:
+        # The response object can't be serialized and is not meaningful later
+        value: Dict[str, Any] = {
+            k: v for k, v in result.items() if k not in ("response", "cached")
+        }
+        ttl: float = self.ttl if result.get("error_name") is None else self.negative_ttl
+        self._set(canonicalize_url(url), value, time.time() + ttl)
+
+    def close(self) -> None:
+        pass
+
+    def _get(self, key: str, now: float) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def _set(self, key: str, value: Dict[str, Any], expires_at: float) -> None:
+        raise NotImplementedError
+
+
+class MemoryCache(BaseCache):
+    def __init__(
+        self,
+        maxsize: int = 100000,
+        ttl: float = 6 * 3600,
+        negative_ttl: float = 15 * 60,
+    ) -> None:
+        super().__init__(ttl, negative_ttl)
+        self.maxsize: int = maxsize
+        self._data: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _get(self, key: str, now: float) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            item: Optional[Tuple[float, Dict[str, Any]]] = self._data.get(key)
+            if item is None:
+                return None
+
+            expires_at, value = item
+            if expires_at <= now:
+                del self._data[key]
+                return None
+
+            self._data.move_to_end(key)
+            return value
+
+    def _set(self, key: str, value: Dict[str, Any], expires_at: float) -> None:
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+
+            # Evict least recently used entries
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+class SQLiteCache(BaseCache):
+    def __init__(
+        self,
+        path: str,
+        ttl: float = 6 * 3600,
+        negative_ttl: float = 15 * 60,
+    ) -> None:
+        super().__init__(ttl, negative_ttl)
+        self.path: str = path
+        self._lock: threading.Lock = threading.Lock()
+        self._conn: sqlite3.Connection = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def purge(self) -> None:
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM results WHERE expires_at <= ?", (time.time(),)
+            )
+            self._conn.commit()
+
+    def _get(self, key: str, now: float) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row: Optional[Tuple[str, float]] = self._conn.execute(
+                "SELECT value, expires_at FROM results WHERE key = ?", (key,)
+            ).fetchone()
+
+        if row is None or row[1] <= now:
+            return None
+
+        value: Dict[str, Any] = json.loads(row[0])
+        return value
+
+    def _set(self, key: str, value: Dict[str, Any], expires_at: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, expires_at) "
+                "VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at),
+            )
+            self._conn.commit()
+
+
+class RedirectCache:
+    # Only permanent redirects can be reused without requesting the URL again
+    PERMANENT_STATUS_CODES = (301, 308)
+
+    def __init__(self, path: Optional[str] = None, maxsize: int = 100000) -> None:
+        self.path: Optional[str] = path
+        self.maxsize: int = maxsize
+        self._data: "OrderedDict[str, str]" = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+
+        # When a path is given, redirects are persisted across runs
+        self._conn: Optional[sqlite3.Connection] = None
+        if path is not None:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS redirects "
+                "(url TEXT PRIMARY KEY, location TEXT NOT NULL)"
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        if self._conn is not None:
+            with self._lock:
+                count: int = self._conn.execute(
+                    "SELECT COUNT(*) FROM redirects"
+                ).fetchone()[0]
+            return count
+        return len(self._data)
+
+    def get(self, url: str) -> Optional[str]:
+        with self._lock:
+            if self._conn is not None:
+                row: Optional[Tuple[str]] = self._conn.execute(
+                    "SELECT location FROM redirects WHERE url = ?", (url,)
+                ).fetchone()
+                return row[0] if row is not None else None
+
+            location: Optional[str] = self._data.get(url)
+            if location is not None:
+                self._data.move_to_end(url)
+            return location
+
+    def add(self, url: str, status_code: int, location: str) -> None:
+        if status_code not in self.PERMANENT_STATUS_CODES:
+            return
+
+        with self._lock:
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO redirects (url, location) VALUES (?, ?)",
+                    (url, location),
+                )
+                self._conn.commit()
+                return
+
+            self._data[url] = location
+            self._data.move_to_end(url)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
@@ -0,0 +1,135 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import IO, Any, Dict, Iterable, Iterator, Optional, Tuple
+
+
+class Checkpoint:
+    # Appends results to a JSONL file as they complete so a run can be resumed
+    # after a crash. The URLs done are kept in a SQLite index next to it
+    # (`<path>.idx`) so resuming doesn't need to read the results back.
+    #
+    # Results are buffered and written to disk every `sync_every` results or
+    # `sync_interval` seconds. The JSONL file is synced before the index, so
+    # the index never has a URL whose result could be lost. Results written
+    # but not indexed yet when the process died are indexed on the next open.
+    def __init__(
+        self, path: str, sync_every: int = 1000, sync_interval: float = 5
+    ) -> None:
+        self.path: str = path
+        self.index_path: str = f"{path}.idx"
+        self.sync_every: int = sync_every
+        self.sync_interval: float = sync_interval
+
+        self._lock: threading.Lock = threading.Lock()
+        self._pending: int = 0
+        self._last_sync: float = time.monotonic()
+
+        self._conn: sqlite3.Connection = sqlite3.connect(
+            self.index_path, check_same_thread=False
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS done (url TEXT PRIMARY KEY)")
+        # Size of the JSONL file covered by the index
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)"
+        )
+        self._conn.commit()
+
+        self._file: IO[bytes] = open(path, "ab")
+        self._recover()
+
+    def __contains__(self, url: str) -> bool:
+        with self._lock:
+            row: Optional[Tuple[int]] = self._conn.execute(
+                "SELECT 1 FROM done WHERE url = ?", (url,)
+            ).fetchone()
+        return row is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            count: int = self._conn.execute("SELECT COUNT(*) FROM done").fetchone()[0]
+        return count
+
+    def __enter__(self) -> "Checkpoint":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
+
+    def filter(self, urls: Iterable[str]) -> Iterator[str]:
+        # Lazily skips the URLs already done
+        for url in urls:
+            if url not in self:
+                yield url
+
+    def add(self, result: Dict[str, Any]) -> None:
+        # The response object can't be serialized
+        value: Dict[str, Any] = {k: v for k, v in result.items() if k != "response"}
+        line: bytes = (json.dumps(value, default=str) + "\n").encode("utf-8")
+
+        with self._lock:
+            self._file.write(line)
+            self._conn.execute(
+                "INSERT OR IGNORE INTO done (url) VALUES (?)", (result["original_url"],)
+            )
+            self._pending += 1
+
+            if (
+                self._pending >= self.sync_every
+                or time.monotonic() - self._last_sync >= self.sync_interval
+            ):
+                self._sync()
+
+    def sync(self) -> None:
+        with self._lock:
+            self._sync()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file.closed:
+                return
+            self._sync()
+            self._file.close()
+            self._conn.close()
+
+    def _sync(self) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('offset', ?)",
+            (self._file.tell(),),
+        )
+        self._conn.commit()
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def _recover(self) -> None:
+        row: Optional[Tuple[int]] = self._conn.execute(
+            "SELECT value FROM meta WHERE key = 'offset'"
+        ).fetchone()
+        offset: int = row[0] if row is not None else 0
+        size: int = os.path.getsize(self.path)
+        if size < offset:
+            raise ValueError(f"{self.path} is shorter than what its index covers")
+        if size == offset:
+            return
+
+        # Only the results written after the last sync are read
+        end: int = offset
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                # A partial line is the last result being written
+                if not line.endswith(b"\n"):
+                    break
+                end += len(line)
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO done (url) VALUES (?)",
+                    (json.loads(line)["original_url"],),
+                )
+
+        self._file.truncate(end)
+        self._file.seek(end)
+        self._sync()
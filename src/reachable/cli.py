@@ -0,0 +1,227 @@
+import argparse
+import asyncio
+import contextlib
+import gzip
+import io
+import json
+import os
+import sys
+import threading
+from typing import IO, Any, AsyncIterator, Iterator, List, Optional, Union
+
+
+GZIP_MAGIC: bytes = b"\x1f\x8b"
+ZSTD_MAGIC: bytes = b"\x28\xb5\x2f\xfd"
+# Put on the queue of `aread_urls` once the input is exhausted
+_END: Any = object()
+
+
+def open_input(path: str) -> IO[str]:
+    # "-" reads stdin. Compression is detected from the first bytes rather
+    # than the extension so compressed data can be piped too.
+    raw: Any = sys.stdin.buffer if path == "-" else open(path, "rb")
+    if not hasattr(raw, "peek"):
+        raw = io.BufferedReader(raw)
+
+    magic: bytes = raw.peek(4)[:4]
+    if magic.startswith(GZIP_MAGIC):
+        raw = gzip.GzipFile(fileobj=raw)
+    elif magic == ZSTD_MAGIC:
+        import zstandard
+
+        raw = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+
+    return io.TextIOWrapper(raw, encoding="utf-8", errors="replace")
+
+
+def read_urls(paths: List[str]) -> Iterator[str]:
+    # Lazily yields the URLs of each file, one per line, skipping empty ones
+    for path in paths:
+        with open_input(path) as f:
+            for line in f:
+                url: str = line.strip()
+                if url != "":
+                    yield url
+
+
+async def aread_urls(paths: List[str], buffer_size: int = 1000) -> AsyncIterator[str]:
+    # Reading stdin or a file blocks, so lines are read by a thread and handed
+    # to the event loop one by one as soon as they are read, whether they come
+    # from a large file or a slow pipe. At most `buffer_size` of them wait to
+    # be consumed.
+    loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+    lines: "asyncio.Queue[Union[str, BaseException]]" = asyncio.Queue()
+    free: threading.Semaphore = threading.Semaphore(buffer_size)
+    stop: threading.Event = threading.Event()
+
+    def read() -> None:
+        item: Any = _END
+        try:
+            with contextlib.closing(read_urls(paths)) as urls:
+                for url in urls:
+                    free.acquire()
+                    if stop.is_set():
+                        return
+                    loop.call_soon_threadsafe(lines.put_nowait, url)
+        except BaseException as e:
+            item = e
+        try:
+            loop.call_soon_threadsafe(lines.put_nowait, item)
+        except RuntimeError:
+            # The loop is closed, nobody is reading anymore
+            pass
+
+    # A daemon thread since a read of stdin can't be interrupted
+    threading.Thread(target=read, daemon=True).start()
+    try:
+        while True:
+            item: Union[str, BaseException] = await lines.get()
+            if item is _END:
+                break
+            elif isinstance(item, BaseException):
+                raise item
+            free.release()
+            yield item
+    finally:
+        stop.set()
+        free.release()
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="reachable",
+        description=(
+            "Check if URLs are reachable. URLs are read one per line and a "
+            "JSON line is written for each result, in completion order."
+        ),
+    )
+    parser.add_argument(
+        "inputs",
+        nargs="*",
+        default=["-"],
+        help="Files of URLs, plain, gzip or zstd compressed. Defaults to stdin.",
+    )
+    parser.add_argument(
+        "-o", "--output", default="-", help="Output file, defaults to stdout"
+    )
+    parser.add_argument(
+        "-c",
+        "--concurrency",
+        type=int,
+        default=20,
+        help="Maximum number of URLs checked at the same time",
+    )
+    parser.add_argument(
+        "--max-per-host",
+        type=int,
+        default=1,
+        help="Maximum number of URLs of the same host checked at the same time, 0 for no limit",
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=10, help="Timeout of each request in seconds"
+    )
+    parser.add_argument(
+        "--max-connections",
+        type=int,
+        default=100,
+        help="Maximum number of open connections",
+    )
+    parser.add_argument(
+        "--no-sleep",
+        action="store_true",
+        help="Don't wait between requests to the same host",
+    )
+    parser.add_argument(
+        "--no-head",
+        action="store_true",
+        help="Use GET requests instead of trying HEAD first",
+    )
+    parser.add_argument("--ssl-fallback-to-http", action="store_true")
+    parser.add_argument("--check-parking-domain", action="store_true")
+    parser.add_argument(
+        "--timings", action="store_true", help="Add the timings of each URL"
+    )
+    parser.add_argument(
+        "--checkpoint",
+        help=(
+            "Append results to this JSONL file, URLs already in it are "
+            "skipped so an interrupted run can be resumed. Results are also "
+            "written to stdout."
+        ),
+    )
+    return parser
+
+
+async def run(args: argparse.Namespace, output: IO[str]) -> None:
+    from reachable.checkpoint import Checkpoint
+    from reachable.client import AsyncClient
+    from reachable.main import aiter_reachable
+
+    client: AsyncClient = AsyncClient(
+        include_host=True,
+        ssl_fallback_to_http=args.ssl_fallback_to_http,
+        timeout=args.timeout,
+        max_connections=args.max_connections,
+    )
+    checkpoint: Optional[Checkpoint] = None
+    if args.checkpoint is not None:
+        checkpoint = Checkpoint(args.checkpoint)
+
+    # Not `async with client`, which would swallow the exceptions raised while
+    # reading the input
+    await client.open()
+    try:
+        async for result in aiter_reachable(
+            aread_urls(args.inputs),
+            client=client,
+            sleep_between_requests=not args.no_sleep,
+            head_optim=not args.no_head,
+            check_parking_domain=args.check_parking_domain,
+            concurrency=args.concurrency,
+            max_per_host=args.max_per_host if args.max_per_host > 0 else None,
+            timings=args.timings,
+            checkpoint=checkpoint,
+        ):
+            output.write(json.dumps(result, default=str) + "\n")
+            # Each result is visible as soon as it is available, even piped
+            output.flush()
+    finally:
+        await client.close()
+        if checkpoint is not None:
+            checkpoint.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser: argparse.ArgumentParser = get_parser()
+    args: argparse.Namespace = parser.parse_args(argv)
+    for path in args.inputs:
+        if path != "-" and not os.access(path, os.R_OK):
+            parser.error(f"can't read input file {path}")
+
+    # The checkpoint file already holds the results of all the runs, a separate
+    # output could hold results the checkpoint lost in a crash, written again
+    # when resuming
+    if args.checkpoint is not None and args.output != "-":
+        parser.error(
+            "-o/--output can't be used with --checkpoint, results are "
+            "written to the checkpoint file"
+        )
+
+    output: IO[str] = (
+        sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    )
+    try:
+        asyncio.run(run(args, output))
+    except KeyboardInterrupt:
+        return 130
+    except BrokenPipeError:
+        # The reader went away (e.g. piped to `head`), stdout is redirected so
+        # flushing it at exit doesn't fail again
+        devnull: int = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 1
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    return 0
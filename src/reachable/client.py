@@ -1,14 +1,39 @@
+import functools
 import ssl
-from typing import Any, AsyncContextManager, ContextManager, Dict, Optional, Tuple
+from typing import (
+    Any,
+    AsyncContextManager,
+    ContextManager,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
 from urllib.parse import urlparse, urlunparse
 
 import httpx
-import tldextract
-from fake_useragent import UserAgent
 from typing_extensions import Self
 
+from reachable.dns import DNSResolver, install_resolver
+from reachable.domain import get_fqdn
+from reachable.proxy import AsyncProxyPoolTransport, ProxyPool, ProxyPoolTransport
+from reachable.timing import start_request
 
-ua: Any = UserAgent(browsers=["chrome"], os="windows", platforms="pc", min_version=120)
+
+@functools.lru_cache(maxsize=None)
+def get_user_agent() -> Any:
+    # Loading and filtering the user agents dataset is slow, so it is only
+    # done when the first client is created
+    from fake_useragent import UserAgent
+
+    return UserAgent(browsers=["chrome"], os="windows", platforms="pc", min_version=120)
+
+
+def __getattr__(name: str) -> Any:
+    # Backward compatibility with the former module level `ua`
+    if name == "ua":
+        return get_user_agent()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class BaseClient:
@@ -18,10 +43,24 @@ class BaseClient:
         include_host: bool = False,
         ssl_fallback_to_http: bool = False,
         ensure_protocol_url: bool = False,
+        timeout: float = 10,
+        http2: bool = True,
+        max_connections: Optional[int] = 100,
+        max_keepalive_connections: Optional[int] = 20,
+        keepalive_expiry: Optional[float] = 5,
     ) -> None:
-        self.timeout: int = 10
+        self.timeout: float = timeout
+        # With HTTP/2 a single connection to a host carries all the concurrent
+        # requests to it, so `max_connections` bounds the number of hosts
+        # rather than the number of requests. `None` means no limit.
+        self.http2: bool = http2
+        self.limits: httpx.Limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
         self.headers = {
-            "User-Agent": ua.random,
+            "User-Agent": get_user_agent().random,
             "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8",
             "Accept-Language": "en-US;q=0.7,en;q=0.3",
             "Accept-Encoding": "gzip, deflate, br, zstd",
@@ -49,9 +88,9 @@ class BaseClient:
         if include_host is True and headers is None:
             # TLDExtract has better subdomain/domain separation
             # compared to urllib's urlparse
-            headers = {"Host": tldextract.extract(url).fqdn}
+            headers = {"Host": get_fqdn(url)}
         elif include_host is True and headers is not None and "Host" not in headers:
-            headers["Host"] = tldextract.extract(url).fqdn
+            headers["Host"] = get_fqdn(url)
 
         if self.ensure_protocol_url is True:
             parsed_url = urlparse(url)
@@ -63,6 +102,15 @@ class BaseClient:
 
         return url, headers, ssl_fallback_to_http
 
+    def _trace(self, method: str, url: str) -> Dict[str, Any]:
+        # Traces the request when timings are being collected
+        timer: Any = start_request(method, url)
+        return {} if timer is None else {"extensions": {"trace": timer}}
+
+    def _atrace(self, method: str, url: str) -> Dict[str, Any]:
+        timer: Any = start_request(method, url)
+        return {} if timer is None else {"extensions": {"trace": timer.atrace}}
+
 
 class Client(BaseClient):
     _type: str = "classic"
@@ -74,17 +122,39 @@ class Client(BaseClient):
         ssl_fallback_to_http: bool = False,
         ensure_protocol_url: bool = False,
         proxy_url: Optional[str] = None,
+        timeout: float = 10,
+        http2: bool = True,
+        max_connections: Optional[int] = 100,
+        max_keepalive_connections: Optional[int] = 20,
+        keepalive_expiry: Optional[float] = 5,
+        proxy_pool: Optional[ProxyPool] = None,
     ) -> None:
         super().__init__(
-            headers, include_host, ssl_fallback_to_http, ensure_protocol_url
+            headers,
+            include_host,
+            ssl_fallback_to_http,
+            ensure_protocol_url,
+            timeout,
+            http2,
+            max_connections,
+            max_keepalive_connections,
+            keepalive_expiry,
         )
-        transport: httpx.HTTPTransport = httpx.HTTPTransport(retries=2, proxy=proxy_url)
+        self.transport: httpx.BaseTransport
+        if proxy_pool is not None:
+            self.transport = ProxyPoolTransport(
+                proxy_pool, retries=2, http2=self.http2, limits=self.limits
+            )
+        else:
+            self.transport = httpx.HTTPTransport(
+                retries=2, proxy=proxy_url, http2=self.http2, limits=self.limits
+            )
 
         self.client: httpx.Client = httpx.Client(
-            transport=transport,
+            transport=self.transport,
             timeout=self.timeout,
             headers=self.headers,
-            http2=True,
+            http2=self.http2,
         )
 
     def request(
@@ -103,7 +173,13 @@ class Client(BaseClient):
         )
 
         try:
-            resp = self.client.request(method, url, headers=headers, content=content)
+            resp = self.client.request(
+                method,
+                url,
+                headers=headers,
+                content=content,
+                **self._trace(method, url),
+            )
         except ssl.SSLError as e:
             if ssl_fallback_to_http is True:
                 resp = self.client.request(
@@ -111,6 +187,7 @@ class Client(BaseClient):
                     url.lower().replace("https://", "http://"),
                     headers=headers,
                     content=content,
+                    **self._trace(method, url.lower().replace("https://", "http://")),
                 )
             else:
                 raise e
@@ -181,7 +258,13 @@ class Client(BaseClient):
         )
 
         try:
-            return self.client.stream(method, url, headers=headers, content=content)
+            return self.client.stream(
+                method,
+                url,
+                headers=headers,
+                content=content,
+                **self._trace(method, url),
+            )
         except ssl.SSLError as e:
             if ssl_fallback_to_http is True:
                 return self.client.stream(
@@ -189,6 +272,7 @@ class Client(BaseClient):
                     url.lower().replace("https://", "http://"),
                     headers=headers,
                     content=content,
+                    **self._trace(method, url.lower().replace("https://", "http://")),
                 )
             else:
                 raise e
@@ -204,6 +288,9 @@ class Client(BaseClient):
     def close(self) -> None:
         self.client.close()
 
+    def pool_stats(self) -> Dict[str, int]:
+        return _pool_stats(self.transport)
+
 
 class AsyncClient(BaseClient):
     _type: str = "classic"
@@ -215,25 +302,57 @@ class AsyncClient(BaseClient):
         ssl_fallback_to_http: bool = False,
         ensure_protocol_url: bool = False,
         proxy_url: Optional[str] = None,
+        resolver: Optional[DNSResolver] = None,
+        timeout: float = 10,
+        http2: bool = True,
+        max_connections: Optional[int] = 100,
+        max_keepalive_connections: Optional[int] = 20,
+        keepalive_expiry: Optional[float] = 5,
+        proxy_pool: Optional[ProxyPool] = None,
     ) -> None:
         super().__init__(
-            headers, include_host, ssl_fallback_to_http, ensure_protocol_url
-        )
-        self.transport: httpx.AsyncHTTPTransport = httpx.AsyncHTTPTransport(
-            retries=2, proxy=proxy_url
+            headers,
+            include_host,
+            ssl_fallback_to_http,
+            ensure_protocol_url,
+            timeout,
+            http2,
+            max_connections,
+            max_keepalive_connections,
+            keepalive_expiry,
         )
+        # With a proxy pool, each proxy has its own transport and the limits
+        # apply to each of them
+        self.transport: httpx.AsyncBaseTransport
+        if proxy_pool is not None:
+            self.transport = AsyncProxyPoolTransport(
+                proxy_pool, retries=2, http2=self.http2, limits=self.limits
+            )
+        else:
+            self.transport = httpx.AsyncHTTPTransport(
+                retries=2, proxy=proxy_url, http2=self.http2, limits=self.limits
+            )
+
+        # Reuse the addresses resolved ahead of time instead of resolving
+        # them again when connecting
+        self.resolver: Optional[DNSResolver] = resolver
+        if resolver is not None:
+            install_resolver(self.transport, resolver)
 
     async def open(self) -> None:
         self.client: httpx.AsyncClient = httpx.AsyncClient(
             transport=self.transport,
             timeout=self.timeout,
             headers=self.headers,
-            http2=True,
+            http2=self.http2,
         )
 
     async def close(self) -> None:
         await self.client.aclose()
 
+    def pool_stats(self) -> Dict[str, int]:
+        return _pool_stats(self.transport)
+
     async def __aenter__(self) -> Self:
         await self.open()
         return self
@@ -261,7 +380,11 @@ class AsyncClient(BaseClient):
 
         try:
             resp = await self.client.request(
-                method, url, headers=headers, content=content
+                method,
+                url,
+                headers=headers,
+                content=content,
+                **self._atrace(method, url),
             )
         except ssl.SSLError as e:
             if ssl_fallback_to_http is True:
@@ -270,6 +393,7 @@ class AsyncClient(BaseClient):
                     url.lower().replace("https://", "http://"),
                     headers=headers,
                     content=content,
+                    **self._atrace(method, url.lower().replace("https://", "http://")),
                 )
             else:
                 raise e
@@ -292,7 +416,10 @@ class AsyncClient(BaseClient):
                     url.lower().replace("https://", "http://"),
                     headers=headers,
                     content=content,
+                    **self._atrace(method, url.lower().replace("https://", "http://")),
                 )
+            else:
+                raise exc
 
         return resp
 
@@ -353,7 +480,13 @@ class AsyncClient(BaseClient):
         )
 
         try:
-            return self.client.stream(method, url, headers=headers, content=content)
+            return self.client.stream(
+                method,
+                url,
+                headers=headers,
+                content=content,
+                **self._atrace(method, url),
+            )
         except ssl.SSLError as e:
             if ssl_fallback_to_http is True:
                 return self.client.stream(
@@ -361,6 +494,7 @@ class AsyncClient(BaseClient):
                     url.lower().replace("https://", "http://"),
                     headers=headers,
                     content=content,
+                    **self._atrace(method, url.lower().replace("https://", "http://")),
                 )
             else:
                 raise e
@@ -372,3 +506,27 @@ class AsyncClient(BaseClient):
             # the timeout is coming from.
             # So we just retry
             pass
+
+
+def _pool_stats(transport: Any) -> Dict[str, int]:
+    # Current state of the connection pool of an httpx transport. httpx doesn't
+    # expose it, so it is read from the underlying httpcore pool.
+    if hasattr(transport, "transports"):
+        # Proxy pool, summed over the transports of the proxies
+        stats: Dict[str, int] = {}
+        for sub_transport in transport.transports.values():
+            for key, value in _pool_stats(sub_transport).items():
+                stats[key] = stats.get(key, 0) + value
+        return stats
+
+    pool: Any = getattr(transport, "_pool", None)
+    connections: List[Any] = list(getattr(pool, "connections", []))
+    idle: int = sum(1 for conn in connections if conn.is_idle())
+    return {
+        "open": len(connections),
+        "idle": idle,
+        "in_use": len(connections) - idle,
+        "http2": sum(1 for conn in connections if "HTTP/2" in conn.info()),
+        # Requests waiting for a connection to be available
+        "waiting": sum(1 for req in getattr(pool, "_requests", []) if req.is_queued()),
+    }
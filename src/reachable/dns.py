@@ -0,0 +1,215 @@
+import asyncio
+import ipaddress
+import socket
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import httpcore
+
+
+# getaddrinfo errors meaning the domain doesn't exist, others (like EAI_AGAIN)
+# are temporary and should not be cached
+_NOT_FOUND_ERRORS = {
+    getattr(socket, name)
+    for name in ("EAI_NONAME", "EAI_NODATA", "EAI_ADDRFAMILY")
+    if hasattr(socket, name)
+}
+
+
+class DNSResolver:
+    def __init__(
+        self,
+        ttl: float = 300,
+        negative_ttl: float = 60,
+        max_concurrency: int = 100,
+        maxsize: int = 100000,
+    ) -> None:
+        self.ttl: float = ttl
+        self.negative_ttl: float = negative_ttl
+        self.max_concurrency: int = max_concurrency
+        self.maxsize: int = maxsize
+
+        # Host -> (expiration time, addresses). Addresses are None when the
+        # domain doesn't exist.
+        self._cache: "OrderedDict[str, Tuple[float, Optional[List[str]]]]" = (
+            OrderedDict()
+        )
+        # Concurrent lookups of the same host share the same future
+        self._pending: Dict[str, "asyncio.Future[Optional[List[str]]]"] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def get(self, host: str) -> Tuple[bool, Optional[List[str]]]:
+        # Only look in the cache, the first value tells if the host was found
+        item: Optional[Tuple[float, Optional[List[str]]]] = self._cache.get(host)
+        if item is None:
+            return False, None
+
+        expires_at, addresses = item
+        if expires_at <= time.monotonic():
+            del self._cache[host]
+            return False, None
+
+        self._cache.move_to_end(host)
+        return True, addresses
+
+    async def resolve(self, host: str) -> Optional[List[str]]:
+        # Returns the addresses of the host, None if the domain doesn't exist
+        # and an empty list if it could not be resolved for another reason.
+        host = host.lower()
+        if host == "":
+            return []
+        elif _is_ip_address(host):
+            return [host]
+
+        found, addresses = self.get(host)
+        if found is True:
+            return addresses
+
+        if host in self._pending:
+            return await asyncio.shield(self._pending[host])
+
+        future: "asyncio.Future[Optional[List[str]]]" = (
+            asyncio.get_running_loop().create_future()
+        )
+        self._pending[host] = future
+        try:
+            addresses = await self._resolve(host)
+            future.set_result(addresses)
+        except BaseException as e:
+            future.set_exception(e)
+            # Nobody else may be waiting for this future
+            future.exception()
+            raise
+        finally:
+            del self._pending[host]
+
+        return addresses
+
+    async def resolve_many(
+        self, hosts: Iterable[str]
+    ) -> Dict[str, Optional[List[str]]]:
+        unique_hosts: List[str] = list({host.lower() for host in hosts})
+        results: List[Optional[List[str]]] = await asyncio.gather(
+            *[self.resolve(host) for host in unique_hosts]
+        )
+        return dict(zip(unique_hosts, results))
+
+    async def _resolve(self, host: str) -> Optional[List[str]]:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async with self._semaphore:
+            try:
+                infos: List[Any] = await self._getaddrinfo(host)
+            except socket.gaierror as e:
+                if e.errno in _NOT_FOUND_ERRORS:
+                    self._set(host, None, self.negative_ttl)
+                    return None
+                return []
+            except OSError:
+                return []
+
+        addresses: List[str] = []
+        for info in infos:
+            address: str = info[4][0]
+            if address not in addresses:
+                addresses.append(address)
+
+        self._set(host, addresses, self.ttl)
+        return addresses
+
+    async def _getaddrinfo(self, host: str) -> List[Any]:
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        return await loop.getaddrinfo(host, None, type=socket.SOCK_STREAM)
+
+    def _set(self, host: str, addresses: Optional[List[str]], ttl: float) -> None:
+        self._cache[host] = (time.monotonic() + ttl, addresses)
+        self._cache.move_to_end(host)
+        while len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+
+class ResolvingBackend(httpcore.AsyncNetworkBackend):
+    # Network backend connecting to the addresses found by a `DNSResolver`.
+    # TLS still uses the original host name for SNI and certificate checks
+    # since httpcore takes it from the request, not from the socket.
+    def __init__(
+        self, backend: httpcore.AsyncNetworkBackend, resolver: DNSResolver
+    ) -> None:
+        self.backend: httpcore.AsyncNetworkBackend = backend
+        self.resolver: DNSResolver = resolver
+
+    async def connect_tcp(
+        self,
+        host: str,
+        port: int,
+        timeout: Optional[float] = None,
+        local_address: Optional[str] = None,
+        socket_options: Optional[Iterable[Any]] = None,
+    ) -> httpcore.AsyncNetworkStream:
+        addresses: Optional[List[str]] = await self.resolver.resolve(host)
+        if addresses is None:
+            raise httpcore.ConnectError(f"Domain {host} does not exist")
+        elif len(addresses) == 0:
+            # Let the default backend resolve it
+            addresses = [host]
+
+        # The timeout is for the whole connection, so it is split between the
+        # addresses left rather than given to each of them
+        deadline: Optional[float] = (
+            time.monotonic() + timeout if timeout is not None else None
+        )
+        error: Optional[Exception] = None
+        for i, address in enumerate(addresses):
+            attempt_timeout: Optional[float] = None
+            if deadline is not None:
+                attempt_timeout = max(0, deadline - time.monotonic()) / (
+                    len(addresses) - i
+                )
+            try:
+                return await self.backend.connect_tcp(
+                    address,
+                    port,
+                    timeout=attempt_timeout,
+                    local_address=local_address,
+                    socket_options=socket_options,
+                )
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                error = e
+
+        assert error is not None
+        raise error
+
+    async def connect_unix_socket(
+        self,
+        path: str,
+        timeout: Optional[float] = None,
+        socket_options: Optional[Iterable[Any]] = None,
+    ) -> httpcore.AsyncNetworkStream:
+        return await self.backend.connect_unix_socket(
+            path, timeout=timeout, socket_options=socket_options
+        )
+
+    async def sleep(self, seconds: float) -> None:
+        await self.backend.sleep(seconds)
+
+
+def install_resolver(transport: Any, resolver: DNSResolver) -> None:
+    # httpx doesn't expose a way to change how host names are resolved, so we
+    # wrap the network backend of its connection pool. Proxy pool transports
+    # have one transport per proxy.
+    for sub_transport in getattr(transport, "transports", {}).values():
+        install_resolver(sub_transport, resolver)
+
+    pool: Any = getattr(transport, "_pool", None)
+    if pool is not None and hasattr(pool, "_network_backend"):
+        pool._network_backend = ResolvingBackend(pool._network_backend, resolver)
+
+
+def _is_ip_address(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host.strip("[]"))
+    except ValueError:
+        return False
+    return True
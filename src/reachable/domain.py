@@ -0,0 +1,55 @@
+import functools
+from typing import Any, Iterable, List
+
+
+# Characters allowed in a URL scheme (RFC 3986)
+_SCHEME_CHARS = frozenset(
+    "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789+-."
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_extractor() -> Any:
+    # Imported here since loading tldextract is slow and only needed when
+    # parsing the first host
+    import tldextract
+
+    # Only use the public suffix list snapshot shipped with tldextract, so
+    # nothing is downloaded or written on disk at first use
+    return tldextract.TLDExtract(suffix_list_urls=(), cache_dir=None)
+
+
+@functools.lru_cache(maxsize=100000)
+def _extract_netloc(netloc: str) -> Any:
+    return _get_extractor()(netloc)
+
+
+def extract(url: str) -> Any:
+    # Many URLs share the same host, so results are cached by netloc instead
+    # of by URL
+    return _extract_netloc(get_netloc(url))
+
+
+def extract_many(urls: Iterable[str]) -> List[Any]:
+    return [extract(url) for url in urls]
+
+
+def get_fqdn(url: str) -> str:
+    fqdn: str = extract(url).fqdn
+    return fqdn
+
+
+def get_netloc(url: str) -> str:
+    # Same splitting as tldextract, which also accepts URLs without scheme
+    url = url.strip()
+    double_slashes: int = url.find("//")
+    if double_slashes == 0:
+        url = url[2:]
+    elif (
+        double_slashes > 1
+        and url[double_slashes - 1] == ":"
+        and set(url[: double_slashes - 1]) <= _SCHEME_CHARS
+    ):
+        url = url[double_slashes + 2 :]
+
+    return url.partition("/")[0].partition("?")[0].partition("#")[0]
@@ -0,0 +1,100 @@
+import asyncio
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+from typing_extensions import Self
+
+from reachable.client import AsyncClient
+from reachable.dns import DNSResolver
+
+
+if TYPE_CHECKING:
+    from reachable.playwright_client import AsyncPlaywrightClient
+
+
+class HybridClient:
+    # URLs are first checked with the HTTP client, and only the ones that look
+    # blocked or rendered by JavaScript are checked again with a browser,
+    # which is much slower. Each result tells which tier answered it.
+    _type: str = "hybrid"
+
+    def __init__(
+        self,
+        headers: Optional[Dict[str, str]] = None,
+        include_host: bool = False,
+        ssl_fallback_to_http: bool = False,
+        resolver: Optional[DNSResolver] = None,
+        headless: bool = True,
+        executable_path: Optional[str] = None,
+        proxy_url: Optional[str] = None,
+        browser_pool_size: int = 2,
+        escalate_status_codes: Tuple[int, ...] = (403, 503),
+        escalate_errors: Tuple[str, ...] = ("ReadError",),
+        http_client: Optional[AsyncClient] = None,
+        browser_client: Optional["AsyncPlaywrightClient"] = None,
+    ) -> None:
+        self.http: AsyncClient = http_client or AsyncClient(
+            headers=headers,
+            include_host=include_host,
+            ssl_fallback_to_http=ssl_fallback_to_http,
+            proxy_url=proxy_url,
+            resolver=resolver,
+        )
+        self.escalate_status_codes: Tuple[int, ...] = escalate_status_codes
+        self.escalate_errors: Tuple[str, ...] = escalate_errors
+
+        # The browser is only launched when the first URL needs it
+        self.browser: Optional["AsyncPlaywrightClient"] = browser_client
+        self._browser_options: Dict[str, Any] = {
+            "headless": headless,
+            "ssl_fallback_to_http": ssl_fallback_to_http,
+            "executable_path": executable_path,
+            "proxy_url": proxy_url,
+            "pool_size": browser_pool_size,
+        }
+        self._browser_opened: bool = False
+        self._browser_lock: Optional[asyncio.Lock] = None
+
+    async def open(self) -> None:
+        await self.http.open()
+
+    async def close(self) -> None:
+        await self.http.close()
+        if self._browser_opened is True and self.browser is not None:
+            await self.browser.close()
+            self._browser_opened = False
+
+    async def __aenter__(self) -> Self:
+        await self.open()
+        return self
+
+    async def __aexit__(self, *args: Any) -> Self:
+        await self.close()
+        return self
+
+    def needs_browser(self, result: Dict[str, Any]) -> bool:
+        return (
+            result["cloudflare_protection"] is True
+            or result["has_js_redirect"] is True
+            or result["status_code"] in self.escalate_status_codes
+            or result["error_name"] in self.escalate_errors
+        )
+
+    async def get_browser(self) -> "AsyncPlaywrightClient":
+        if self.browser is not None:
+            return self.browser
+
+        if self._browser_lock is None:
+            self._browser_lock = asyncio.Lock()
+
+        async with self._browser_lock:
+            if self.browser is None:
+                from reachable.playwright_client import AsyncPlaywrightClient
+
+                browser: AsyncPlaywrightClient = AsyncPlaywrightClient(
+                    **self._browser_options
+                )
+                await browser.open()
+                self.browser = browser
+                self._browser_opened = True
+
+        return self.browser
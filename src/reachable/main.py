@@ -1,19 +1,39 @@
 import asyncio
+import contextlib
 import hashlib
 import os
-import random
 import ssl
 import time
-from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Union
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 from urllib.parse import urlparse, urlunparse
 
 import httpx
-import tldextract
-from tqdm import tqdm
 
+from reachable.cache import BaseCache, RedirectCache
+from reachable.checkpoint import Checkpoint
 from reachable.client import AsyncClient, Client
+from reachable.dns import DNSResolver
+from reachable.domain import extract
+from reachable.result import ReachabilityResult, Result
+from reachable.scheduler import HostScheduler, default_scheduler, get_host
+from reachable.timing import add_dns, collect_timings
+from reachable.url import dedupe_urls
 
 if TYPE_CHECKING:
+    from reachable.hybrid_client import HybridClient
     from reachable.playwright_client import AsyncPlaywrightClient
 
 
@@ -27,7 +47,15 @@ def is_reachable(
     client: Optional[Client] = None,
     ssl_fallback_to_http: bool = False,
     check_parking_domain: bool = False,
-) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+    scheduler: Optional[HostScheduler] = None,
+    max_body_size: Optional[int] = None,
+    cache: Optional[BaseCache] = None,
+    redirect_cache: Optional[RedirectCache] = None,
+    timings: bool = False,
+    compact: bool = False,
+) -> Union[Result, List[Result]]:
+    # With `compact`, results are `ReachabilityResult` objects rather than
+    # dicts, which take much less memory for large batches
     return_as_list: bool = True
     url_list: List[str] = []
 
@@ -49,75 +77,34 @@ def is_reachable(
     else:
         close_client = False
 
-    # Only keep unique URLs to avoid requesting same URL multiple times
-    url_list = list(set(url_list))
+    # Equivalent URLs are only requested once, each input then gets the result
+    # in input order
+    input_urls: List[str] = url_list
+    indexes: List[int]
+    url_list, indexes = dedupe_urls(url_list)
 
-    results: List[Dict[str, Any]] = []
-    iterator: Union[List[str], tqdm] = url_list
+    check_options: Dict[str, Any] = _check_options(
+        sleep_between_requests=sleep_between_requests,
+        head_optim=head_optim,
+        include_response=include_response,
+        check_parking_domain=check_parking_domain,
+        scheduler=scheduler,
+        max_body_size=max_body_size,
+        cache=cache,
+        redirect_cache=redirect_cache,
+        timings=timings,
+    )
+
+    results: List[Result] = []
+    iterator: Iterable[str] = url_list
     if return_as_list is True:
+        # Imported here since it is only needed for lists and slow to import
+        from tqdm import tqdm
+
         iterator = tqdm(url_list)
 
     for elt in iterator:
-        resp: Optional[httpx.Response] = None
-        to_return: Dict[str, Any] = {
-            "original_url": elt,
-            "status_code": -1,
-            "success": False,
-            "error_name": None,
-            "cloudflare_protection": False,
-            "has_js_redirect": False,
-        }
-
-        resp, to_return["error_name"] = do_request(
-            client,
-            elt,
-            head_optim=head_optim,
-            sleep_between_requests=sleep_between_requests,
-        )
-
-        # Then we handle redirects
-        if resp is not None and 400 > resp.status_code >= 300:
-            to_return["error_name"] = None
-            to_return["redirect"], resp, to_return["error_name"] = handle_redirect(
-                client, resp
-            )
-
-            if to_return["redirect"]["final_url"] is not None:
-                to_return["final_url"] = to_return["redirect"]["final_url"]
-
-        if resp is not None:
-            # Success
-            if 300 > resp.status_code >= 200:
-                to_return["success"] = True
-
-            to_return["status_code"] = resp.status_code
-
-            if b"cloudflareinsights.com" in resp.content:
-                to_return["cloudflare_protection"] = True
-            elif "cf-ray" in resp.headers:
-                to_return["cloudflare_protection"] = True
-
-            # Since really detecting JS redirects is not doable, we only detect
-            # some cases and flag it has JS redirect. Of course it needs more tests
-            # with some frameworks like selenium.
-            if b"DOMContentLoaded" in resp.content and b"location.href" in resp.content:
-                to_return["has_js_redirect"] = True
-
-            if check_parking_domain is True:
-                if "parking_session" in resp.cookies:
-                    to_return["is_parking_domain"] = True
-                else:
-                    to_return["is_parking_domain"] = is_parking_domain(
-                        client,
-                        str(resp.url),
-                        head_optim=head_optim,
-                        sleep=sleep_between_requests,
-                    )
-
-        if include_response is True:
-            to_return["response"] = resp
-
-        results.append(to_return)
+        results.append(_compact(_check_url(client, elt, **check_options), compact))
 
     if close_client is True:
         client.close()
@@ -125,7 +112,7 @@ def is_reachable(
     if return_as_list is False:
         return results[0]
     else:
-        return results
+        return _fan_out(results, input_urls, indexes)
 
 
 async def is_reachable_async(
@@ -138,7 +125,18 @@ async def is_reachable_async(
     client: Optional[AsyncClient] = None,
     ssl_fallback_to_http: bool = False,
     check_parking_domain: bool = False,
-) -> Union[Dict[str, Any], List[Dict[str, Any]]]:
+    concurrency: int = 20,
+    max_per_host: Optional[int] = 1,
+    scheduler: Optional[HostScheduler] = None,
+    max_body_size: Optional[int] = None,
+    cache: Optional[BaseCache] = None,
+    resolver: Optional[DNSResolver] = None,
+    redirect_cache: Optional[RedirectCache] = None,
+    timings: bool = False,
+    compact: bool = False,
+) -> Union[Result, List[Result]]:
+    # With `compact`, results are `ReachabilityResult` objects rather than
+    # dicts, which take much less memory for large batches
     return_as_list: bool = True
     url_list: List[str] = []
 
@@ -156,30 +154,555 @@ async def is_reachable_async(
             headers=headers,
             include_host=include_host,
             ssl_fallback_to_http=ssl_fallback_to_http,
+            resolver=resolver,
         )
         await client.open()
     else:
         close_client = False
 
-    # Only keep unique URLs to avoid requesting same URL multiple times
-    url_list = list(set(url_list))
+    # Equivalent URLs are only requested once, each input then gets the result
+    # in input order
+    input_urls: List[str] = url_list
+    indexes: List[int]
+    url_list, indexes = dedupe_urls(url_list)
 
-    results: List[Dict[str, Any]] = []
-    iterator: Union[List[str], tqdm] = url_list
-    if return_as_list is True:
-        iterator = tqdm(url_list)
+    check_options: Dict[str, Any] = _check_options(
+        sleep_between_requests=sleep_between_requests,
+        head_optim=head_optim,
+        include_response=include_response,
+        check_parking_domain=check_parking_domain,
+        scheduler=scheduler,
+        max_body_size=max_body_size,
+        cache=cache,
+        redirect_cache=redirect_cache,
+        timings=timings,
+        resolver=resolver,
+    )
 
-    for elt in iterator:
-        resp: Optional[httpx.Response] = None
-        to_return: Dict[str, Any] = {
-            "original_url": elt,
-            "status_code": -1,
-            "success": False,
-            "error_name": None,
-            "cloudflare_protection": False,
-            "has_js_redirect": False,
+    results: List[Result] = []
+    if return_as_list is False:
+        results.append(
+            _compact(
+                await _check_url_async(client, url_list[0], **check_options), compact
+            )
+        )
+    else:
+        if resolver is not None:
+            # Resolve all the hosts upfront, unknown domains are then answered
+            # without opening any connection
+            await resolver.resolve_many(get_host(elt) for elt in url_list)
+
+        # Every URL gets its own task but only `concurrency` of them can run at
+        # the same time, and only `max_per_host` of them can target the same host
+        # so we don't hammer a single server with the whole batch.
+        semaphore: asyncio.Semaphore = asyncio.Semaphore(max(1, concurrency))
+        host_semaphores: Dict[str, Tuple[asyncio.Semaphore, int]] = {}
+
+        from tqdm.asyncio import tqdm as tqdm_asyncio
+
+        results = await tqdm_asyncio.gather(
+            *[
+                _check_url_bounded(
+                    client,
+                    elt,
+                    semaphore,
+                    host_semaphores,
+                    max_per_host,
+                    check_options,
+                    compact,
+                )
+                for elt in url_list
+            ]
+        )
+
+    if close_client is True:
+        await client.close()
+
+    if return_as_list is False:
+        return results[0]
+    else:
+        return _fan_out(results, input_urls, indexes)
+
+
+def iter_reachable(
+    urls: Iterable[str],
+    headers: Optional[Dict[str, str]] = None,
+    include_host: bool = True,
+    sleep_between_requests: bool = True,
+    head_optim: bool = True,
+    include_response: bool = False,
+    client: Optional[Client] = None,
+    ssl_fallback_to_http: bool = False,
+    check_parking_domain: bool = False,
+    scheduler: Optional[HostScheduler] = None,
+    max_body_size: Optional[int] = None,
+    cache: Optional[BaseCache] = None,
+    redirect_cache: Optional[RedirectCache] = None,
+    timings: bool = False,
+    checkpoint: Optional[Checkpoint] = None,
+) -> Iterator[Dict[str, Any]]:
+    # URLs are consumed lazily and results are yielded one by one, so nothing
+    # is kept in memory. It also means duplicated URLs are not filtered out.
+    # With a checkpoint, URLs already done are skipped and results are saved
+    # before being yielded.
+    close_client: bool = True
+    if client is None:
+        client = Client(
+            headers=headers,
+            include_host=include_host,
+            ssl_fallback_to_http=ssl_fallback_to_http,
+        )
+    else:
+        close_client = False
+
+    check_options: Dict[str, Any] = _check_options(
+        sleep_between_requests=sleep_between_requests,
+        head_optim=head_optim,
+        include_response=include_response,
+        check_parking_domain=check_parking_domain,
+        scheduler=scheduler,
+        max_body_size=max_body_size,
+        cache=cache,
+        redirect_cache=redirect_cache,
+        timings=timings,
+    )
+
+    try:
+        for elt in urls:
+            if checkpoint is not None and elt in checkpoint:
+                continue
+
+            yield _save_result(_check_url(client, elt, **check_options), checkpoint)
+    finally:
+        if close_client is True:
+            client.close()
+
+
+async def aiter_reachable(
+    urls: Union[Iterable[str], AsyncIterable[str]],
+    headers: Optional[Dict[str, str]] = None,
+    include_host: bool = True,
+    sleep_between_requests: bool = True,
+    head_optim: bool = True,
+    include_response: bool = False,
+    client: Optional[AsyncClient] = None,
+    ssl_fallback_to_http: bool = False,
+    check_parking_domain: bool = False,
+    concurrency: int = 20,
+    max_per_host: Optional[int] = 1,
+    scheduler: Optional[HostScheduler] = None,
+    max_body_size: Optional[int] = None,
+    cache: Optional[BaseCache] = None,
+    resolver: Optional[DNSResolver] = None,
+    redirect_cache: Optional[RedirectCache] = None,
+    timings: bool = False,
+    checkpoint: Optional[Checkpoint] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    # Results are yielded as soon as they are available, so they don't follow
+    # the input order. Like `iter_reachable`, duplicated URLs are not filtered
+    # and a checkpoint can be given to resume an interrupted run.
+    close_client: bool = True
+    if client is None:
+        client = AsyncClient(
+            headers=headers,
+            include_host=include_host,
+            ssl_fallback_to_http=ssl_fallback_to_http,
+            resolver=resolver,
+        )
+        await client.open()
+    else:
+        close_client = False
+
+    check_options: Dict[str, Any] = _check_options(
+        sleep_between_requests=sleep_between_requests,
+        head_optim=head_optim,
+        include_response=include_response,
+        check_parking_domain=check_parking_domain,
+        scheduler=scheduler,
+        max_body_size=max_body_size,
+        cache=cache,
+        redirect_cache=redirect_cache,
+        timings=timings,
+        resolver=resolver,
+    )
+
+    semaphore: asyncio.Semaphore = asyncio.Semaphore(max(1, concurrency))
+    host_semaphores: Dict[str, Tuple[asyncio.Semaphore, int]] = {}
+    # Stop reading the input while enough results are pending. Some of them can
+    # be waiting for their host, so we allow a few more than `concurrency`.
+    slots: asyncio.Semaphore = asyncio.Semaphore(2 * max(1, concurrency))
+    # Tasks started and not yielded yet
+    pending: Set["asyncio.Future[Dict[str, Any]]"] = set()
+    # Tasks are put there as soon as they finish, and so is the producer once
+    # the input is exhausted (or failed)
+    finished: "asyncio.Queue[asyncio.Future[Any]]" = asyncio.Queue()
+
+    async def produce() -> None:
+        # The input is read in its own task, so a slow input doesn't hold back
+        # the results already available
+        async for elt in _aiterate(urls):
+            if checkpoint is not None and elt in checkpoint:
+                continue
+
+            await slots.acquire()
+            task: "asyncio.Future[Dict[str, Any]]" = asyncio.ensure_future(
+                _check_url_bounded(
+                    client,
+                    elt,
+                    semaphore,
+                    host_semaphores,
+                    max_per_host,
+                    check_options,
+                )
+            )
+            pending.add(task)
+            task.add_done_callback(finished.put_nowait)
+
+    producer: "asyncio.Future[None]" = asyncio.ensure_future(produce())
+    producer.add_done_callback(finished.put_nowait)
+    producing: bool = True
+
+    try:
+        while producing is True or len(pending) > 0:
+            done: "asyncio.Future[Any]" = await finished.get()
+            if done is producer:
+                # Raises the error of the input, if any
+                done.result()
+                producing = False
+                continue
+
+            pending.discard(done)
+            slots.release()
+            yield _save_result(done.result(), checkpoint)
+    finally:
+        producer.cancel()
+        for task in pending:
+            task.cancel()
+
+        if close_client is True:
+            await client.close()
+
+
+def _check_options(
+    sleep_between_requests: bool,
+    head_optim: bool,
+    include_response: bool,
+    check_parking_domain: bool,
+    scheduler: Optional[HostScheduler],
+    max_body_size: Optional[int],
+    cache: Optional[BaseCache],
+    redirect_cache: Optional[RedirectCache],
+    timings: bool,
+    **options: Any,
+) -> Dict[str, Any]:
+    # Options of each URL check of a batch. Permanent redirects found while
+    # checking the batch are reused by the following URLs.
+    if redirect_cache is None:
+        redirect_cache = RedirectCache()
+
+    return {
+        "sleep_between_requests": sleep_between_requests,
+        "head_optim": head_optim,
+        "include_response": include_response,
+        "check_parking_domain": check_parking_domain,
+        "scheduler": scheduler,
+        "max_body_size": max_body_size,
+        "cache": cache,
+        "redirect_cache": redirect_cache,
+        "timings": timings,
+        **options,
+    }
+
+
+def _save_result(
+    result: Dict[str, Any], checkpoint: Optional[Checkpoint]
+) -> Dict[str, Any]:
+    if checkpoint is not None:
+        checkpoint.add(result)
+    return result
+
+
+async def _aiterate(
+    urls: Union[Iterable[str], AsyncIterable[str]],
+) -> AsyncIterator[str]:
+    if isinstance(urls, AsyncIterable):
+        async for elt in urls:
+            yield elt
+    else:
+        # Consumed in the event loop, iterables that block (files, stdin)
+        # should be passed as async iterables instead
+        for elt in urls:
+            yield elt
+
+
+async def _check_url_bounded(
+    client: Union[AsyncClient, "AsyncPlaywrightClient"],
+    elt: str,
+    semaphore: asyncio.Semaphore,
+    host_semaphores: Dict[str, Tuple[asyncio.Semaphore, int]],
+    max_per_host: Optional[int],
+    check_options: Dict[str, Any],
+    compact: bool = False,
+) -> Any:
+    # The per-host lock is acquired first so URLs waiting for their host
+    # don't hold one of the global slots.
+    async with _host_slot(host_semaphores, elt, max_per_host):
+        async with semaphore:
+            result: Dict[str, Any] = await _check_url_async(
+                client, elt, **check_options
+            )
+    # Converted as soon as the URL is done so the batch never holds the dicts
+    return _compact(result, compact)
+
+
+def _compact(result: Dict[str, Any], compact: bool) -> Result:
+    return ReachabilityResult.from_dict(result) if compact is True else result
+
+
+def _fan_out(
+    results: List[Result], urls: List[str], indexes: List[int]
+) -> List[Result]:
+    # The first input of a URL gets its result, the following equivalent ones a
+    # copy with their own `original_url`
+    fanned: List[Result] = []
+    used: Set[int] = set()
+    for url, index in zip(urls, indexes):
+        result: Result = results[index]
+        if index in used:
+            if isinstance(result, ReachabilityResult):
+                result = ReachabilityResult.from_dict(
+                    {**result.to_dict(), "original_url": url}
+                )
+            else:
+                result = {**result, "original_url": url}
+        used.add(index)
+        fanned.append(result)
+    return fanned
+
+
+def _check_url(
+    client: Client,
+    elt: str,
+    sleep_between_requests: bool = True,
+    head_optim: bool = True,
+    include_response: bool = False,
+    check_parking_domain: bool = False,
+    scheduler: Optional[HostScheduler] = None,
+    max_body_size: Optional[int] = None,
+    cache: Optional[BaseCache] = None,
+    redirect_cache: Optional[RedirectCache] = None,
+    timings: bool = False,
+) -> Dict[str, Any]:
+    if timings is True:
+        with collect_timings() as collected:
+            result: Dict[str, Any] = _check_url(
+                client,
+                elt,
+                sleep_between_requests=sleep_between_requests,
+                head_optim=head_optim,
+                include_response=include_response,
+                check_parking_domain=check_parking_domain,
+                scheduler=scheduler,
+                max_body_size=max_body_size,
+                cache=cache,
+                redirect_cache=redirect_cache,
+            )
+        # Nothing has been requested for a cached result
+        if result.get("cached") is not True:
+            result["timings"] = collected.to_dict()
+        return result
+
+    if cache is not None:
+        cached: Optional[Dict[str, Any]] = cache.get(elt)
+        if cached is not None:
+            if include_response is True:
+                cached["response"] = None
+            return cached
+
+    resp: Optional[httpx.Response] = None
+    to_return: Dict[str, Any] = {
+        "original_url": elt,
+        "status_code": -1,
+        "success": False,
+        "error_name": None,
+        "cloudflare_protection": False,
+        "has_js_redirect": False,
+    }
+
+    # A known permanent redirect doesn't need to be requested again
+    location: Optional[str] = None
+    if redirect_cache is not None:
+        location = redirect_cache.get(elt)
+
+    if location is None:
+        resp, to_return["error_name"] = do_request(
+            client,
+            elt,
+            head_optim=head_optim,
+            sleep_between_requests=sleep_between_requests,
+            scheduler=scheduler,
+            max_body_size=max_body_size,
+        )
+
+        if resp is not None and 400 > resp.status_code >= 300:
+            location = _get_new_url(resp)
+            if redirect_cache is not None:
+                redirect_cache.add(elt, resp.status_code, location)
+
+    # Then we handle redirects
+    if location is not None:
+        to_return["error_name"] = None
+        to_return["redirect"], resp, to_return["error_name"] = _handle_redirect_url(
+            client,
+            location,
+            sleep_between_requests=sleep_between_requests,
+            scheduler=scheduler,
+            max_body_size=max_body_size,
+            redirect_cache=redirect_cache,
+        )
+
+        if to_return["redirect"]["final_url"] is not None:
+            to_return["final_url"] = to_return["redirect"]["final_url"]
+
+    if resp is not None:
+        # Success
+        if 300 > resp.status_code >= 200:
+            to_return["success"] = True
+
+        to_return["status_code"] = resp.status_code
+
+        # Set by the transport of a client using a proxy pool
+        if "proxy" in resp.extensions:
+            to_return["proxy"] = resp.extensions["proxy"]
+
+        if b"cloudflareinsights.com" in resp.content:
+            to_return["cloudflare_protection"] = True
+        elif "cf-ray" in resp.headers:
+            to_return["cloudflare_protection"] = True
+
+        # Since really detecting JS redirects is not doable, we only detect
+        # some cases and flag it has JS redirect. Of course it needs more tests
+        # with some frameworks like selenium.
+        if b"DOMContentLoaded" in resp.content and b"location.href" in resp.content:
+            to_return["has_js_redirect"] = True
+
+        if check_parking_domain is True:
+            if "parking_session" in resp.cookies:
+                to_return["is_parking_domain"] = True
+            else:
+                to_return["is_parking_domain"] = is_parking_domain(
+                    client,
+                    str(resp.url),
+                    head_optim=head_optim,
+                    sleep=sleep_between_requests,
+                    scheduler=scheduler,
+                    max_body_size=max_body_size,
+                )
+
+    if include_response is True:
+        to_return["response"] = resp
+
+    if cache is not None:
+        cache.set(elt, to_return)
+        to_return["cached"] = False
+
+    return to_return
+
+
+async def _check_url_async(
+    client: Union[AsyncClient, "AsyncPlaywrightClient", "HybridClient"],
+    elt: str,
+    sleep_between_requests: bool = True,
+    head_optim: bool = True,
+    include_response: bool = False,
+    check_parking_domain: bool = False,
+    scheduler: Optional[HostScheduler] = None,
+    max_body_size: Optional[int] = None,
+    cache: Optional[BaseCache] = None,
+    resolver: Optional[DNSResolver] = None,
+    redirect_cache: Optional[RedirectCache] = None,
+    timings: bool = False,
+) -> Dict[str, Any]:
+    if timings is True:
+        with collect_timings() as collected:
+            timed: Dict[str, Any] = await _check_url_async(
+                client,
+                elt,
+                sleep_between_requests=sleep_between_requests,
+                head_optim=head_optim,
+                include_response=include_response,
+                check_parking_domain=check_parking_domain,
+                scheduler=scheduler,
+                max_body_size=max_body_size,
+                cache=cache,
+                resolver=resolver,
+                redirect_cache=redirect_cache,
+            )
+        # Nothing has been requested for a cached result
+        if timed.get("cached") is not True:
+            timed["timings"] = collected.to_dict()
+        return timed
+
+    if cache is not None:
+        cached: Optional[Dict[str, Any]] = cache.get(elt)
+        if cached is not None:
+            if include_response is True:
+                cached["response"] = None
+            return cached
+
+    if client._type == "hybrid":
+        # The HTTP client answers first, the browser only when needed
+        tier_options: Dict[str, Any] = {
+            "sleep_between_requests": sleep_between_requests,
+            "head_optim": head_optim,
+            "include_response": include_response,
+            "check_parking_domain": check_parking_domain,
+            "scheduler": scheduler,
+            "max_body_size": max_body_size,
+            "resolver": resolver,
+            "redirect_cache": redirect_cache,
         }
+        result: Dict[str, Any] = await _check_url_async(
+            client.http, elt, **tier_options
+        )
+        result["tier"] = "http"
+        if client.needs_browser(result):
+            result = await _check_url_async(
+                await client.get_browser(), elt, **tier_options
+            )
+            result["tier"] = "browser"
+
+        if cache is not None:
+            cache.set(elt, result)
+            result["cached"] = False
+
+        return result
 
+    resp: Optional[httpx.Response] = None
+    to_return: Dict[str, Any] = {
+        "original_url": elt,
+        "status_code": -1,
+        "success": False,
+        "error_name": None,
+        "cloudflare_protection": False,
+        "has_js_redirect": False,
+    }
+
+    # A known permanent redirect doesn't need to be requested again
+    location: Optional[str] = None
+    if redirect_cache is not None:
+        location = redirect_cache.get(elt)
+
+    addresses: Optional[List[str]] = []
+    if resolver is not None:
+        start: float = time.monotonic()
+        addresses = await resolver.resolve(get_host(elt))
+        add_dns(time.monotonic() - start)
+
+    if addresses is None:
+        # The domain doesn't exist, no need to open a connection
+        to_return["error_name"] = "DNSError"
+    elif location is None:
         # I don't know why but sometimes a TypeError is raised with the message
         # "an integer is required". This only happens when a httpx.ConnectError
         # has just been raised, tried different fixes without any success.
@@ -192,80 +715,146 @@ async def is_reachable_async(
                 elt,
                 head_optim=head_optim,
                 sleep_between_requests=sleep_between_requests,
+                scheduler=scheduler,
+                max_body_size=max_body_size,
             )
         )
 
-        # If the request has been made by a browser client and the final URL doesn't
-        # match the initial one, it has been redirected.
-        # Redirects are handled transparently, so we need to populate `to_return`
-        # with information that we have.
-        if (
-            client._type == "browser"
-            and resp is not None
-            and len(str(getattr(resp, "url", ""))) > 0
-            and str(resp.url) != elt
-            and 300 > resp.status_code >= 200
-        ):
-            to_return["redirect"] = {
-                "chain": [str(resp.url)],
-                "final_url": str(resp.url),
-                "tld_match": is_tlds_matching(elt, str(resp.url), strict_suffix=False),
-            }
-            to_return["final_url"] = str(resp.url)
-
-        # Then we handle redirects
-        if resp is not None and 400 > resp.status_code >= 300:
-            to_return["error_name"] = None
-            (
-                to_return["redirect"],
-                resp,
-                to_return["error_name"],
-            ) = await handle_redirect_async(client, resp, head_optim=head_optim)
-
-            if to_return["redirect"]["final_url"] is not None:
-                to_return["final_url"] = to_return["redirect"]["final_url"]
-
-        if resp is not None:
-            # Success
-            if 300 > resp.status_code >= 200:
-                to_return["success"] = True
-
-            to_return["status_code"] = resp.status_code
-
-            if b"cloudflareinsights.com" in resp.content:
-                to_return["cloudflare_protection"] = True
-            elif "cf-ray" in resp.headers:
-                to_return["cloudflare_protection"] = True
-
-            # Since really detecting JS redirects is not doable, we only detect
-            # some cases and flag it has JS redirect. Of course it needs more tests
-            # with some frameworks like selenium.
-            if b"DOMContentLoaded" in resp.content and b"location.href" in resp.content:
-                to_return["has_js_redirect"] = True
-
-            if check_parking_domain is True:
-                if "parking_session" in resp.cookies:
-                    to_return["is_parking_domain"] = True
-                else:
-                    to_return["is_parking_domain"] = await is_parking_domain_async(
-                        client,
-                        str(resp.url),
-                        head_optim=head_optim,
-                        sleep=sleep_between_requests,
-                    )
-
-        if include_response is True:
-            to_return["response"] = resp
-
-        results.append(to_return)
+    # If the request has been made by a browser client and the final URL doesn't
+    # match the initial one, it has been redirected.
+    # Redirects are handled transparently, so we need to populate `to_return`
+    # with information that we have.
+    if (
+        client._type == "browser"
+        and resp is not None
+        and len(str(getattr(resp, "url", ""))) > 0
+        and str(resp.url) != elt
+        and 300 > resp.status_code >= 200
+    ):
+        to_return["redirect"] = {
+            "chain": [str(resp.url)],
+            "final_url": str(resp.url),
+            "tld_match": is_tlds_matching(elt, str(resp.url), strict_suffix=False),
+        }
+        to_return["final_url"] = str(resp.url)
 
-    if close_client is True:
-        await client.close()
+    if resp is not None and 400 > resp.status_code >= 300:
+        location = _get_new_url(resp)
+        if redirect_cache is not None:
+            redirect_cache.add(elt, resp.status_code, location)
+
+    # Then we handle redirects
+    if location is not None and to_return["error_name"] != "DNSError":
+        to_return["error_name"] = None
+        (
+            to_return["redirect"],
+            resp,
+            to_return["error_name"],
+        ) = await _handle_redirect_url_async(
+            client,
+            location,
+            sleep_between_requests=sleep_between_requests,
+            head_optim=head_optim,
+            scheduler=scheduler,
+            max_body_size=max_body_size,
+            redirect_cache=redirect_cache,
+        )
 
-    if return_as_list is False:
-        return results[0]
+        if to_return["redirect"]["final_url"] is not None:
+            to_return["final_url"] = to_return["redirect"]["final_url"]
+
+    if resp is not None:
+        # Success
+        if 300 > resp.status_code >= 200:
+            to_return["success"] = True
+
+        to_return["status_code"] = resp.status_code
+
+        # Set by the transport of a client using a proxy pool
+        if "proxy" in resp.extensions:
+            to_return["proxy"] = resp.extensions["proxy"]
+
+        if b"cloudflareinsights.com" in resp.content:
+            to_return["cloudflare_protection"] = True
+        elif "cf-ray" in resp.headers:
+            to_return["cloudflare_protection"] = True
+
+        # Since really detecting JS redirects is not doable, we only detect
+        # some cases and flag it has JS redirect. Of course it needs more tests
+        # with some frameworks like selenium.
+        if b"DOMContentLoaded" in resp.content and b"location.href" in resp.content:
+            to_return["has_js_redirect"] = True
+
+        if check_parking_domain is True:
+            if "parking_session" in resp.cookies:
+                to_return["is_parking_domain"] = True
+            else:
+                to_return["is_parking_domain"] = await is_parking_domain_async(
+                    client,
+                    str(resp.url),
+                    head_optim=head_optim,
+                    sleep=sleep_between_requests,
+                    scheduler=scheduler,
+                    max_body_size=max_body_size,
+                )
+
+    if include_response is True:
+        to_return["response"] = resp
+
+    if cache is not None:
+        cache.set(elt, to_return)
+        to_return["cached"] = False
+
+    return to_return
+
+
+@contextlib.asynccontextmanager
+async def _host_slot(
+    host_semaphores: Dict[str, Tuple[asyncio.Semaphore, int]],
+    url: str,
+    max_per_host: Optional[int],
+) -> AsyncIterator[None]:
+    if max_per_host is None:
+        yield
+        return
+
+    # Each host has its semaphore and the number of URLs using it, so it can
+    # be dropped once unused and long streams of hosts don't fill the memory
+    host: str = get_host(url)
+    semaphore: asyncio.Semaphore
+    users: int
+    if host in host_semaphores:
+        semaphore, users = host_semaphores[host]
     else:
-        return results
+        semaphore, users = asyncio.Semaphore(max(1, max_per_host)), 0
+    host_semaphores[host] = (semaphore, users + 1)
+
+    try:
+        async with semaphore:
+            yield
+    finally:
+        semaphore, users = host_semaphores[host]
+        if users == 1:
+            del host_semaphores[host]
+        else:
+            host_semaphores[host] = (semaphore, users - 1)
+
+
+# Errors that may not happen again when the URL is requested a bit later
+TRANSIENT_ERRORS: Tuple[str, ...] = ("ReadTimeout", "RemoteProtocolError")
+TIMEOUT_ERRORS: Tuple[str, ...] = ("ConnectTimeout", "ReadTimeout")
+
+
+def get_transient_error(result: Dict[str, Any]) -> Optional[str]:
+    # Can be given as `retry_on` to a `TaskPool` checking URLs
+    error_name: Optional[str] = result.get("error_name")
+    return error_name if error_name in TRANSIENT_ERRORS else None
+
+
+def is_timeout(result: Dict[str, Any]) -> bool:
+    # Can be given as `failure_on` to an `AIMDLimiter`, timeouts being the
+    # first sign of too many opened connections
+    return result.get("error_name") in TIMEOUT_ERRORS
 
 
 def do_request(
@@ -273,6 +862,8 @@ def do_request(
     url: str,
     head_optim: bool = True,
     sleep_between_requests: bool = True,
+    scheduler: Optional[HostScheduler] = None,
+    max_body_size: Optional[int] = None,
 ) -> Tuple[Optional[httpx.Response], Optional[str]]:
     error_name: Optional[str] = None
     resp: Optional[httpx.Response] = None
@@ -280,14 +871,14 @@ def do_request(
     # We first use HEAD to optimize requests
     try:
         if sleep_between_requests is True:
-            time.sleep(random.SystemRandom().uniform(1, 2))
+            (scheduler or default_scheduler).wait(url)
 
         # "Classic" client is httpx, AioHttp, etc.
         # Otherwise it is a "browser" like Playwright, etc
         if head_optim is True and client._type == "classic":
             resp = client.head(url)
         else:
-            resp = client.get(url)
+            resp = _get(client, url, max_body_size)
     except httpx.ConnectError:
         error_name = "ConnectionError"
     except httpx.ConnectTimeout:
@@ -321,8 +912,8 @@ def do_request(
 
         try:
             if sleep_between_requests is True:
-                time.sleep(random.SystemRandom().uniform(1, 2))
-            resp = client.get(url)
+                (scheduler or default_scheduler).wait(url)
+            resp = _get(client, url, max_body_size)
         except httpx.ConnectError:
             error_name = "ConnectionError"
         except httpx.ConnectTimeout:
@@ -351,6 +942,8 @@ async def do_request_async(
     head_optim: bool = True,
     sleep_between_requests: bool = True,
     ssl_fallback_to_http: bool = False,
+    scheduler: Optional[HostScheduler] = None,
+    max_body_size: Optional[int] = None,
 ) -> Tuple[Optional[httpx.Response], Optional[str]]:
     error_name: Optional[str] = None
     resp: Optional[httpx.Response] = None
@@ -358,14 +951,16 @@ async def do_request_async(
     # We first use HEAD to optimize requests
     try:
         if sleep_between_requests is True:
-            await asyncio.sleep(random.SystemRandom().uniform(1, 2))
+            await (scheduler or default_scheduler).wait_async(url)
 
         # "Classic" client is httpx, AioHttp, etc.
         # Otherwise it is a "browser" like Playwright, etc
         if head_optim is True and client._type == "classic":
             resp = await client.head(url, ssl_fallback_to_http=ssl_fallback_to_http)
         else:
-            resp = await client.get(url, ssl_fallback_to_http=ssl_fallback_to_http)
+            resp = await _get_async(
+                client, url, max_body_size, ssl_fallback_to_http=ssl_fallback_to_http
+            )
     except httpx.ConnectError:
         error_name = "ConnectionError"
     except httpx.ConnectTimeout:
@@ -401,8 +996,10 @@ async def do_request_async(
 
         try:
             if sleep_between_requests is True:
-                await asyncio.sleep(random.SystemRandom().uniform(1, 2))
-            resp = await client.get(url, ssl_fallback_to_http=ssl_fallback_to_http)
+                await (scheduler or default_scheduler).wait_async(url)
+            resp = await _get_async(
+                client, url, max_body_size, ssl_fallback_to_http=ssl_fallback_to_http
+            )
         except httpx.ConnectError:
             error_name = "ConnectionError"
         except httpx.ConnectTimeout:
@@ -432,11 +1029,101 @@ async def do_request_async(
     return resp, error_name
 
 
+def _get(
+    client: Client, url: str, max_body_size: Optional[int] = None
+) -> Optional[httpx.Response]:
+    if max_body_size is None or client._type != "classic":
+        return client.get(url)
+
+    # The request is only sent when the stream is entered, so the client can't
+    # fall back to HTTP by itself
+    try:
+        return _get_capped(client, url, max_body_size)
+    except (ssl.SSLError, httpx.RequestError) as e:
+        if client.ssl_fallback_to_http is not True or not _is_ssl_error(e):
+            raise
+        return _get_capped(
+            client, url.lower().replace("https://", "http://"), max_body_size
+        )
+
+
+def _get_capped(client: Client, url: str, max_body_size: int) -> httpx.Response:
+    # Only the beginning of the body is needed to detect Cloudflare or JS
+    # redirects, so we stop downloading once we have enough and close the
+    # connection instead of reading the whole page.
+    body: bytearray = bytearray()
+    with client.stream("get", url) as resp:
+        for chunk in resp.iter_bytes():
+            body += chunk
+            if len(body) >= max_body_size:
+                break
+
+    return _build_capped_response(resp, bytes(body[:max_body_size]))
+
+
+async def _get_async(
+    client: Union[AsyncClient, "AsyncPlaywrightClient"],
+    url: str,
+    max_body_size: Optional[int] = None,
+    ssl_fallback_to_http: bool = False,
+) -> Optional[httpx.Response]:
+    if max_body_size is None or client._type != "classic":
+        return await client.get(url, ssl_fallback_to_http=ssl_fallback_to_http)
+
+    try:
+        return await _get_capped_async(client, url, max_body_size)
+    except (ssl.SSLError, httpx.RequestError) as e:
+        if (
+            ssl_fallback_to_http is not True and client.ssl_fallback_to_http is not True
+        ) or not _is_ssl_error(e):
+            raise
+        return await _get_capped_async(
+            client, url.lower().replace("https://", "http://"), max_body_size
+        )
+
+
+async def _get_capped_async(
+    client: Union[AsyncClient, "AsyncPlaywrightClient"],
+    url: str,
+    max_body_size: int,
+) -> httpx.Response:
+    body: bytearray = bytearray()
+    async with client.stream("get", url) as resp:
+        async for chunk in resp.aiter_bytes():
+            body += chunk
+            if len(body) >= max_body_size:
+                break
+
+    return _build_capped_response(resp, bytes(body[:max_body_size]))
+
+
+def _is_ssl_error(error: Exception) -> bool:
+    # httpx wraps the SSL errors of the connection
+    return isinstance(error, ssl.SSLError) or isinstance(error.__cause__, ssl.SSLError)
+
+
+def _build_capped_response(resp: httpx.Response, body: bytes) -> httpx.Response:
+    headers = httpx.Headers(resp.headers)
+    # The body has already been decompressed while streaming, so we mark it as
+    # "identity" to prevent httpx from decompressing it again.
+    headers["content-encoding"] = "identity"
+    headers["content-length"] = str(len(body))
+
+    return httpx.Response(
+        status_code=resp.status_code,
+        headers=headers,
+        content=body,
+        request=resp.request,
+        history=resp.history,
+        extensions=resp.extensions,
+    )
+
+
 def is_tlds_matching(url1: str, url2: str, strict_suffix: bool = True) -> bool:
     is_matching: bool = False
-    tld_orig: Any = tldextract.extract(url1)
+    tld_orig: Any = extract(url1)
     # In some cases they add the HTTPS port
-    tld_redi: Any = tldextract.extract(url2)
+    tld_redi: Any = extract(url2)
 
     # If it's the same example.com
     if tld_orig.domain == tld_redi.domain and tld_orig.suffix == tld_redi.suffix:
@@ -459,7 +1146,7 @@ def _get_new_url(response: httpx.Response) -> str:
 
     # If it is a local redirection
     new_url: str = ""
-    tld_redirect: Any = tldextract.extract(redirect_url)
+    tld_redirect: Any = extract(redirect_url)
     if tld_redirect.domain == "":
         parsed_url = urlparse(url_origin)
         url_replaced = parsed_url._replace(path=redirect_url)
@@ -475,6 +1162,29 @@ def handle_redirect(
     resp: httpx.Response,
     sleep_between_requests: bool = True,
     head_optim: bool = True,
+    scheduler: Optional[HostScheduler] = None,
+    max_body_size: Optional[int] = None,
+    redirect_cache: Optional[RedirectCache] = None,
+) -> Tuple[Dict[str, Any], Optional[httpx.Response], Optional[str]]:
+    return _handle_redirect_url(
+        client,
+        _get_new_url(resp),
+        sleep_between_requests=sleep_between_requests,
+        head_optim=head_optim,
+        scheduler=scheduler,
+        max_body_size=max_body_size,
+        redirect_cache=redirect_cache,
+    )
+
+
+def _handle_redirect_url(
+    client: Client,
+    new_url: str,
+    sleep_between_requests: bool = True,
+    head_optim: bool = True,
+    scheduler: Optional[HostScheduler] = None,
+    max_body_size: Optional[int] = None,
+    redirect_cache: Optional[RedirectCache] = None,
 ) -> Tuple[Dict[str, Any], Optional[httpx.Response], Optional[str]]:
     error_name: Optional[str] = None
     new_resp: Optional[httpx.Response] = None
@@ -485,13 +1195,14 @@ def handle_redirect(
         "tld_match": False,
     }
 
-    new_url: str = _get_new_url(resp)
-
     new_resp, error_name, chain = follow_redirect(
         client,
         new_url,
         sleep_between_requests=sleep_between_requests,
+        scheduler=scheduler,
+        max_body_size=max_body_size,
         head_optim=head_optim,
+        redirect_cache=redirect_cache,
     )
 
     data["chain"] = chain
@@ -509,6 +1220,29 @@ async def handle_redirect_async(
     resp: httpx.Response,
     sleep_between_requests: bool = True,
     head_optim: bool = True,
+    scheduler: Optional[HostScheduler] = None,
+    max_body_size: Optional[int] = None,
+    redirect_cache: Optional[RedirectCache] = None,
+) -> Tuple[Dict[str, Any], Optional[httpx.Response], Optional[str]]:
+    return await _handle_redirect_url_async(
+        client,
+        _get_new_url(resp),
+        sleep_between_requests=sleep_between_requests,
+        head_optim=head_optim,
+        scheduler=scheduler,
+        max_body_size=max_body_size,
+        redirect_cache=redirect_cache,
+    )
+
+
+async def _handle_redirect_url_async(
+    client: AsyncClient,
+    new_url: str,
+    sleep_between_requests: bool = True,
+    head_optim: bool = True,
+    scheduler: Optional[HostScheduler] = None,
+    max_body_size: Optional[int] = None,
+    redirect_cache: Optional[RedirectCache] = None,
 ) -> Tuple[Dict[str, Any], Optional[httpx.Response], Optional[str]]:
     error_name: Optional[str] = None
     new_resp: Optional[httpx.Response] = None
@@ -519,13 +1253,14 @@ async def handle_redirect_async(
         "tld_match": False,
     }
 
-    new_url: str = _get_new_url(resp)
-
     new_resp, error_name, chain = await follow_redirect_async(
         client,
         new_url,
         sleep_between_requests=sleep_between_requests,
+        scheduler=scheduler,
+        max_body_size=max_body_size,
         head_optim=head_optim,
+        redirect_cache=redirect_cache,
     )
 
     data["chain"] = chain
@@ -544,27 +1279,57 @@ def follow_redirect(
     depth: int = 5,
     sleep_between_requests: bool = True,
     head_optim: bool = True,
+    scheduler: Optional[HostScheduler] = None,
+    max_body_size: Optional[int] = None,
+    redirect_cache: Optional[RedirectCache] = None,
 ) -> Tuple[Optional[httpx.Response], Optional[str], List[str]]:
     if depth <= 0:
         return None, "Max depth reached", []
 
     chain: List[str] = [url]
+    location: Optional[str] = None
+    if redirect_cache is not None:
+        location = redirect_cache.get(url)
+
+    # Known permanent redirect, we directly jump to the next hop
+    if location is not None:
+        nresp, error_name, tchain = follow_redirect(
+            client,
+            location,
+            depth=depth - 1,
+            sleep_between_requests=sleep_between_requests,
+            head_optim=head_optim,
+            scheduler=scheduler,
+            max_body_size=max_body_size,
+            redirect_cache=redirect_cache,
+        )
+        chain += tchain
+        return nresp, error_name, chain
+
     resp, error_name = do_request(
         client,
         url,
         head_optim=head_optim,
         sleep_between_requests=sleep_between_requests,
+        scheduler=scheduler,
+        max_body_size=max_body_size,
     )
 
     # Has redirect
     if resp is not None and 400 > resp.status_code >= 300:
         new_url: str = _get_new_url(resp)
+        if redirect_cache is not None:
+            redirect_cache.add(url, resp.status_code, new_url)
+
         nresp, error_name, tchain = follow_redirect(
             client,
             new_url,
             depth=depth - 1,
             sleep_between_requests=sleep_between_requests,
+            scheduler=scheduler,
+            max_body_size=max_body_size,
             head_optim=head_optim,
+            redirect_cache=redirect_cache,
         )
         chain += tchain
         return nresp, error_name, chain
@@ -578,27 +1343,57 @@ async def follow_redirect_async(
     depth: int = 5,
     sleep_between_requests: bool = True,
     head_optim: bool = True,
+    scheduler: Optional[HostScheduler] = None,
+    max_body_size: Optional[int] = None,
+    redirect_cache: Optional[RedirectCache] = None,
 ) -> Tuple[Optional[httpx.Response], Optional[str], List[str]]:
     if depth <= 0:
         return None, "Max depth reached", []
 
     chain: List[str] = [url]
+    location: Optional[str] = None
+    if redirect_cache is not None:
+        location = redirect_cache.get(url)
+
+    # Known permanent redirect, we directly jump to the next hop
+    if location is not None:
+        nresp, error_name, tchain = await follow_redirect_async(
+            client,
+            location,
+            depth=depth - 1,
+            sleep_between_requests=sleep_between_requests,
+            head_optim=head_optim,
+            scheduler=scheduler,
+            max_body_size=max_body_size,
+            redirect_cache=redirect_cache,
+        )
+        chain += tchain
+        return nresp, error_name, chain
+
     resp, error_name = await do_request_async(
         client,
         url,
         head_optim=head_optim,
         sleep_between_requests=sleep_between_requests,
+        scheduler=scheduler,
+        max_body_size=max_body_size,
     )
 
     # Has redirect
     if resp is not None and 400 > resp.status_code >= 300:
         new_url: str = _get_new_url(resp)
+        if redirect_cache is not None:
+            redirect_cache.add(url, resp.status_code, new_url)
+
         nresp, error_name, tchain = await follow_redirect_async(
             client,
             new_url,
             depth=depth - 1,
             sleep_between_requests=sleep_between_requests,
+            scheduler=scheduler,
+            max_body_size=max_body_size,
             head_optim=head_optim,
+            redirect_cache=redirect_cache,
         )
         chain += tchain
         return nresp, error_name, chain
@@ -613,26 +1408,46 @@ def _replace_url_path(url: str, path: str) -> str:
 
 
 async def is_parking_domain_async(
-    client: AsyncClient, url: str, head_optim: bool = True, sleep: bool = False
+    client: AsyncClient,
+    url: str,
+    head_optim: bool = True,
+    sleep: bool = False,
+    scheduler: Optional[HostScheduler] = None,
+    max_body_size: Optional[int] = None,
 ) -> bool:
     # Set random URL and if it returns 200, it is a parked domain since
     # they always answer with 200 or redirect
     rand = hashlib.sha512(os.urandom(128)).hexdigest()
     new_url = _replace_url_path(url, path=f"{rand[:64]}/{rand[65:]}")
     result, _ = await do_request_async(
-        client, new_url, head_optim=head_optim, sleep_between_requests=sleep
+        client,
+        new_url,
+        head_optim=head_optim,
+        sleep_between_requests=sleep,
+        scheduler=scheduler,
+        max_body_size=max_body_size,
     )
     return result.status_code < 400
 
 
 def is_parking_domain(
-    client: AsyncClient, url: str, head_optim: bool = True, sleep: bool = False
+    client: AsyncClient,
+    url: str,
+    head_optim: bool = True,
+    sleep: bool = False,
+    scheduler: Optional[HostScheduler] = None,
+    max_body_size: Optional[int] = None,
 ) -> bool:
     # Set random URL and if it returns 200, it is a parked domain since
     # they always answer with 200 or redirect
     rand = hashlib.sha512(os.urandom(128)).hexdigest()
     new_url = _replace_url_path(url, path=f"{rand[:64]}/{rand[65:]}")
     result, _ = do_request(
-        client, new_url, head_optim=head_optim, sleep_between_requests=sleep
+        client,
+        new_url,
+        head_optim=head_optim,
+        sleep_between_requests=sleep,
+        scheduler=scheduler,
+        max_body_size=max_body_size,
     )
     return result.status_code < 400
@@ -1,16 +1,103 @@
 import asyncio
 import logging
 import re
-from typing import Any, Optional
+import sys
+import time
+from typing import Any, Dict, List, Optional
 from urllib.parse import urlparse, urlunparse
 
 import httpx
-from fake_useragent import UserAgent
 from playwright.async_api import Error, TimeoutError, async_playwright
 from typing_extensions import Self
 
+from reachable.proxy import ProxyPool, ProxyState
 
-ua: Any = UserAgent(browsers=["chrome"], os="windows", platforms="pc", min_version=120)
+
+# Extensions of the resources not needed to check a page (media,
+# stylesheets, fonts, manifests and text tracks). Images are disabled in
+# Blink instead, which also covers the ones without extension.
+BLOCKED_EXTENSIONS: List[str] = [
+    "ico",
+    "mp4",
+    "webm",
+    "ogg",
+    "mp3",
+    "wav",
+    "m3u8",
+    "css",
+    "woff",
+    "woff2",
+    "ttf",
+    "otf",
+    "eot",
+    "webmanifest",
+    "vtt",
+]
+DEFAULT_BLOCKED_URLS: List[str] = [f"*.{ext}" for ext in BLOCKED_EXTENSIONS] + [
+    f"*.{ext}?*" for ext in BLOCKED_EXTENSIONS
+]
+# Hosts only serving analytics, ads and web fonts, which keep the network busy
+# long after the page loaded. They are not resolved by Chromium, so their
+# requests fail without any handler. Sites of these companies are on other
+# hosts and can still be checked.
+BLOCKED_HOSTS: List[str] = [
+    "www.google-analytics.com",
+    "ssl.google-analytics.com",
+    "region1.google-analytics.com",
+    "www.googletagmanager.com",
+    "pagead2.googlesyndication.com",
+    "tpc.googlesyndication.com",
+    "securepubads.g.doubleclick.net",
+    "googleads.g.doubleclick.net",
+    "stats.g.doubleclick.net",
+    "ad.doubleclick.net",
+    "adservice.google.com",
+    "connect.facebook.net",
+    "static.hotjar.com",
+    "script.hotjar.com",
+    "cdn.segment.com",
+    "api.segment.io",
+    "c.amazon-adsystem.com",
+    "aax.amazon-adsystem.com",
+    "sb.scorecardresearch.com",
+    "static.criteo.net",
+    "cdn.taboola.com",
+    "widgets.outbrain.com",
+    "fonts.googleapis.com",
+    "fonts.gstatic.com",
+    "use.typekit.net",
+]
+
+
+def blocked_urls_regex(patterns: List[str]) -> "re.Pattern[str]":
+    # Patterns use the syntax of Chromium's blocked URLs, "*" matching any
+    # characters, and are merged in one regex so Playwright matches them in
+    # the driver and only blocked requests reach Python
+    return re.compile(
+        "|".join(
+            "^" + re.escape(pattern).replace(r"\*", ".*") + "$" for pattern in patterns
+        )
+    )
+
+
+class _PooledPage:
+    # A page opened once in its own context, with the response of the last
+    # navigation recorded by a handler registered once as well
+    def __init__(
+        self, context: Any, page: Any, proxy: Optional[ProxyState] = None
+    ) -> None:
+        self.context: Any = context
+        self.page: Any = page
+        self.proxy: Optional[ProxyState] = proxy
+        self.response: Any = None
+        page.on("response", self._on_response)
+
+    async def _on_response(self, response: Any) -> None:
+        # If URL is "about:blank" it means this is the initial load,
+        # so the first request must be the URL we are looking for
+        # to handle correctly redirects.
+        if self.page.url == "about:blank":
+            self.response = response
 
 
 class AsyncPlaywrightClient:
@@ -23,17 +110,67 @@ class AsyncPlaywrightClient:
         ensure_protocol_url: bool = False,
         executable_path: Optional[str] = None,
         proxy_url: Optional[str] = None,
+        pool_size: int = 5,
+        wait_until: str = "networkidle",
+        timeout: float = 60000,
+        networkidle_timeout: Optional[float] = None,
+        fetch_content: bool = True,
+        block_mode: str = "url",
+        blocked_urls: Optional[List[str]] = None,
+        blocked_hosts: Optional[List[str]] = None,
+        proxy_pool: Optional[ProxyPool] = None,
     ):
         self.playwright = None
         self.playwright_manager = async_playwright()
 
         self.browser = None
 
+        # Pages are opened once and reused, each in its own context so cookies
+        # don't leak from a URL to another. Requests wait for a free page when
+        # all of them are in use.
+        self.pool_size: int = pool_size
+        self._pages: Optional[asyncio.Queue] = None
+        self._pooled_pages: List[_PooledPage] = []
+
+        # How long to wait for each page: "commit" (response received),
+        # "domcontentloaded", "load" or "networkidle". Timeouts are in ms and
+        # `networkidle_timeout` bounds the wait for pages that never stop
+        # making requests (long-polling, analytics, etc.), the page being
+        # considered loaded once it expires.
+        self.wait_until: str = wait_until
+        self.timeout: float = timeout
+        self.networkidle_timeout: Optional[float] = networkidle_timeout
+        # When only the status and the final URL are needed, the HTML of the
+        # page is not serialized
+        self.fetch_content: bool = fetch_content
+
+        # With "url", images are disabled and `blocked_hosts` are not resolved
+        # by Chromium itself, so these requests never reach Python. Only the
+        # requests matching `blocked_urls` go through a route handler, which
+        # aborts them unless they are a navigation (the URL being checked or
+        # one of its redirects). "route" uses `block_resources` as a route
+        # handler, which blocks by resource type but is called for every
+        # request, and "none" doesn't block anything.
+        if block_mode not in ("url", "route", "none"):
+            raise ValueError(f"Unknown block mode {block_mode}")
+        self.block_mode: str = block_mode
+        self.blocked_urls: List[str] = (
+            blocked_urls if blocked_urls is not None else DEFAULT_BLOCKED_URLS
+        )
+        self.blocked_hosts: List[str] = (
+            blocked_hosts if blocked_hosts is not None else BLOCKED_HOSTS
+        )
+
         self.ssl_fallback_to_http: bool = ssl_fallback_to_http
         self.ensure_protocol_url: bool = ensure_protocol_url
         self.headless: bool = headless
         self.executable_path: Optional[str] = executable_path
         self.proxy = proxy_url
+        # Each context goes through a proxy of the pool, and is moved to
+        # another one when its proxy gets ejected
+        self.proxy_pool: Optional[ProxyPool] = proxy_pool
+        # Number of contexts going through each proxy
+        self._contexts_per_proxy: Dict[str, int] = {}
 
     async def open(self) -> None:
         self.playwright = await self.playwright_manager.__aenter__()
@@ -43,13 +180,121 @@ class AsyncPlaywrightClient:
                 headless=self.headless,
                 executable_path=self.executable_path,
                 proxy={"server": self.proxy},
+                args=self._launch_args(),
             )
         else:
             self.browser = await self.playwright.chromium.launch(
-                headless=self.headless, executable_path=self.executable_path
+                headless=self.headless,
+                executable_path=self.executable_path,
+                args=self._launch_args(),
             )
 
+        self._pages = asyncio.Queue()
+        self._pooled_pages = list(
+            await asyncio.gather(*[self._new_page() for _ in range(self.pool_size)])
+        )
+        for pooled_page in self._pooled_pages:
+            self._pages.put_nowait(pooled_page)
+
+    def _launch_args(self) -> List[str]:
+        # Blocking done by Chromium itself, without any request handler
+        if self.block_mode != "url":
+            return []
+
+        args: List[str] = ["--blink-settings=imagesEnabled=false"]
+        if len(self.blocked_hosts) > 0:
+            rules: str = ", ".join(
+                f"MAP {host} ~NOTFOUND" for host in self.blocked_hosts
+            )
+            args.append(f"--host-resolver-rules={rules}")
+        return args
+
+    async def _new_page(self) -> _PooledPage:
+        proxy: Optional[ProxyState] = None
+        if self.proxy_pool is not None:
+            proxy = self._select_proxy()
+            context = await self.browser.new_context(proxy={"server": proxy.url})
+        else:
+            context = await self.browser.new_context()
+        if self.block_mode == "route":
+            # Register the route to block specific resources, once for all the
+            # requests made with this context
+            await context.route("**/*", AsyncPlaywrightClient.block_resources)
+        elif self.block_mode == "url" and len(self.blocked_urls) > 0:
+            await context.route(
+                blocked_urls_regex(self.blocked_urls),
+                AsyncPlaywrightClient.block_urls,
+            )
+
+        page = await context.new_page()
+        return _PooledPage(context, page, proxy)
+
+    def _select_proxy(self) -> ProxyState:
+        # Contexts are spread evenly over the available proxies. The pool
+        # picks proxies by their requests in flight, which don't change while
+        # the contexts are created, so all of them would get the same one.
+        assert self.proxy_pool is not None
+        now: float = time.monotonic()
+        available: List[ProxyState] = [
+            proxy for proxy in self.proxy_pool.proxies if proxy.is_available(now)
+        ]
+        proxy: ProxyState
+        if len(available) == 0:
+            # All of them are ejected, the pool gives the one coming back first
+            proxy = self.proxy_pool.select()
+        else:
+            proxy = min(available, key=lambda p: self._contexts_per_proxy.get(p.url, 0))
+        self._contexts_per_proxy[proxy.url] = (
+            self._contexts_per_proxy.get(proxy.url, 0) + 1
+        )
+        return proxy
+
+    async def _acquire_page(self) -> _PooledPage:
+        if self._pages is None:
+            raise RuntimeError("The client must be opened before making requests")
+        return await self._pages.get()
+
+    async def _release_page(self, pooled_page: _PooledPage) -> None:
+        # Reset the page for the next request, or replace it when it can't be
+        assert self._pages is not None
+        try:
+            if pooled_page.proxy is not None and not pooled_page.proxy.is_available(
+                time.monotonic()
+            ):
+                raise Exception("The proxy of the page has been ejected")
+
+            await pooled_page.page.goto("about:blank")
+            await pooled_page.context.clear_cookies()
+            pooled_page.response = None
+        except Exception:
+            self._pooled_pages.remove(pooled_page)
+            if pooled_page.proxy is not None:
+                self._contexts_per_proxy[pooled_page.proxy.url] -= 1
+            try:
+                await pooled_page.context.close()
+            except Exception:
+                pass
+
+            try:
+                pooled_page = await self._new_page()
+            except Exception as e:
+                # The browser may have crashed. The broken page is put back so
+                # the pool doesn't shrink and requests don't wait forever: the
+                # next one using it fails and the page is replaced again.
+                logging.warning(f"Failed to replace a browser page: {e!r}")
+                if pooled_page.proxy is not None:
+                    self._contexts_per_proxy[pooled_page.proxy.url] += 1
+            self._pooled_pages.append(pooled_page)
+
+        self._pages.put_nowait(pooled_page)
+
     async def close(self) -> None:
+        for pooled_page in self._pooled_pages:
+            await pooled_page.context.close()
+        self._pooled_pages = []
+        self._pages = None
+        self._contexts_per_proxy = {}
+
         await self.browser.close()
         await self.playwright.stop()
         await self.playwright_manager.__aexit__()
@@ -80,6 +325,15 @@ class AsyncPlaywrightClient:
             # Continue with the request
             await route.continue_()
 
+    @staticmethod
+    async def block_urls(route, request):
+        # The URL checked may match a blocked pattern too (a tracker domain, a
+        # link to an image, etc.), navigations are never blocked
+        if request.is_navigation_request():
+            await route.continue_()
+        else:
+            await route.abort("blockedbyclient")
+
     @staticmethod
     async def _get_page_content(page, retries=3, delay=1):
         for i in range(retries):
@@ -92,6 +346,33 @@ class AsyncPlaywrightClient:
 
         raise Exception("Failed to get page content after multiple retries.")
 
+    async def _navigate(self, pooled_page: _PooledPage, url: str) -> str:
+        page = pooled_page.page
+        if self.wait_until != "networkidle":
+            response = await page.goto(
+                url, timeout=self.timeout, wait_until=self.wait_until
+            )
+        else:
+            response = await page.goto(url, timeout=self.timeout)
+            # Wait for all network requests in order to have the response object
+            # and the HTML generated by an eventual React or Vue framework.
+            try:
+                await page.wait_for_load_state(
+                    "networkidle", timeout=self.networkidle_timeout
+                )
+            except TimeoutError:
+                if self.networkidle_timeout is None:
+                    raise
+
+        # With an early `wait_until` the navigation may be done before the
+        # response handler has been called
+        if pooled_page.response is None:
+            pooled_page.response = response
+
+        if self.fetch_content is False:
+            return ""
+        return await AsyncPlaywrightClient._get_page_content(page, delay=2)
+
     async def request(
         self,
         url: str,
@@ -107,31 +388,23 @@ class AsyncPlaywrightClient:
                 # Replace "///" by "//" in case URL is parsed as path and not netloc
                 url = urlunparse(url_replaced).replace("https:///", "https://")
 
-        # We need a mutable data structure like a list or dictionary to hold the
-        # response, as mutable structures can be modified inside nested functions.
-        resp_obj = {"response": None, "final_url": url}
-
-        page = await self.browser.new_page()
-
-        # Register the route to block specific resources
-        await page.route("**/*", AsyncPlaywrightClient.block_resources)
-
-        async def response_handler(response):
-            # If URL is "about:blank" it means this is the initial load,
-            # so the first request must be the URL we are looking for
-            # to handle correctly redirects.
-            if page.url == "about:blank":
-                resp_obj["response"] = response
+        if self.block_mode == "url" and urlparse(url).hostname in self.blocked_hosts:
+            logging.warning(
+                f"{url} is on a host blocked by the browser, it will not resolve"
+            )
 
-        page.on("response", response_handler)
+        pooled_page: _PooledPage = await self._acquire_page()
+        proxy: Optional[ProxyState] = pooled_page.proxy
+        if self.proxy_pool is not None and proxy is not None:
+            self.proxy_pool.acquire(proxy)
+        start: float = time.monotonic()
 
         content: str = ""
+        # Only Chromium's ERR_PROXY_* errors are the proxy's, a target that
+        # can't be resolved or reached through it is not
+        proxy_failure: bool = False
         try:
-            await page.goto(url, timeout=60000)
-            # Wait for all network requests in order to have the response object
-            # and the HTML generated by an eventual React or Vue framework.
-            await page.wait_for_load_state("networkidle")
-            content = await AsyncPlaywrightClient._get_page_content(page, delay=2)
+            content = await self._navigate(pooled_page, url)
         except TimeoutError:
             raise httpx.ConnectTimeout("Connection timeout")
         except Error as e:
@@ -144,13 +417,14 @@ class AsyncPlaywrightClient:
                 )
             elif "TIMED_OUT" in str(e):
                 raise httpx.ConnectTimeout("Connection timeout")
+            elif "_PROXY_" in str(e) or "TUNNEL_CONNECTION_FAILED" in str(e):
+                proxy_failure = "ERR_PROXY_" in str(e)
+                raise httpx.ProxyError(str(e))
             elif ("_SSL_" in str(e)) or ("_CERT_" in str(e)) and ssl_fallback_to_http:
-                await page.close()
-                await page.goto(url.replace("https://", "http://"), timeout=60000)
-                # Wait for all network requests in order to have the response object
-                # and the HTML generated by an eventual React or Vue framework.
-                await page.wait_for_load_state("networkidle")
-                content = await AsyncPlaywrightClient._get_page_content(page, delay=2)
+                pooled_page.response = None
+                content = await self._navigate(
+                    pooled_page, url.replace("https://", "http://")
+                )
             else:
                 result = re.findall(r"net::([A-Z_0-9]*)", e.message)
                 if len(result) > 0:
@@ -162,23 +436,34 @@ class AsyncPlaywrightClient:
         except Exception as e:
             raise e
         finally:
-            await page.close()
+            if self.proxy_pool is not None and proxy is not None:
+                # The exception being raised, if any
+                self.proxy_pool.release(
+                    proxy,
+                    time.monotonic() - start,
+                    sys.exc_info()[1],
+                    proxy_failure=proxy_failure,
+                )
+
+            response = pooled_page.response
+            await self._release_page(pooled_page)
 
         # Building the response
         resp: Optional[httpx.Response] = None
-        if resp_obj["response"] is not None:
-            headers = httpx.Headers(resp_obj["response"].headers)
+        if response is not None:
+            headers = httpx.Headers(response.headers)
             # When we build the Response, httpx will try to decompress the content
             # given the content-encoding value in the headers. Since it already
             # has been decompressed, we mark it as "identity" which
             # mean no compression
             headers["content-encoding"] = "identity"
-            req = httpx.Request(method="get", url=resp_obj["response"].url)
+            req = httpx.Request(method="get", url=response.url)
             resp = httpx.Response(
                 request=req,
-                status_code=resp_obj["response"].status,
+                status_code=response.status,
                 headers=headers,
                 content=content.encode(),
+                extensions={"proxy": proxy.url} if proxy is not None else {},
             )
 
         return resp
@@ -1,40 +1,378 @@
 import asyncio
+import heapq
+import inspect
+import logging
+import time
 from types import TracebackType
-from typing import Any, Awaitable, List, Optional, Type
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+)
 
-from tqdm.asyncio import tqdm
+from reachable.timing import count_sleep
+
+
+# Called with the key (the submission index by default) and the result of
+# each task. It can be a coroutine function.
+ResultCallback = Callable[[Any, Any], Any]
+# Returns the reason to retry a result (e.g. the error name), None otherwise
+RetryPredicate = Callable[[Any], Optional[str]]
+
+
+def task_error(error: BaseException) -> Dict[str, Any]:
+    # Result of a task that raised, given to `on_result` or stored in `results`
+    return {"error": error, "error_name": type(error).__name__}
+
+
+class _Task(object):
+    __slots__ = ("index", "key", "coro", "factory", "retries", "history")
+
+    def __init__(
+        self,
+        index: int,
+        key: Any,
+        coro: Optional[Awaitable[Any]],
+        factory: Optional[Callable[[], Awaitable[Any]]],
+    ) -> None:
+        self.index: int = index
+        self.key: Any = key
+        self.coro: Optional[Awaitable[Any]] = coro
+        self.factory: Optional[Callable[[], Awaitable[Any]]] = factory
+        self.retries: int = 0
+        # Reasons of the failed attempts
+        self.history: List[str] = []
+
+
+class AIMDLimiter(object):
+    # Adapts the number of tasks running at the same time: the limit is raised
+    # by `increase` after each window of healthy completions and multiplied by
+    # `decrease` after a window with too many failures or latencies too far
+    # above the best seen since the last decrease. A window lasts as many
+    # completions as the current limit, so a change is judged before the next
+    # one. Time spent waiting for the host scheduler is not counted.
+    def __init__(
+        self,
+        initial: int = 50,
+        min_limit: int = 1,
+        max_limit: int = 1000,
+        increase: int = 10,
+        decrease: float = 0.5,
+        max_failure_rate: float = 0.05,
+        latency_tolerance: float = 2,
+        failure_on: Optional[Callable[[Any], bool]] = None,
+    ) -> None:
+        self.min_limit: int = min_limit
+        self.max_limit: int = max_limit
+        self.increase: int = increase
+        self.decrease: float = decrease
+        self.max_failure_rate: float = max_failure_rate
+        self.latency_tolerance: float = latency_tolerance
+        # Tells if a result is a failure (e.g. a timeout), exceptions always are
+        self.failure_on: Optional[Callable[[Any], bool]] = failure_on
+
+        self._limit: int = max(min_limit, min(initial, max_limit))
+        self._in_flight: int = 0
+        self._condition: Optional[asyncio.Condition] = None
+        self._count: int = 0
+        self._failures: int = 0
+        self._latency: float = 0
+        self._best_latency: Optional[float] = None
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    async def acquire(self) -> None:
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < self._limit)
+            self._in_flight += 1
+
+    async def release(self, latency: float, failed: bool) -> None:
+        assert self._condition is not None
+        async with self._condition:
+            self._in_flight -= 1
+            self._record(latency, failed)
+            self._condition.notify_all()
+
+    def _record(self, latency: float, failed: bool) -> None:
+        self._count += 1
+        self._latency += latency
+        if failed is True:
+            self._failures += 1
+
+        if self._count < self._limit:
+            return
+
+        mean_latency: float = self._latency / self._count
+        failure_rate: float = self._failures / self._count
+        self._count = self._failures = 0
+        self._latency = 0
+
+        if self._best_latency is None or mean_latency < self._best_latency:
+            self._best_latency = mean_latency
+
+        if (
+            failure_rate > self.max_failure_rate
+            or mean_latency > self._best_latency * self.latency_tolerance
+        ):
+            self._limit = max(self.min_limit, int(self._limit * self.decrease))
+            # Latencies can rise for good (a slower part of the list, time of
+            # day), so the reference is reset rather than kept forever
+            self._best_latency = mean_latency
+        else:
+            self._limit = min(self.max_limit, self._limit + self.increase)
 
 
 # Based on
 # https://medium.com/@cgarciae/making-an-infinite-number-of-requests-with-python-aiohttp-pypeln-3a552b97dc95
 class TaskPool(object):
-    def __init__(self, workers: int, use_tqdm: bool = True):
-        self._semaphore: asyncio.Semaphore = asyncio.Semaphore(workers)
-        self._tasks: List[Awaitable[Any]] = []
-        self._results: List[Any] = []
+    def __init__(
+        self,
+        workers: int,
+        use_tqdm: bool = True,
+        queue_size: Optional[int] = None,
+        on_result: Optional[ResultCallback] = None,
+        retry_on: Optional[RetryPredicate] = None,
+        max_retries: int = 2,
+        retry_budget: Optional[int] = None,
+        backoff: float = 1,
+        max_backoff: float = 60,
+        limiter: Optional[AIMDLimiter] = None,
+    ):
+        # A fixed number of workers consume a bounded queue, so `put()` waits
+        # when the queue is full and memory doesn't grow with the number of
+        # submitted tasks.
+        self.workers: int = workers
+        self.queue_size: int = queue_size if queue_size is not None else workers
         self.use_tqdm: bool = use_tqdm
+        self.on_result: Optional[ResultCallback] = on_result
+
+        # With a limiter, `limiter.max_limit` workers are started and the
+        # limiter decides how many of them can run at the same time
+        self.limiter: Optional[AIMDLimiter] = limiter
+
+        # Results for which `retry_on` gives a reason are retried later with an
+        # exponential backoff (`retry_on` also gets the error dict of tasks
+        # that raised), once all the other tasks are done, so that slow
+        # hosts don't hold the workers. `retry_budget` bounds the total number
+        # of retries of the pool. Only tasks given as a function returning a
+        # coroutine can be retried.
+        self.retry_on: Optional[RetryPredicate] = retry_on
+        self.max_retries: int = max_retries
+        self.retry_budget: Optional[int] = retry_budget
+        self.backoff: float = backoff
+        self.max_backoff: float = max_backoff
+        self._retries: List[Tuple[float, int, _Task]] = []
+        self._retrying: int = 0
+        self._retry_event: Optional[asyncio.Event] = None
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List["asyncio.Task[None]"] = []
+        self._progress: Any = None
+        self._submitted: int = 0
+        self._done: int = 0
+
+        # Without `on_result`, results are kept by submission index and are
+        # available in submission order once the pool is joined
+        self._completed: Dict[int, Any] = {}
+        self._results: List[Any] = []
+
+    @property
+    def results(self) -> List[Any]:
+        return self._results
 
-    async def put(self, coro: Awaitable[Any]) -> None:
-        await self._semaphore.acquire()
+    @property
+    def limit(self) -> int:
+        # Number of tasks allowed to run at the same time
+        return self.limiter.limit if self.limiter is not None else self.workers
 
-        task: Any = asyncio.ensure_future(coro)
-        task.add_done_callback(self._on_task_done)
-        self._tasks.append(task)
+    async def put(
+        self,
+        coro: Union[Awaitable[Any], Callable[[], Awaitable[Any]]],
+        key: Any = None,
+    ) -> int:
+        # Returns the submission index of the task
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._workers = [
+                asyncio.ensure_future(self._worker())
+                for _ in range(self._workers_count())
+            ]
+
+        index: int = self._submitted
+        self._submitted += 1
+        if self._progress is not None:
+            self._progress.total = self._submitted
+            self._progress.refresh()
+
+        if inspect.isawaitable(coro):
+            task: _Task = _Task(index, key, coro, None)
+        else:
+            task = _Task(index, key, None, coro)
+
+        await self._queue.put(task)
+        return index
+
+    def _workers_count(self) -> int:
+        return self.limiter.max_limit if self.limiter is not None else self.workers
+
+    async def _worker(self) -> None:
+        assert self._queue is not None
+        while True:
+            task: Optional[_Task] = await self._queue.get()
+            if task is None:
+                break
+
+            await self._run(task)
+
+    async def _retry_worker(self) -> None:
+        assert self._retry_event is not None
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        while True:
+            if len(self._retries) == 0:
+                # Running retries may fail again and be queued back
+                if self._retrying == 0:
+                    self._retry_event.set()
+                    return
+                self._retry_event.clear()
+                await self._retry_event.wait()
+                continue
+
+            ready_at, _, task = heapq.heappop(self._retries)
+            self._retrying += 1
+            try:
+                await asyncio.sleep(max(0, ready_at - loop.time()))
+                await self._run(task)
+            finally:
+                self._retrying -= 1
+                self._retry_event.set()
+
+    async def _run(self, task: _Task) -> None:
+        if self.limiter is not None:
+            await self.limiter.acquire()
+
+        start: float = time.monotonic()
+        error: Optional[Exception] = None
+        res: Any = None
+        # Waits of the host scheduler are not part of the latency seen by the
+        # limiter, they would be taken for a slowdown
+        with count_sleep() as slept:
+            try:
+                if task.factory is not None:
+                    res = await task.factory()
+                else:
+                    assert task.coro is not None
+                    res = await task.coro
+            except Exception as e:
+                error = e
+
+        if self.limiter is not None:
+            failed: bool = error is not None or (
+                self.limiter.failure_on is not None
+                and self.limiter.failure_on(res) is True
+            )
+            await self.limiter.release(time.monotonic() - start - slept.seconds, failed)
+
+        if error is not None:
+            # The task keeps its slot in the results with the exception, which
+            # can be retried like any other result
+            logging.warning(f"Task raised an exception: {error!r}")
+            res = task_error(error)
+
+        if self._schedule_retry(task, res) is True:
+            return
+        await self._on_task_done(task, res)
+
+        self._done += 1
+        if self._progress is not None:
+            self._progress.update()
+
+    def _schedule_retry(self, task: _Task, res: Any) -> bool:
+        if self.retry_on is None:
+            return False
+
+        reason: Optional[str] = self.retry_on(res)
+        if reason is None:
+            return False
+
+        task.history.append(reason)
+        if (
+            task.factory is None
+            or task.retries >= self.max_retries
+            or self.retry_budget == 0
+        ):
+            return False
+
+        if self.retry_budget is not None:
+            self.retry_budget -= 1
+
+        delay: float = min(self.backoff * 2**task.retries, self.max_backoff)
+        task.retries += 1
+        ready_at: float = asyncio.get_running_loop().time() + delay
+        heapq.heappush(self._retries, (ready_at, task.index, task))
+        return True
+
+    async def _on_task_done(self, task: _Task, res: Any) -> None:
+        if self.retry_on is not None and isinstance(res, dict):
+            # The result of the last attempt, with the reasons of the failed ones
+            res["retries"] = task.retries
+            res["retry_history"] = task.history
+
+        if self.on_result is None:
+            self._completed[task.index] = res
+            return
 
-    def _on_task_done(self, task: Any) -> None:
         try:
-            res = task.result()
-            self._results.append(res)
+            ret: Any = self.on_result(task.index if task.key is None else task.key, res)
+            if inspect.isawaitable(ret):
+                await ret
         except Exception as e:
-            print(f"Task raised an exception: {e}")
-        finally:
-            self._semaphore.release()
+            logging.warning(f"Result callback raised an exception: {e!r}")
 
     async def join(self) -> None:
+        if self._queue is None:
+            return
+
         if self.use_tqdm:
-            await tqdm.gather(*self._tasks)
-        else:
-            await asyncio.gather(*self._tasks)
+            from tqdm.asyncio import tqdm
+
+            self._progress = tqdm(total=self._submitted, initial=self._done)
+
+        # One sentinel per worker, queued after all the submitted tasks
+        for _ in self._workers:
+            await self._queue.put(None)
+
+        try:
+            await asyncio.gather(*self._workers)
+
+            if len(self._retries) > 0:
+                self._retry_event = asyncio.Event()
+                await asyncio.gather(
+                    *[self._retry_worker() for _ in range(self._workers_count())]
+                )
+        finally:
+            if self._progress is not None:
+                self._progress.close()
+                self._progress = None
+            self._queue = None
+            self._workers = []
+
+        self._results.extend(self._completed[i] for i in sorted(self._completed))
+        self._completed = {}
 
     async def __aenter__(self) -> Any:
         return self
@@ -0,0 +1,210 @@
+import ssl
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import httpx
+
+
+# Errors meaning the proxy itself may be down or banned
+PROXY_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.ProxyError)
+
+
+def is_proxy_failure(error: Optional[BaseException]) -> bool:
+    # Only failures to reach or use the proxy count against it. httpcore
+    # raises a ProxyError for any non-2xx reply to CONNECT, but a 502 or 504
+    # means the target is down, only a 407 is the proxy refusing us. A TLS
+    # error after CONNECT is the target's too.
+    if not isinstance(error, PROXY_ERRORS):
+        return False
+    if isinstance(error, httpx.ProxyError):
+        status: str = str(error).split(" ", 1)[0]
+        return not status.isdigit() or status == "407"
+
+    cause: Optional[BaseException] = error
+    while cause is not None:
+        if isinstance(cause, ssl.SSLError):
+            return False
+        cause = cause.__cause__ or cause.__context__
+    return True
+
+
+class ProxyState:
+    def __init__(self, url: str) -> None:
+        self.url: str = url
+        self.in_flight: int = 0
+        self.requests: int = 0
+        # Consecutive failures, reset by a success
+        self.failures: int = 0
+        self.ejected_until: float = 0
+        # Moving average of the successful requests duration, None until the
+        # first one so new proxies are tried first
+        self.latency: Optional[float] = None
+
+    def is_available(self, now: float) -> bool:
+        return self.ejected_until <= now
+
+
+class ProxyPool:
+    # Spreads requests over several proxies. A proxy failing `max_failures`
+    # times in a row is ejected for `cooldown` seconds. Strategies are
+    # "least_loaded" (fewest requests in flight) and "latency" (in flight
+    # requests weighted by the proxy latency).
+    STRATEGIES = ("least_loaded", "latency")
+
+    def __init__(
+        self,
+        urls: Iterable[str],
+        strategy: str = "least_loaded",
+        max_failures: int = 3,
+        cooldown: float = 60,
+        latency_weight: float = 0.2,
+    ) -> None:
+        if strategy not in self.STRATEGIES:
+            raise ValueError(f"Unknown strategy {strategy}")
+
+        self.proxies: List[ProxyState] = [ProxyState(url) for url in urls]
+        if len(self.proxies) == 0:
+            raise ValueError("A proxy pool needs at least one proxy")
+
+        self.strategy: str = strategy
+        self.max_failures: int = max_failures
+        self.cooldown: float = cooldown
+        self.latency_weight: float = latency_weight
+        # Sync clients may use the pool from several threads
+        self._lock: threading.Lock = threading.Lock()
+
+    @property
+    def urls(self) -> List[str]:
+        return [proxy.url for proxy in self.proxies]
+
+    def select(self) -> ProxyState:
+        # The proxy the next request should use
+        with self._lock:
+            return self._select()
+
+    def acquire(self, proxy: Optional[ProxyState] = None) -> ProxyState:
+        # Selects a proxy, unless given, and counts a request in flight on it
+        with self._lock:
+            if proxy is None:
+                proxy = self._select()
+            proxy.in_flight += 1
+            proxy.requests += 1
+            return proxy
+
+    def _select(self) -> ProxyState:
+        now: float = time.monotonic()
+        available: List[ProxyState] = [
+            proxy for proxy in self.proxies if proxy.is_available(now)
+        ]
+        if len(available) == 0:
+            # All of them are ejected, use the one coming back first
+            return min(self.proxies, key=lambda p: p.ejected_until)
+        return min(available, key=self._score)
+
+    def release(
+        self,
+        proxy: ProxyState,
+        latency: float,
+        error: Optional[BaseException] = None,
+        proxy_failure: Optional[bool] = None,
+    ) -> None:
+        # `proxy_failure` tells if the error is the proxy's, when the caller
+        # knows better than `is_proxy_failure` (e.g. the browser errors)
+        if proxy_failure is None:
+            proxy_failure = is_proxy_failure(error)
+
+        with self._lock:
+            proxy.in_flight -= 1
+
+            if proxy_failure is True:
+                proxy.failures += 1
+                if proxy.failures >= self.max_failures:
+                    proxy.ejected_until = time.monotonic() + self.cooldown
+                    proxy.failures = 0
+                return
+
+            proxy.failures = 0
+            if error is None:
+                if proxy.latency is None:
+                    proxy.latency = latency
+                else:
+                    proxy.latency += self.latency_weight * (latency - proxy.latency)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        now: float = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "url": proxy.url,
+                    "in_flight": proxy.in_flight,
+                    "requests": proxy.requests,
+                    "latency": proxy.latency,
+                    "available": proxy.is_available(now),
+                }
+                for proxy in self.proxies
+            ]
+
+    def _score(self, proxy: ProxyState) -> Any:
+        latency: float = proxy.latency or 0
+        if self.strategy == "latency":
+            return (latency * (proxy.in_flight + 1), proxy.in_flight)
+        return (proxy.in_flight, latency)
+
+
+class ProxyPoolTransport(httpx.BaseTransport):
+    # One transport, so one connection pool, per proxy. The proxy used is
+    # recorded in the "proxy" extension of the response.
+    def __init__(self, pool: ProxyPool, **transport_options: Any) -> None:
+        self.pool: ProxyPool = pool
+        self.transports: Dict[str, httpx.HTTPTransport] = {
+            url: httpx.HTTPTransport(proxy=url, **transport_options)
+            for url in pool.urls
+        }
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        proxy: ProxyState = self.pool.acquire()
+        start: float = time.monotonic()
+        try:
+            response: httpx.Response = self.transports[proxy.url].handle_request(
+                request
+            )
+        except BaseException as e:
+            self.pool.release(proxy, time.monotonic() - start, e)
+            raise
+
+        self.pool.release(proxy, time.monotonic() - start)
+        response.extensions["proxy"] = proxy.url
+        return response
+
+    def close(self) -> None:
+        for transport in self.transports.values():
+            transport.close()
+
+
+class AsyncProxyPoolTransport(httpx.AsyncBaseTransport):
+    def __init__(self, pool: ProxyPool, **transport_options: Any) -> None:
+        self.pool: ProxyPool = pool
+        self.transports: Dict[str, httpx.AsyncHTTPTransport] = {
+            url: httpx.AsyncHTTPTransport(proxy=url, **transport_options)
+            for url in pool.urls
+        }
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        proxy: ProxyState = self.pool.acquire()
+        start: float = time.monotonic()
+        try:
+            response: httpx.Response = await self.transports[
+                proxy.url
+            ].handle_async_request(request)
+        except BaseException as e:
+            self.pool.release(proxy, time.monotonic() - start, e)
+            raise
+
+        self.pool.release(proxy, time.monotonic() - start)
+        response.extensions["proxy"] = proxy.url
+        return response
+
+    async def aclose(self) -> None:
+        for transport in self.transports.values():
+            await transport.aclose()
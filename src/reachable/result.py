@@ -0,0 +1,235 @@
+import csv
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Union
+
+
+_MISSING: Any = object()
+
+# Keys of a result dict, in their usual order. "redirect" stands for the
+# flattened redirect slots.
+_KEYS: List[str] = [
+    "original_url",
+    "status_code",
+    "success",
+    "error_name",
+    "cloudflare_protection",
+    "has_js_redirect",
+    "redirect",
+    "final_url",
+    "is_parking_domain",
+    "proxy",
+    "tier",
+    "cached",
+    "retries",
+    "retry_history",
+    "timings",
+    "response",
+]
+
+
+class ReachabilityResult:
+    # Same content as a result dict in much less memory, for large batches.
+    # Keys only set on some results (final_url, proxy, etc.) are left unset,
+    # so `to_dict()` gives back exactly the original dict. It can also be read
+    # like one: `result["success"]`, `result.get("final_url")`.
+    __slots__ = (
+        "original_url",
+        "status_code",
+        "success",
+        "error_name",
+        "cloudflare_protection",
+        "has_js_redirect",
+        # The "redirect" dict is flattened
+        "redirect_chain",
+        "redirect_final_url",
+        "tld_match",
+        "final_url",
+        "is_parking_domain",
+        "proxy",
+        "tier",
+        "cached",
+        "retries",
+        "retry_history",
+        "timings",
+        "response",
+        # Keys unknown to this class, None when there are none
+        "extra",
+    )
+
+    original_url: str
+    status_code: int
+    success: bool
+    error_name: Optional[str]
+    cloudflare_protection: bool
+    has_js_redirect: bool
+    redirect_chain: List[str]
+    redirect_final_url: Optional[str]
+    tld_match: bool
+    final_url: str
+    is_parking_domain: bool
+    proxy: str
+    tier: str
+    cached: bool
+    retries: int
+    retry_history: List[str]
+    timings: Dict[str, Any]
+    response: Any
+    extra: Optional[Dict[str, Any]]
+
+    def __init__(self, **fields: Any) -> None:
+        self.extra = None
+        for key, value in fields.items():
+            self[key] = value
+
+    @classmethod
+    def from_dict(cls, result: Dict[str, Any]) -> "ReachabilityResult":
+        return cls(**result)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.items())
+
+    def keys(self) -> Iterator[str]:
+        return (key for key, _ in self.items())
+
+    def items(self) -> Iterator[Any]:
+        for key in _KEYS:
+            try:
+                yield key, self[key]
+            except KeyError:
+                pass
+        if self.extra is not None:
+            yield from self.extra.items()
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            if key == "redirect":
+                return {
+                    "chain": self.redirect_chain,
+                    "final_url": self.redirect_final_url,
+                    "tld_match": self.tld_match,
+                }
+            if key in _KEYS:
+                return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+        if self.extra is not None and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key == "redirect":
+            self.redirect_chain = value["chain"]
+            self.redirect_final_url = value["final_url"]
+            self.tld_match = value["tld_match"]
+        elif key in _KEYS:
+            setattr(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, str) and self.get(key, _MISSING) is not _MISSING
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, ReachabilityResult):
+            return self.to_dict() == other.to_dict()
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"ReachabilityResult({self.to_dict()!r})"
+
+
+Result = Union[Dict[str, Any], ReachabilityResult]
+
+
+class ResultCollector:
+    # Keeps results column by column rather than as one dict per URL, then
+    # exports them to CSV, or to Arrow and Parquet when pyarrow is installed.
+    # Responses, timings and retry histories are not kept.
+    COLUMNS: List[str] = [
+        "original_url",
+        "status_code",
+        "success",
+        "error_name",
+        "cloudflare_protection",
+        "has_js_redirect",
+        "final_url",
+        "redirect_chain",
+        "tld_match",
+        "is_parking_domain",
+        "proxy",
+        "tier",
+        "cached",
+        "retries",
+    ]
+
+    def __init__(self, results: Optional[Iterable[Result]] = None) -> None:
+        self.columns: Dict[str, List[Any]] = {name: [] for name in self.COLUMNS}
+        if results is not None:
+            self.extend(results)
+
+    def __len__(self) -> int:
+        return len(self.columns["original_url"])
+
+    def add(self, result: Result) -> None:
+        redirect: Optional[Dict[str, Any]] = result.get("redirect")
+        for name, values in self.columns.items():
+            if name == "redirect_chain":
+                values.append(redirect["chain"] if redirect is not None else None)
+            elif name == "tld_match":
+                values.append(redirect["tld_match"] if redirect is not None else None)
+            else:
+                values.append(result.get(name))
+
+    def extend(self, results: Iterable[Result]) -> None:
+        for result in results:
+            self.add(result)
+
+    def to_csv(self, path: str) -> None:
+        # The redirect chain is written space separated, URLs having no spaces
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(self.COLUMNS)
+            chain_index: int = self.COLUMNS.index("redirect_chain")
+            for row in zip(*self.columns.values()):
+                values: List[Any] = list(row)
+                if values[chain_index] is not None:
+                    values[chain_index] = " ".join(values[chain_index])
+                writer.writerow(["" if v is None else v for v in values])
+
+    def to_arrow(self) -> Any:
+        # Imported here since it is an optional dependency:
+        # pip install reachable[arrow]
+        import pyarrow as pa
+
+        types: Dict[str, Any] = {
+            "status_code": pa.int32(),
+            "success": pa.bool_(),
+            "cloudflare_protection": pa.bool_(),
+            "has_js_redirect": pa.bool_(),
+            "redirect_chain": pa.list_(pa.string()),
+            "tld_match": pa.bool_(),
+            "is_parking_domain": pa.bool_(),
+            "cached": pa.bool_(),
+            "retries": pa.int32(),
+        }
+        return pa.table(
+            {
+                name: pa.array(values, type=types.get(name, pa.string()))
+                for name, values in self.columns.items()
+            }
+        )
+
+    def to_parquet(self, path: str) -> None:
+        import pyarrow.parquet as pq
+
+        pq.write_table(self.to_arrow(), path)
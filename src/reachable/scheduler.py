@@ -0,0 +1,76 @@
+import asyncio
+import random
+import threading
+import time
+from typing import Dict
+from urllib.parse import urlparse
+
+from reachable.timing import add_sleep
+
+
+PRUNE_ABOVE: int = 10000
+
+
+class HostScheduler:
+    def __init__(self, min_delay: float = 1, max_delay: float = 2) -> None:
+        self.min_delay: float = min_delay
+        self.max_delay: float = max_delay
+
+        # Host -> earliest time (monotonic clock) a new request can be sent to it
+        self._next_allowed: Dict[str, float] = {}
+        # Size above which past slots are pruned, doubled when most of them
+        # are still in the future so the pruning cost stays amortized
+        self._prune_above: int = PRUNE_ABOVE
+        # Sync clients can be shared between threads
+        self._lock: threading.Lock = threading.Lock()
+        self._random: random.SystemRandom = random.SystemRandom()
+
+    def reserve(self, url: str) -> float:
+        # Book the next slot for the URL's host and return how long the caller
+        # has to wait before sending its request. The first request to a host
+        # goes out immediately, the following ones are spread by a random delay.
+        host: str = get_host(url)
+
+        with self._lock:
+            now: float = time.monotonic()
+            if len(self._next_allowed) > self._prune_above:
+                self._prune(now)
+
+            allowed_at: float = max(now, self._next_allowed.get(host, now))
+            self._next_allowed[host] = allowed_at + self._random.uniform(
+                self.min_delay, self.max_delay
+            )
+
+        return allowed_at - now
+
+    def wait(self, url: str) -> None:
+        delay: float = self.reserve(url)
+        if delay > 0:
+            add_sleep(delay)
+            time.sleep(delay)
+
+    async def wait_async(self, url: str) -> None:
+        delay: float = self.reserve(url)
+        if delay > 0:
+            add_sleep(delay)
+            await asyncio.sleep(delay)
+
+    def _prune(self, now: float) -> None:
+        # Hosts whose slot is in the past don't need to be tracked anymore
+        self._next_allowed = {
+            host: allowed_at
+            for host, allowed_at in self._next_allowed.items()
+            if allowed_at > now
+        }
+        self._prune_above = max(PRUNE_ABOVE, 2 * len(self._next_allowed))
+
+
+def get_host(url: str) -> str:
+    # URLs without scheme are parsed as a path by urlparse
+    if "//" not in url:
+        url = f"//{url}"
+    return urlparse(url).hostname or ""
+
+
+# Shared by all clients so that politeness holds across calls
+default_scheduler: HostScheduler = HostScheduler()
@@ -0,0 +1,191 @@
+import asyncio
+import functools
+import multiprocessing
+import os
+import queue
+import threading
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from reachable.cache import RedirectCache
+from reachable.client import AsyncClient
+from reachable.main import get_transient_error, is_reachable_async
+from reachable.pool import TaskPool
+from reachable.scheduler import get_host
+
+
+def run_sharded(
+    urls: Iterable[str],
+    processes: Optional[int] = None,
+    concurrency_per_process: int = 100,
+    queue_size: int = 1000,
+    headers: Optional[Dict[str, str]] = None,
+    include_host: bool = True,
+    sleep_between_requests: bool = True,
+    head_optim: bool = True,
+    ssl_fallback_to_http: bool = False,
+    check_parking_domain: bool = False,
+    max_body_size: Optional[int] = None,
+    max_retries: int = 2,
+) -> Iterator[Dict[str, Any]]:
+    # URLs are dispatched by host so that all the requests to a host are sent by
+    # the same process, which keeps the waits between requests to a host right.
+    # Results are yielded in completion order as soon as a process sends them.
+    if processes is None:
+        processes = os.cpu_count() or 1
+
+    # Spawn is used on every platform since forking a process using threads
+    # (like the feeder below) is unsafe
+    context: Any = multiprocessing.get_context("spawn")
+    in_queues: List[Any] = [context.Queue(maxsize=queue_size) for _ in range(processes)]
+    out_queue: Any = context.Queue(maxsize=queue_size * processes)
+
+    options: Dict[str, Any] = {
+        "sleep_between_requests": sleep_between_requests,
+        "head_optim": head_optim,
+        "check_parking_domain": check_parking_domain,
+        "max_body_size": max_body_size,
+    }
+    client_options: Dict[str, Any] = {
+        "headers": headers,
+        "include_host": include_host,
+        "ssl_fallback_to_http": ssl_fallback_to_http,
+    }
+
+    workers: List[Any] = [
+        context.Process(
+            target=_worker,
+            args=(
+                in_queue,
+                out_queue,
+                concurrency_per_process,
+                max_retries,
+                client_options,
+                options,
+            ),
+            daemon=True,
+        )
+        for in_queue in in_queues
+    ]
+    for worker in workers:
+        worker.start()
+
+    # The input is read in a thread so results can be consumed while URLs are
+    # still being dispatched
+    feeder_errors: List[BaseException] = []
+    feeder: threading.Thread = threading.Thread(
+        target=_feed, args=(urls, in_queues, feeder_errors), daemon=True
+    )
+    feeder.start()
+
+    try:
+        remaining: int = processes
+        while remaining > 0:
+            try:
+                result: Optional[Dict[str, Any]] = out_queue.get(timeout=1)
+            except queue.Empty:
+                if any(w.exitcode not in (None, 0) for w in workers):
+                    raise RuntimeError("A worker process died unexpectedly")
+                continue
+
+            # Each process sends None once it has processed all its URLs
+            if result is None:
+                remaining -= 1
+            else:
+                yield result
+
+        for worker in workers:
+            worker.join()
+    finally:
+        # Only when stopped early, otherwise processes have already exited
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()
+
+    feeder.join()
+    if len(feeder_errors) > 0:
+        raise feeder_errors[0]
+    elif any(worker.exitcode != 0 for worker in workers):
+        raise RuntimeError("A worker process failed, some URLs were not checked")
+
+
+def get_shard(url: str, shards: int) -> int:
+    # crc32 is stable across processes and runs, unlike hash()
+    return zlib.crc32(get_host(url).encode()) % shards
+
+
+def _feed(
+    urls: Iterable[str], in_queues: List[Any], errors: List[BaseException]
+) -> None:
+    try:
+        for url in urls:
+            in_queues[get_shard(url, len(in_queues))].put(url)
+    except BaseException as e:
+        errors.append(e)
+    finally:
+        for in_queue in in_queues:
+            in_queue.put(None)
+
+
+def _worker(
+    in_queue: Any,
+    out_queue: Any,
+    concurrency: int,
+    max_retries: int,
+    client_options: Dict[str, Any],
+    options: Dict[str, Any],
+) -> None:
+    try:
+        asyncio.run(
+            _run_worker(
+                in_queue, out_queue, concurrency, max_retries, client_options, options
+            )
+        )
+    finally:
+        out_queue.put(None)
+
+
+async def _run_worker(
+    in_queue: Any,
+    out_queue: Any,
+    concurrency: int,
+    max_retries: int,
+    client_options: Dict[str, Any],
+    options: Dict[str, Any],
+) -> None:
+    loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+    redirect_cache: RedirectCache = RedirectCache()
+
+    async def send(key: str, result: Dict[str, Any]) -> None:
+        # Queue.put() blocks when the parent is late consuming the results
+        await loop.run_in_executor(None, out_queue.put, result)
+
+    async with AsyncClient(**client_options) as client:
+        # URLs failing with a transient error are checked again at the end
+        pool: TaskPool = TaskPool(
+            workers=concurrency,
+            use_tqdm=False,
+            on_result=send,
+            retry_on=get_transient_error,
+            max_retries=max_retries,
+        )
+
+        while True:
+            # Queue.get() blocks, so it runs in a thread to not block the loop
+            url: Optional[str] = await loop.run_in_executor(None, in_queue.get)
+            if url is None:
+                break
+
+            await pool.put(
+                functools.partial(
+                    is_reachable_async,
+                    url,
+                    client=client,
+                    redirect_cache=redirect_cache,
+                    **options,
+                ),
+                key=url,
+            )
+
+        await pool.join()
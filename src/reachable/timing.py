@@ -0,0 +1,184 @@
+import contextlib
+import contextvars
+import statistics
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+
+class RequestTimer:
+    # Receives the trace events of a single request
+    def __init__(self, method: str, url: str) -> None:
+        self.method: str = method
+        self.url: str = url
+        self.start: float = time.monotonic()
+        self.events: Dict[str, float] = {}
+        self.end: float = self.start
+
+    def __call__(self, event_name: str, info: Dict[str, Any]) -> None:
+        # Only the first occurrence is kept, requests retried on a new
+        # connection being rare
+        now: float = time.monotonic()
+        self.events.setdefault(event_name, now)
+        self.end = now
+
+    async def atrace(self, event_name: str, info: Dict[str, Any]) -> None:
+        self(event_name, info)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "method": self.method.upper(),
+            "url": self.url,
+            # A reused connection has no connect and TLS phases
+            "connect": self._duration(
+                "connection.connect_tcp.started", "connection.connect_tcp.complete"
+            ),
+            "tls": self._duration(
+                "connection.start_tls.started", "connection.start_tls.complete"
+            ),
+            "ttfb": self._duration(
+                (
+                    "http11.send_request_headers.started",
+                    "http2.send_request_headers.started",
+                ),
+                (
+                    "http11.receive_response_headers.complete",
+                    "http2.receive_response_headers.complete",
+                ),
+            ),
+            "total": self.end - self.start,
+        }
+
+    def _duration(self, started: Any, complete: Any) -> float:
+        start: Optional[float] = self._first(started)
+        end: Optional[float] = self._first(complete)
+        if start is None or end is None:
+            return 0
+        return end - start
+
+    def _first(self, names: Any) -> Optional[float]:
+        if isinstance(names, str):
+            names = (names,)
+        for name in names:
+            if name in self.events:
+                return self.events[name]
+        return None
+
+
+class URLTimings:
+    # Everything spent checking a URL: waits between requests to the same
+    # host, DNS resolution (only known with a `DNSResolver`) and each request
+    # including redirects
+    def __init__(self) -> None:
+        self.start: float = time.monotonic()
+        self.sleep: float = 0
+        self.dns: float = 0
+        self.requests: List[RequestTimer] = []
+
+    def to_dict(self) -> Dict[str, Any]:
+        requests: List[Dict[str, Any]] = [timer.to_dict() for timer in self.requests]
+        return {
+            "dns": self.dns,
+            "sleep": self.sleep,
+            "connect": sum(r["connect"] for r in requests),
+            "tls": sum(r["tls"] for r in requests),
+            "ttfb": sum(r["ttfb"] for r in requests),
+            "total": time.monotonic() - self.start,
+            "requests": requests,
+        }
+
+
+_current: "contextvars.ContextVar[Optional[URLTimings]]" = contextvars.ContextVar(
+    "reachable_timings", default=None
+)
+
+
+@contextlib.contextmanager
+def collect_timings() -> Iterator[URLTimings]:
+    # Timings of the requests made inside the block, including in tasks
+    # created from it
+    timings: URLTimings = URLTimings()
+    token: contextvars.Token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+def start_request(method: str, url: str) -> Optional[RequestTimer]:
+    # Called by the clients, returns None when timings are not collected
+    timings: Optional[URLTimings] = _current.get()
+    if timings is None:
+        return None
+
+    timer: RequestTimer = RequestTimer(method, url)
+    timings.requests.append(timer)
+    return timer
+
+
+class SleepCounter:
+    def __init__(self) -> None:
+        self.seconds: float = 0
+
+
+_sleep_counter: "contextvars.ContextVar[Optional[SleepCounter]]" = (
+    contextvars.ContextVar("reachable_sleep_counter", default=None)
+)
+
+
+@contextlib.contextmanager
+def count_sleep() -> Iterator[SleepCounter]:
+    # Time spent waiting for the host scheduler inside the block, without
+    # collecting the other timings
+    counter: SleepCounter = SleepCounter()
+    token: contextvars.Token = _sleep_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _sleep_counter.reset(token)
+
+
+def add_sleep(seconds: float) -> None:
+    timings: Optional[URLTimings] = _current.get()
+    if timings is not None:
+        timings.sleep += seconds
+
+    counter: Optional[SleepCounter] = _sleep_counter.get()
+    if counter is not None:
+        counter.seconds += seconds
+
+
+def add_dns(seconds: float) -> None:
+    timings: Optional[URLTimings] = _current.get()
+    if timings is not None:
+        timings.dns += seconds
+
+
+def summarize_timings(results: Iterable[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    # Mean, median, 95th percentile and max of each phase over a batch
+    values: Dict[str, List[float]] = {
+        phase: [] for phase in ("dns", "sleep", "connect", "tls", "ttfb", "total")
+    }
+    for result in results:
+        timings: Optional[Dict[str, Any]] = result.get("timings")
+        if timings is None:
+            continue
+        for phase, phase_values in values.items():
+            phase_values.append(timings[phase])
+
+    summary: Dict[str, Dict[str, float]] = {}
+    for phase, phase_values in values.items():
+        if len(phase_values) == 0:
+            continue
+        phase_values.sort()
+        summary[phase] = {
+            "mean": statistics.mean(phase_values),
+            "p50": _percentile(phase_values, 50),
+            "p95": _percentile(phase_values, 95),
+            "max": phase_values[-1],
+        }
+    return summary
+
+
+def _percentile(sorted_values: List[float], percentile: float) -> float:
+    index: int = round(percentile / 100 * (len(sorted_values) - 1))
+    return sorted_values[index]
@@ -0,0 +1,57 @@
+from typing import Dict, Iterable, List, Tuple
+from urllib.parse import urlsplit, urlunsplit
+
+
+DEFAULT_PORTS: Dict[str, int] = {"http": 80, "https": 443}
+
+
+def canonicalize_url(url: str) -> str:
+    # Same string for URLs that are trivially equivalent: case of the scheme
+    # and host, default port, IDN or punycode host, trailing slash and
+    # fragment (never sent to the server). The path and query are kept as is
+    # since servers may treat their case differently.
+    url = url.strip()
+    try:
+        parsed = urlsplit(url)
+        port = parsed.port
+    except ValueError:
+        # Invalid port or IPv6 address, nothing more can be done
+        return url.split("#", 1)[0]
+
+    scheme: str = parsed.scheme.lower()
+    if parsed.hostname is None:
+        # No host, for example a URL without scheme
+        return urlunsplit((scheme, parsed.netloc, parsed.path, parsed.query, ""))
+
+    host: str = parsed.hostname
+    try:
+        host = host.encode("idna").decode("ascii")
+    except UnicodeError:
+        pass
+
+    if ":" in host:
+        host = f"[{host}]"
+    netloc: str = host
+    if port is not None and DEFAULT_PORTS.get(scheme) != port:
+        netloc = f"{netloc}:{port}"
+    if parsed.username is not None:
+        userinfo: str = parsed.netloc.rsplit("@", 1)[0]
+        netloc = f"{userinfo}@{netloc}"
+
+    path: str = parsed.path.rstrip("/") or "/"
+    return urlunsplit((scheme, netloc, path, parsed.query, ""))
+
+
+def dedupe_urls(urls: Iterable[str]) -> Tuple[List[str], List[int]]:
+    # Returns the URLs to check, one per canonical URL in order of first
+    # appearance, and for each input the index of the URL checked for it
+    unique: List[str] = []
+    indexes: List[int] = []
+    seen: Dict[str, int] = {}
+    for url in urls:
+        key: str = canonicalize_url(url)
+        if key not in seen:
+            seen[key] = len(unique)
+            unique.append(url)
+        indexes.append(seen[key])
+    return unique, indexes
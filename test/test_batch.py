@@ -0,0 +1,212 @@
+import asyncio
+
+import httpx
+import pytest
+
+from reachable import (
+    aiter_reachable,
+    is_reachable,
+    is_reachable_async,
+    iter_reachable,
+)
+from reachable.client import AsyncClient, Client
+
+
+def _mock_client(handler):
+    client = AsyncClient()
+    client.transport = httpx.MockTransport(handler)
+    return client
+
+
+@pytest.mark.asyncio
+async def test_batch_runs_concurrently():
+    """
+    Test that the list form runs URLs of distinct hosts concurrently, bounded by
+    `concurrency`.
+    """
+    in_flight = 0
+    max_in_flight = 0
+
+    async def handler(request):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+        return httpx.Response(200)
+
+    urls = [f"https://host{i}.example.com" for i in range(20)]
+    async with _mock_client(handler) as client:
+        results = await is_reachable_async(
+            urls, client=client, sleep_between_requests=False, concurrency=5
+        )
+
+    assert len(results) == len(urls)
+    assert sorted(r["original_url"] for r in results) == sorted(urls)
+    assert all(r["success"] is True for r in results)
+    assert max_in_flight == 5
+
+
+@pytest.mark.asyncio
+async def test_batch_per_host_cap():
+    """
+    Test that URLs of the same host never run concurrently with `max_per_host=1`.
+    """
+    in_flight = 0
+    max_in_flight = 0
+
+    async def handler(request):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return httpx.Response(200)
+
+    urls = [f"https://example.com/page{i}" for i in range(5)]
+    async with _mock_client(handler) as client:
+        results = await is_reachable_async(
+            urls, client=client, sleep_between_requests=False, concurrency=5
+        )
+
+    assert len(results) == len(urls)
+    assert max_in_flight == 1
+
+
+@pytest.mark.asyncio
+async def test_aiter_reachable_streams_results():
+    """
+    Test that aiter_reachable accepts a lazy iterable and yields one result per URL.
+    """
+
+    async def handler(request):
+        return httpx.Response(200)
+
+    def urls():
+        for i in range(50):
+            yield f"https://host{i}.example.com"
+
+    results = []
+    async with _mock_client(handler) as client:
+        async for result in aiter_reachable(
+            urls(), client=client, sleep_between_requests=False, concurrency=5
+        ):
+            results.append(result)
+
+    assert len(results) == 50
+    assert all(r["success"] is True for r in results)
+
+
+@pytest.mark.asyncio
+async def test_aiter_reachable_yields_without_waiting_for_input():
+    """
+    Test that a result is yielded as soon as it is available, even when the
+    next URL of the input takes time to come.
+    """
+
+    async def urls():
+        for i in range(3):
+            yield f"https://host{i}.example.com"
+            await asyncio.sleep(0.2)
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    arrivals = []
+    async with _mock_client(lambda request: httpx.Response(200)) as client:
+        async for _ in aiter_reachable(
+            urls(), client=client, sleep_between_requests=False
+        ):
+            arrivals.append(loop.time() - start)
+
+    assert len(arrivals) == 3
+    assert arrivals[0] < 0.15
+    assert arrivals[1] < 0.35
+
+
+@pytest.mark.asyncio
+async def test_aiter_reachable_input_error():
+    """
+    Test that an error raised by the input reaches the caller.
+    """
+
+    async def urls():
+        yield "https://host0.example.com"
+        raise OSError("input closed")
+
+    results = []
+    async with _mock_client(lambda request: httpx.Response(200)) as client:
+        with pytest.raises(OSError):
+            async for result in aiter_reachable(
+                urls(), client=client, sleep_between_requests=False
+            ):
+                results.append(result)
+
+
+def test_iter_reachable_is_lazy():
+    """
+    Test that iter_reachable only requests a URL when its result is consumed.
+    """
+    requested = []
+
+    def handler(request):
+        requested.append(str(request.url))
+        return httpx.Response(200)
+
+    client = Client()
+    client.client = httpx.Client(transport=httpx.MockTransport(handler))
+
+    results = iter_reachable(
+        ["https://a.example.com", "https://b.example.com"],
+        client=client,
+        sleep_between_requests=False,
+    )
+    assert requested == []
+    assert next(results)["original_url"] == "https://a.example.com"
+    assert len(requested) == 1
+    assert next(results)["success"] is True
+    client.close()
+
+
+@pytest.mark.asyncio
+async def test_batch_fans_out_duplicates():
+    """
+    Test that equivalent URLs are requested once and every input gets a result,
+    in input order.
+    """
+    requested = []
+
+    def handler(request):
+        requested.append(str(request.url))
+        return httpx.Response(200)
+
+    urls = [
+        "https://b.example.com/",
+        "https://A.example.com:443",
+        "https://b.example.com",
+        "https://a.example.com/#top",
+    ]
+    async with _mock_client(handler) as client:
+        results = await is_reachable_async(
+            urls, client=client, sleep_between_requests=False
+        )
+
+    assert sorted(requested) == ["https://a.example.com", "https://b.example.com/"]
+    assert [r["original_url"] for r in results] == urls
+    assert all(r["success"] is True for r in results)
+
+
+def test_sync_batch_fans_out_duplicates():
+    """
+    Test that the sync list form keeps the input order and its duplicates.
+    """
+    client = Client()
+    client.client = httpx.Client(
+        transport=httpx.MockTransport(lambda request: httpx.Response(200))
+    )
+
+    urls = ["https://b.example.com", "https://a.example.com", "https://b.example.com"]
+    results = is_reachable(
+        urls, client=client, sleep_between_requests=False, compact=True
+    )
+    assert [r["original_url"] for r in results] == urls
+    assert results[0] is not results[2]
@@ -0,0 +1,80 @@
+import httpx
+
+from reachable import is_reachable
+from reachable.cache import MemoryCache, SQLiteCache
+from reachable.client import Client
+
+
+def test_memory_cache_ttl():
+    """
+    Test that failures expire with the negative TTL.
+    """
+    cache = MemoryCache(ttl=60, negative_ttl=-1)
+    cache.set("https://ok.com", {"original_url": "https://ok.com", "error_name": None})
+    cache.set("https://ko.com", {"original_url": "https://ko.com", "error_name": "E"})
+
+    assert cache.get("https://ok.com")["cached"] is True
+    assert cache.get("https://ko.com") is None
+
+
+def test_memory_cache_lru():
+    cache = MemoryCache(maxsize=2)
+    cache.set("https://a.com", {"error_name": None})
+    cache.set("https://b.com", {"error_name": None})
+    # Accessing "a" makes "b" the least recently used
+    cache.get("https://a.com")
+    cache.set("https://c.com", {"error_name": None})
+
+    assert len(cache) == 2
+    assert cache.get("https://b.com") is None
+    assert cache.get("https://a.com") is not None
+
+
+def test_cache_key_is_normalized():
+    cache = MemoryCache()
+    cache.set("HTTPS://Example.com/Path#top", {"error_name": None})
+
+    result = cache.get("https://example.com/Path")
+    assert result is not None
+    assert result["original_url"] == "https://example.com/Path"
+    assert cache.get("https://example.com/path") is None
+
+
+def test_sqlite_cache(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = SQLiteCache(path)
+    cache.set("https://a.com", {"status_code": 200, "error_name": None})
+    cache.close()
+
+    # Results survive a restart
+    cache = SQLiteCache(path)
+    assert cache.get("https://a.com")["status_code"] == 200
+    cache.close()
+
+
+def test_is_reachable_with_cache():
+    """
+    Test that a cache hit doesn't send any request.
+    """
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200)
+
+    client = Client()
+    client.client = httpx.Client(transport=httpx.MockTransport(handler))
+    cache = MemoryCache()
+
+    first = is_reachable(
+        "https://example.com", client=client, sleep_between_requests=False, cache=cache
+    )
+    second = is_reachable(
+        "https://example.com", client=client, sleep_between_requests=False, cache=cache
+    )
+    client.close()
+
+    assert len(requests) == 1
+    assert first["cached"] is False
+    assert second["cached"] is True
+    assert second["success"] is True
@@ -0,0 +1,108 @@
+import json
+
+import httpx
+import pytest
+
+from reachable import aiter_reachable, iter_reachable
+from reachable.checkpoint import Checkpoint
+from reachable.client import AsyncClient, Client
+
+
+def _result(url):
+    return {"original_url": url, "status_code": 200, "success": True}
+
+
+def test_resume(tmp_path):
+    """
+    Test that results are kept across runs and done URLs are skipped.
+    """
+    path = str(tmp_path / "results.jsonl")
+    with Checkpoint(path) as checkpoint:
+        checkpoint.add(_result("https://a.com"))
+        checkpoint.add(_result("https://b.com"))
+
+    with Checkpoint(path) as checkpoint:
+        assert len(checkpoint) == 2
+        assert "https://a.com" in checkpoint
+        assert list(
+            checkpoint.filter(["https://a.com", "https://c.com", "https://b.com"])
+        ) == ["https://c.com"]
+
+
+def test_recover_unindexed_results(tmp_path):
+    """
+    Test that results written but not indexed before a crash are indexed on
+    the next open and that a partially written line is dropped.
+    """
+    path = str(tmp_path / "results.jsonl")
+    checkpoint = Checkpoint(path, sync_every=100, sync_interval=3600)
+    checkpoint.add(_result("https://a.com"))
+    checkpoint.sync()
+    checkpoint.add(_result("https://b.com"))
+    # The process dies: the line reached the file but the index wasn't
+    # committed, and the next result was cut
+    checkpoint._file.write(b'{"original_url": "https://c.')
+    checkpoint._file.flush()
+    checkpoint._conn.close()
+
+    with Checkpoint(path) as checkpoint:
+        assert "https://b.com" in checkpoint
+        assert "https://c.com" not in checkpoint
+        checkpoint.add(_result("https://c.com"))
+
+    with open(path) as f:
+        urls = [json.loads(line)["original_url"] for line in f]
+    assert urls == ["https://a.com", "https://b.com", "https://c.com"]
+
+
+def test_iter_reachable_checkpoint(tmp_path):
+    """
+    Test that iter_reachable only requests the URLs not done yet.
+    """
+    requested = []
+
+    def handler(request):
+        requested.append(str(request.url))
+        return httpx.Response(200)
+
+    client = Client()
+    client.client = httpx.Client(transport=httpx.MockTransport(handler))
+
+    path = str(tmp_path / "results.jsonl")
+    with Checkpoint(path) as checkpoint:
+        checkpoint.add(_result("https://a.example.com"))
+
+    with Checkpoint(path) as checkpoint:
+        results = list(
+            iter_reachable(
+                ["https://a.example.com", "https://b.example.com"],
+                client=client,
+                sleep_between_requests=False,
+                checkpoint=checkpoint,
+            )
+        )
+        assert len(checkpoint) == 2
+
+    assert [r["original_url"] for r in results] == ["https://b.example.com"]
+    assert requested == ["https://b.example.com"]
+
+
+@pytest.mark.asyncio
+async def test_aiter_reachable_checkpoint(tmp_path):
+    """
+    Test that aiter_reachable saves each result to the checkpoint.
+    """
+    client = AsyncClient()
+    client.transport = httpx.MockTransport(lambda request: httpx.Response(200))
+
+    path = str(tmp_path / "results.jsonl")
+    urls = [f"https://host{i}.example.com" for i in range(5)]
+    with Checkpoint(path) as checkpoint:
+        async with client:
+            async for _ in aiter_reachable(
+                urls, client=client, sleep_between_requests=False, checkpoint=checkpoint
+            ):
+                pass
+
+    with Checkpoint(path) as checkpoint:
+        assert list(checkpoint.filter(urls)) == []
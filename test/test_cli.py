@@ -0,0 +1,177 @@
+import asyncio
+import gzip
+import io
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import zstandard
+
+from reachable.cli import aread_urls, get_parser, main, read_urls, run
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_HEAD(self):
+        self.send_response(404 if self.path == "/missing" else 200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    do_GET = do_HEAD
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_read_compressed_inputs(tmp_path):
+    """
+    Test that plain, gzip and zstd files are read, whatever their extension.
+    """
+    plain = tmp_path / "urls.txt"
+    plain.write_text("https://a.com\n\n  https://b.com  \n")
+    gz = tmp_path / "urls"
+    gz.write_bytes(gzip.compress(b"https://c.com\n"))
+    zst = tmp_path / "urls.zst"
+    zst.write_bytes(zstandard.ZstdCompressor().compress(b"https://d.com\n"))
+
+    assert list(read_urls([str(plain), str(gz), str(zst)])) == [
+        "https://a.com",
+        "https://b.com",
+        "https://c.com",
+        "https://d.com",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_aread_urls_does_not_block_the_loop():
+    """
+    Test that waiting for input doesn't block the event loop and that each
+    line is handed over as soon as it is read.
+    """
+    read_fd, write_fd = os.pipe()
+    urls = aread_urls([f"/dev/fd/{read_fd}"])
+
+    # Nothing was written yet, the loop still runs other coroutines
+    first = asyncio.ensure_future(urls.__anext__())
+    await asyncio.sleep(0.05)
+    assert not first.done()
+
+    with os.fdopen(write_fd, "wb", buffering=0) as f:
+        f.write(b"https://a.com\n")
+        assert await asyncio.wait_for(first, 5) == "https://a.com"
+        f.write(b"https://b.com\n")
+        assert await asyncio.wait_for(urls.__anext__(), 5) == "https://b.com"
+
+    assert [url async for url in urls] == []
+    os.close(read_fd)
+
+
+def test_cli_jsonl(server_url, tmp_path, monkeypatch):
+    """
+    Test that URLs read from stdin give one JSON line each.
+    """
+    urls = f"{server_url}/a\n{server_url}/missing\n"
+    monkeypatch.setattr(
+        "sys.stdin", io.TextIOWrapper(io.BytesIO(gzip.compress(urls.encode())))
+    )
+    output = tmp_path / "results.jsonl"
+
+    code = main(["-o", str(output), "--no-sleep", "--max-per-host", "0"])
+
+    assert code == 0
+    results = [json.loads(line) for line in output.read_text().splitlines()]
+    by_url = {r["original_url"]: r for r in results}
+    assert by_url[f"{server_url}/a"]["success"] is True
+    assert by_url[f"{server_url}/missing"]["status_code"] == 404
+
+
+def test_cli_flushes_each_result(server_url, monkeypatch):
+    """
+    Test that each JSON line is flushed as soon as it is written, so piped
+    output isn't held back in blocks.
+    """
+
+    class Output(io.StringIO):
+        def __init__(self):
+            super().__init__()
+            self.flushed = []
+
+        def flush(self):
+            self.flushed.append(self.getvalue().count("\n"))
+
+    monkeypatch.setattr(
+        "sys.stdin",
+        io.TextIOWrapper(io.BytesIO(f"{server_url}/a\n{server_url}/b\n".encode())),
+    )
+    output = Output()
+    asyncio.run(run(get_parser().parse_args(["--no-sleep"]), output))
+
+    assert output.flushed == [1, 2]
+
+
+def test_cli_missing_input(tmp_path, capsys):
+    """
+    Test that a missing input file is reported as a usage error.
+    """
+    with pytest.raises(SystemExit) as exc_info:
+        main([str(tmp_path / "missing.txt"), "-o", str(tmp_path / "results.jsonl")])
+
+    assert exc_info.value.code == 2
+    assert "missing.txt" in capsys.readouterr().err
+
+
+def test_cli_input_error(tmp_path):
+    """
+    Test that an error while reading the input isn't swallowed.
+    """
+    path = tmp_path / "urls.gz"
+    path.write_bytes(gzip.compress(b"https://a.com\n")[:12])
+    with pytest.raises(EOFError):
+        main([str(path), "-o", str(tmp_path / "results.jsonl")])
+
+
+def test_cli_checkpoint_resume(server_url, tmp_path, monkeypatch, capsys):
+    """
+    Test that resuming with a checkpoint only checks the URLs not done yet,
+    and that a separate output file is rejected.
+    """
+    checkpoint = tmp_path / "cp.jsonl"
+    args = ["--no-sleep", "--checkpoint", str(checkpoint)]
+
+    monkeypatch.setattr(
+        "sys.stdin", io.TextIOWrapper(io.BytesIO(f"{server_url}/a\n".encode()))
+    )
+    assert main(args) == 0
+    monkeypatch.setattr(
+        "sys.stdin",
+        io.TextIOWrapper(io.BytesIO(f"{server_url}/a\n{server_url}/b\n".encode())),
+    )
+    capsys.readouterr()
+    assert main(args) == 0
+
+    printed = [
+        json.loads(line)["original_url"]
+        for line in capsys.readouterr().out.splitlines()
+    ]
+    assert printed == [f"{server_url}/b"]
+    urls = [
+        json.loads(line)["original_url"] for line in checkpoint.read_text().splitlines()
+    ]
+    assert urls == [f"{server_url}/a", f"{server_url}/b"]
+
+    with pytest.raises(SystemExit) as exc_info:
+        main(args + ["-o", str(tmp_path / "results.jsonl")])
+    assert exc_info.value.code == 2
@@ -168,3 +168,35 @@ async def test_stream(async_mock_client):
     client.client.stream.assert_called_once_with(
         "GET", "https://example.com", headers=None, content=None
     )
+
+
+@pytest.mark.asyncio
+async def test_pool_options(async_mock_client):
+    """
+    Test that the timeout, HTTP/2 and connection pool limits are configurable.
+    """
+    c = AsyncClient(
+        timeout=3,
+        http2=False,
+        max_connections=500,
+        max_keepalive_connections=50,
+        keepalive_expiry=30,
+    )
+    await c.open()
+
+    called_args, called_kwargs = async_mock_client.call_args
+    assert called_kwargs["timeout"] == 3
+    assert called_kwargs["http2"] is False
+    assert c.transport._pool._max_connections == 500
+    assert c.transport._pool._max_keepalive_connections == 50
+    assert c.transport._pool._keepalive_expiry == 30
+    assert c.transport._pool._http2 is False
+
+    assert c.pool_stats() == {
+        "open": 0,
+        "idle": 0,
+        "in_use": 0,
+        "http2": 0,
+        "waiting": 0,
+    }
+    await c.close()
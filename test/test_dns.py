@@ -0,0 +1,135 @@
+import asyncio
+import socket
+import time
+
+import httpcore
+import httpx
+import pytest
+
+from reachable import is_reachable_async
+from reachable.client import AsyncClient
+from reachable.dns import DNSResolver, ResolvingBackend
+from reachable.proxy import ProxyPool
+
+
+class FakeResolver(DNSResolver):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.lookups = []
+
+    async def _getaddrinfo(self, host):
+        self.lookups.append(host)
+        await asyncio.sleep(0.01)
+        if host.startswith("dead."):
+            raise socket.gaierror(socket.EAI_NONAME, "Name or service not known")
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", ("10.0.0.1", 0))]
+
+
+@pytest.mark.asyncio
+async def test_resolve_is_cached():
+    """
+    Test that a host is only looked up once, even with concurrent calls.
+    """
+    resolver = FakeResolver()
+    results = await asyncio.gather(*[resolver.resolve("example.com") for _ in range(5)])
+
+    assert results == [["10.0.0.1"]] * 5
+    assert await resolver.resolve("EXAMPLE.com") == ["10.0.0.1"]
+    assert resolver.lookups == ["example.com"]
+
+
+@pytest.mark.asyncio
+async def test_resolve_not_found():
+    resolver = FakeResolver()
+    assert await resolver.resolve("dead.example.com") is None
+    # Negative results are cached too
+    assert await resolver.resolve("dead.example.com") is None
+    assert len(resolver.lookups) == 1
+    # IP addresses are not looked up
+    assert await resolver.resolve("127.0.0.1") == ["127.0.0.1"]
+
+
+@pytest.mark.asyncio
+async def test_dead_domain_short_circuit():
+    """
+    Test that URLs whose domain doesn't exist get a DNSError without any request.
+    """
+    requested = []
+
+    async def handler(request):
+        requested.append(request.url.host)
+        return httpx.Response(200)
+
+    client = AsyncClient()
+    client.transport = httpx.MockTransport(handler)
+    resolver = FakeResolver()
+
+    async with client:
+        results = await is_reachable_async(
+            ["https://alive.example.com", "https://dead.example.com"],
+            client=client,
+            sleep_between_requests=False,
+            resolver=resolver,
+        )
+
+    results = {r["original_url"]: r for r in results}
+    assert results["https://dead.example.com"]["error_name"] == "DNSError"
+    assert results["https://alive.example.com"]["success"] is True
+    assert requested == ["alive.example.com"]
+
+
+@pytest.mark.asyncio
+async def test_resolving_backend_uses_resolved_address():
+    connected = []
+
+    class Backend:
+        async def connect_tcp(self, host, port, **kwargs):
+            connected.append((host, port))
+            return "stream"
+
+    backend = ResolvingBackend(Backend(), FakeResolver())
+    assert await backend.connect_tcp("example.com", 443) == "stream"
+    assert connected == [("10.0.0.1", 443)]
+
+
+@pytest.mark.asyncio
+async def test_resolving_backend_splits_timeout():
+    """
+    Test that a host with several addresses doesn't wait the full timeout for
+    each of them.
+    """
+    timeouts = []
+
+    class Resolver(FakeResolver):
+        async def _getaddrinfo(self, host):
+            return [
+                (socket.AF_INET, socket.SOCK_STREAM, 6, "", (f"10.0.0.{i}", 0))
+                for i in range(1, 4)
+            ]
+
+    class Backend:
+        async def connect_tcp(self, host, port, timeout=None, **kwargs):
+            timeouts.append(timeout)
+            if host != "10.0.0.3":
+                # Unreachable address, waiting until the timeout
+                await asyncio.sleep(timeout)
+                raise httpcore.ConnectTimeout("timed out")
+            return "stream"
+
+    backend = ResolvingBackend(Backend(), Resolver())
+    start = time.monotonic()
+    assert await backend.connect_tcp("example.com", 443, timeout=0.3) == "stream"
+    assert time.monotonic() - start < 0.3
+    assert timeouts[0] == pytest.approx(0.1, abs=0.01)
+
+
+def test_resolver_with_proxy_pool():
+    """
+    Test that the resolver is installed on the transport of each proxy.
+    """
+    client = AsyncClient(
+        resolver=DNSResolver(),
+        proxy_pool=ProxyPool(["http://proxy1:8080", "http://proxy2:8080"]),
+    )
+    for transport in client.transport.transports.values():
+        assert isinstance(transport._pool._network_backend, ResolvingBackend)
@@ -0,0 +1,89 @@
+import httpx
+import pytest
+
+from reachable import is_reachable_async
+from reachable.client import AsyncClient
+from reachable.hybrid_client import HybridClient
+
+
+class _FakeBrowser:
+    _type = "browser"
+
+    def __init__(self):
+        self.requested = []
+
+    async def get(self, url, ssl_fallback_to_http=False):
+        self.requested.append(url)
+        return httpx.Response(200, request=httpx.Request("GET", url))
+
+
+def _hybrid_client(handler, browser):
+    http_client = AsyncClient()
+    http_client.transport = httpx.MockTransport(handler)
+    return HybridClient(http_client=http_client, browser_client=browser)
+
+
+@pytest.mark.asyncio
+async def test_escalates_only_when_needed():
+    """
+    Test that only blocked URLs are checked again with the browser.
+    """
+
+    async def handler(request):
+        if request.url.host == "blocked.example.com":
+            return httpx.Response(403)
+        elif request.url.host == "cloudflare.example.com":
+            return httpx.Response(200, headers={"cf-ray": "abc"})
+        return httpx.Response(200)
+
+    browser = _FakeBrowser()
+    async with _hybrid_client(handler, browser) as client:
+        results = await is_reachable_async(
+            [
+                "https://ok.example.com",
+                "https://blocked.example.com",
+                "https://cloudflare.example.com",
+            ],
+            client=client,
+            sleep_between_requests=False,
+        )
+
+    tiers = {r["original_url"]: r["tier"] for r in results}
+    assert tiers == {
+        "https://ok.example.com": "http",
+        "https://blocked.example.com": "browser",
+        "https://cloudflare.example.com": "browser",
+    }
+    assert sorted(browser.requested) == [
+        "https://blocked.example.com",
+        "https://cloudflare.example.com",
+    ]
+    assert all(r["success"] is True for r in results)
+
+
+@pytest.mark.asyncio
+async def test_read_error_escalates():
+    """
+    Test that a connection dropped by the server is retried with the browser,
+    while other network errors are not.
+    """
+
+    async def handler(request):
+        if request.url.host == "dropped.example.com":
+            raise httpx.ReadError("Connection reset by peer")
+        raise httpx.ConnectError("Name or service not known")
+
+    browser = _FakeBrowser()
+    async with _hybrid_client(handler, browser) as client:
+        dropped = await is_reachable_async(
+            "https://dropped.example.com", client=client, sleep_between_requests=False
+        )
+        unknown = await is_reachable_async(
+            "https://unknown.example.com", client=client, sleep_between_requests=False
+        )
+
+    assert dropped["tier"] == "browser"
+    assert dropped["success"] is True
+    assert unknown["tier"] == "http"
+    assert unknown["error_name"] == "ConnectionError"
+    assert browser.requested == ["https://dropped.example.com"]
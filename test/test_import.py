@@ -0,0 +1,25 @@
+import subprocess
+import sys
+
+
+def test_import_is_lazy():
+    """
+    Test that `import reachable` doesn't load heavy dependencies.
+    """
+    code = (
+        "import sys, reachable; "
+        "print([m for m in ('httpx', 'tldextract', 'tqdm', 'fake_useragent') "
+        "if m in sys.modules])"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], check=True, capture_output=True, text=True
+    ).stdout
+    assert output.strip() == "[]"
+
+
+def test_lazy_attributes():
+    import reachable
+    from reachable.main import is_reachable
+
+    assert reachable.is_reachable is is_reachable
+    assert "aiter_reachable" in dir(reachable)
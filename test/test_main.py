@@ -0,0 +1,167 @@
+import ssl
+
+import httpx
+import pytest
+
+from reachable import is_reachable, is_reachable_async, iter_reachable
+from reachable.cache import RedirectCache
+from reachable.client import AsyncClient, Client
+
+
+BODY = b"<script>document.addEventListener('DOMContentLoaded', () => {location.href = '/'})</script>"
+
+
+def _handler(request):
+    if request.method == "HEAD":
+        return httpx.Response(405)
+    return httpx.Response(200, content=BODY + b"x" * 1_000_000)
+
+
+def test_max_body_size():
+    """
+    Test that the GET fallback only keeps the first `max_body_size` bytes and still
+    detects the JS redirect.
+    """
+    client = Client()
+    client.client = httpx.Client(transport=httpx.MockTransport(_handler))
+
+    result = is_reachable(
+        "https://example.com",
+        client=client,
+        sleep_between_requests=False,
+        include_response=True,
+        max_body_size=1024,
+    )
+    client.close()
+
+    assert result["success"] is True
+    assert result["has_js_redirect"] is True
+    assert len(result["response"].content) == 1024
+
+
+@pytest.mark.asyncio
+async def test_max_body_size_async():
+    client = AsyncClient()
+    client.transport = httpx.MockTransport(_handler)
+
+    async with client:
+        result = await is_reachable_async(
+            "https://example.com",
+            client=client,
+            sleep_between_requests=False,
+            include_response=True,
+            max_body_size=1024,
+        )
+
+    assert result["success"] is True
+    assert result["has_js_redirect"] is True
+    assert len(result["response"].content) == 1024
+
+
+def _ssl_handler(request):
+    if request.url.scheme == "https":
+        raise ssl.SSLError("wrong version number")
+    return httpx.Response(200)
+
+
+def test_max_body_size_ssl_fallback():
+    """
+    Test that the capped GET still falls back to HTTP on SSL errors.
+    """
+    client = Client(ssl_fallback_to_http=True)
+    client.client = httpx.Client(transport=httpx.MockTransport(_ssl_handler))
+
+    result = is_reachable(
+        "https://example.com",
+        client=client,
+        sleep_between_requests=False,
+        head_optim=False,
+        max_body_size=1024,
+    )
+    client.close()
+
+    assert result["success"] is True
+    assert result["status_code"] == 200
+
+
+@pytest.mark.asyncio
+async def test_max_body_size_ssl_fallback_async():
+    client = AsyncClient(ssl_fallback_to_http=True)
+    client.transport = httpx.MockTransport(_ssl_handler)
+
+    async with client:
+        result = await is_reachable_async(
+            "https://example.com",
+            client=client,
+            sleep_between_requests=False,
+            head_optim=False,
+            max_body_size=1024,
+        )
+
+    assert result["success"] is True
+    assert result["status_code"] == 200
+
+
+def test_redirect_cache():
+    """
+    Test that a permanent redirect seen earlier in the batch is not requested again.
+    """
+    redirects = {
+        "http://a.com/": (301, "https://a.com/"),
+        "https://a.com/": (308, "https://www.a.com/"),
+        "https://www.a.com/": (302, "https://www.a.com/home"),
+    }
+    requested = []
+
+    def handler(request):
+        requested.append(str(request.url))
+        if str(request.url) in redirects:
+            status_code, location = redirects[str(request.url)]
+            return httpx.Response(status_code, headers={"location": location})
+        return httpx.Response(200)
+
+    client = Client()
+    client.client = httpx.Client(transport=httpx.MockTransport(handler))
+
+    results = list(
+        iter_reachable(
+            ["http://a.com/", "https://a.com/"],
+            client=client,
+            sleep_between_requests=False,
+        )
+    )
+    client.close()
+
+    assert results[0]["redirect"]["chain"] == [
+        "https://a.com/",
+        "https://www.a.com/",
+        "https://www.a.com/home",
+    ]
+    assert results[1]["redirect"]["chain"] == [
+        "https://www.a.com/",
+        "https://www.a.com/home",
+    ]
+    assert results[1]["final_url"] == "https://www.a.com/home"
+    # The temporary redirect (302) is requested for both URLs
+    assert requested == [
+        "http://a.com/",
+        "https://a.com/",
+        "https://www.a.com/",
+        "https://www.a.com/home",
+        "https://www.a.com/",
+        "https://www.a.com/home",
+    ]
+
+
+def test_redirect_cache_persistent(tmp_path):
+    path = str(tmp_path / "redirects.sqlite")
+    redirect_cache = RedirectCache(path)
+    redirect_cache.add("http://a.com/", 301, "https://a.com/")
+    redirect_cache.add("http://b.com/", 302, "https://b.com/")
+    redirect_cache.close()
+
+    redirect_cache = RedirectCache(path)
+    assert redirect_cache.get("http://a.com/") == "https://a.com/"
+    assert redirect_cache.get("http://b.com/") is None
+    assert len(redirect_cache) == 1
+    redirect_cache.close()
@@ -60,7 +60,7 @@ async def _wrapper(urls):
 
         await tasks.join()
 
-    return tasks._results
+    return tasks.results
 
 
 def test_pool():
@@ -0,0 +1,411 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+
+pytest.importorskip("playwright.async_api")
+
+from playwright.async_api import Error, TimeoutError  # noqa: E402
+
+from reachable.playwright_client import AsyncPlaywrightClient  # noqa: E402
+from reachable.proxy import ProxyPool  # noqa: E402
+
+
+class _FakeResponse:
+    def __init__(self, url, status=200):
+        self.url = url
+        self.status = status
+        self.headers = {"content-type": "text/html"}
+
+
+class _FakePage:
+    def __init__(self):
+        self.url = "about:blank"
+        self.visited = []
+        self.broken = False
+        # Never reaching "networkidle", like a page polling forever
+        self.busy = False
+        self.load_states = []
+        # Chromium error raised by the next navigation to a page
+        self.error = None
+
+    def on(self, event, handler):
+        pass
+
+    async def goto(self, url, **kwargs):
+        if self.broken:
+            raise Exception("Target page, context or browser has been closed")
+        if self.error is not None and url != "about:blank":
+            raise Error(self.error)
+        self.visited.append(url)
+        self.url = url
+        return _FakeResponse(url)
+
+    async def wait_for_load_state(self, state, timeout=None):
+        self.load_states.append((state, timeout))
+        if self.busy:
+            raise TimeoutError(f"Timeout {timeout}ms exceeded.")
+
+    async def content(self):
+        return "<html></html>"
+
+
+class _FakeContext:
+    def __init__(self, proxy=None):
+        self.proxy = proxy
+        self.page = _FakePage()
+        self.routes = []
+        self.cookies_cleared = 0
+        self.closed = False
+
+    async def route(self, url, handler):
+        self.routes.append((url, handler))
+
+    async def new_page(self):
+        return self.page
+
+    async def clear_cookies(self):
+        self.cookies_cleared += 1
+
+    async def close(self):
+        self.closed = True
+
+
+class _FakeRoute:
+    def __init__(self):
+        self.action = None
+
+    async def continue_(self):
+        self.action = "continue"
+
+    async def abort(self, error_code=None):
+        self.action = error_code
+
+
+class _FakeRequest:
+    def __init__(self, url, navigation=False):
+        self.url = url
+        self.navigation = navigation
+
+    def is_navigation_request(self):
+        return self.navigation
+
+
+class _FakeBrowser:
+    def __init__(self):
+        self.contexts = []
+        self.crashed = False
+
+    async def new_context(self, proxy=None):
+        if self.crashed:
+            raise Exception("Browser has been closed")
+        context = _FakeContext(proxy)
+        self.contexts.append(context)
+        return context
+
+
+async def _open(client):
+    # Same as `open()` with a fake browser instead of launching Chromium
+    client.browser = _FakeBrowser()
+    client._pages = asyncio.Queue()
+    client._pooled_pages = list(
+        await asyncio.gather(*[client._new_page() for _ in range(client.pool_size)])
+    )
+    for pooled_page in client._pooled_pages:
+        client._pages.put_nowait(pooled_page)
+    return client
+
+
+@pytest.mark.asyncio
+async def test_release_resets_page():
+    """
+    Test that a released page is emptied and given to the next request.
+    """
+    client = await _open(AsyncPlaywrightClient(pool_size=1, block_mode="none"))
+    pooled_page = await client._acquire_page()
+    await pooled_page.page.goto("https://example.com")
+    pooled_page.response = object()
+
+    await client._release_page(pooled_page)
+
+    assert await client._acquire_page() is pooled_page
+    assert pooled_page.page.visited[-1] == "about:blank"
+    assert pooled_page.context.cookies_cleared == 1
+    assert pooled_page.response is None
+
+
+@pytest.mark.asyncio
+async def test_release_replaces_broken_page():
+    """
+    Test that a page which can't be reset is closed and replaced by a new one.
+    """
+    client = await _open(AsyncPlaywrightClient(pool_size=2, block_mode="none"))
+    broken = await client._acquire_page()
+    broken.page.broken = True
+
+    await client._release_page(broken)
+
+    assert broken.context.closed is True
+    assert broken not in client._pooled_pages
+    assert len(client._pooled_pages) == 2
+    assert len(client.browser.contexts) == 3
+    replacement = client._pooled_pages[-1]
+    assert replacement.context is client.browser.contexts[-1]
+    assert [await client._acquire_page() for _ in range(2)][-1] is replacement
+
+
+@pytest.mark.asyncio
+async def test_release_keeps_slot_when_replacement_fails():
+    """
+    Test that the pool doesn't shrink when a broken page can't be replaced, and
+    that the page is replaced once the browser works again.
+    """
+    client = await _open(AsyncPlaywrightClient(pool_size=1, block_mode="none"))
+    broken = await client._acquire_page()
+    broken.page.broken = True
+    client.browser.crashed = True
+
+    await client._release_page(broken)
+
+    assert client._pooled_pages == [broken]
+    assert await asyncio.wait_for(client._acquire_page(), 1) is broken
+
+    client.browser.crashed = False
+    await client._release_page(broken)
+
+    replacement = await asyncio.wait_for(client._acquire_page(), 1)
+    assert replacement is not broken
+    assert client._pooled_pages == [replacement]
+
+
+@pytest.mark.asyncio
+async def test_acquire_waits_for_free_page():
+    """
+    Test that a request waits for a page when all of them are in use.
+    """
+    client = await _open(AsyncPlaywrightClient(pool_size=1, block_mode="none"))
+    pooled_page = await client._acquire_page()
+
+    waiting = asyncio.ensure_future(client._acquire_page())
+    await asyncio.sleep(0.01)
+    assert not waiting.done()
+
+    await client._release_page(pooled_page)
+    assert await asyncio.wait_for(waiting, 1) is pooled_page
+
+
+@pytest.mark.asyncio
+async def test_acquire_before_open():
+    """
+    Test that using the client before opening it gives a clear error.
+    """
+    with pytest.raises(RuntimeError):
+        await AsyncPlaywrightClient()._acquire_page()
+
+
+@pytest.mark.asyncio
+async def test_networkidle_timeout():
+    """
+    Test that a page never idle counts as loaded once `networkidle_timeout`
+    expires, and still fails without it.
+    """
+    client = await _open(
+        AsyncPlaywrightClient(pool_size=1, block_mode="none", networkidle_timeout=500)
+    )
+    pooled_page = await client._acquire_page()
+    pooled_page.page.busy = True
+
+    assert await client._navigate(pooled_page, "https://example.com") == "<html></html>"
+    assert pooled_page.page.load_states == [("networkidle", 500)]
+
+    client.networkidle_timeout = None
+    with pytest.raises(TimeoutError):
+        await client._navigate(pooled_page, "https://example.com")
+
+
+@pytest.mark.asyncio
+async def test_navigate_uses_goto_response():
+    """
+    Test that the response returned by goto() is used when the response
+    handler didn't record one, and that the content can be skipped.
+    """
+    client = await _open(
+        AsyncPlaywrightClient(
+            pool_size=1, block_mode="none", wait_until="commit", fetch_content=False
+        )
+    )
+    pooled_page = await client._acquire_page()
+
+    assert await client._navigate(pooled_page, "https://example.com") == ""
+    assert pooled_page.response.url == "https://example.com"
+    assert pooled_page.page.load_states == []
+
+    # A response recorded by the handler is kept
+    recorded = _FakeResponse("https://example.com", status=301)
+    pooled_page.response = recorded
+    await client._navigate(pooled_page, "https://example.com")
+    assert pooled_page.response is recorded
+
+
+async def _route_request(context, url, navigation=False):
+    # What the driver would do: the handler of the first matching route is
+    # called, other requests are not intercepted
+    for pattern, handler in context.routes:
+        if pattern.search(url):
+            route = _FakeRoute()
+            await handler(route, _FakeRequest(url, navigation))
+            return route.action
+    return None
+
+
+@pytest.mark.asyncio
+async def test_blocked_urls():
+    """
+    Test that only requests matching the blocked patterns are intercepted and
+    aborted.
+    """
+    client = await _open(AsyncPlaywrightClient(pool_size=1))
+    context = client.browser.contexts[0]
+    assert len(context.routes) == 1
+
+    for url in [
+        "https://example.com/style.css?v=3",
+        "https://example.com/fonts/font.woff2",
+        "https://example.com/intro.mp4",
+    ]:
+        assert await _route_request(context, url) == "blockedbyclient"
+
+    # Images and blocked hosts are left to Chromium, see test_launch_args
+    for url in [
+        "https://example.com/",
+        "https://example.com/app.js",
+        "https://example.com/logo.png",
+        "https://static.hotjar.com/c/hotjar.js",
+    ]:
+        assert await _route_request(context, url) is None
+
+
+@pytest.mark.asyncio
+async def test_launch_args():
+    """
+    Test that images and blocked hosts are blocked by Chromium switches, and
+    only with the "url" mode.
+    """
+    launched = []
+
+    class Chromium:
+        async def launch(self, **kwargs):
+            launched.append(kwargs["args"])
+            return _FakeBrowser()
+
+    class Manager:
+        async def __aenter__(self):
+            return type("Playwright", (), {"chromium": Chromium()})()
+
+    for block_mode in ("url", "route"):
+        client = AsyncPlaywrightClient(
+            pool_size=1,
+            block_mode=block_mode,
+            blocked_hosts=["static.hotjar.com", "fonts.gstatic.com"],
+        )
+        client.playwright_manager = Manager()
+        await client.open()
+
+    assert launched == [
+        [
+            "--blink-settings=imagesEnabled=false",
+            "--host-resolver-rules=MAP static.hotjar.com ~NOTFOUND, "
+            "MAP fonts.gstatic.com ~NOTFOUND",
+        ],
+        [],
+    ]
+
+
+@pytest.mark.asyncio
+async def test_navigation_never_blocked():
+    """
+    Test that a URL matching a blocked pattern can still be checked.
+    """
+    client = await _open(AsyncPlaywrightClient(pool_size=1))
+    context = client.browser.contexts[0]
+
+    for url in ["https://example.com/style.css", "https://example.com/favicon.ico"]:
+        assert await _route_request(context, url, navigation=True) == "continue"
+
+
+@pytest.mark.asyncio
+async def test_block_modes():
+    """
+    Test that "route" intercepts every request and "none" doesn't register
+    any route.
+    """
+    client = await _open(AsyncPlaywrightClient(pool_size=1, block_mode="route"))
+    assert [url for url, _ in client.browser.contexts[0].routes] == ["**/*"]
+
+    client = await _open(AsyncPlaywrightClient(pool_size=1, block_mode="none"))
+    assert client.browser.contexts[0].routes == []
+
+    with pytest.raises(ValueError):
+        AsyncPlaywrightClient(block_mode="cdp")
+
+
+@pytest.mark.asyncio
+async def test_contexts_spread_over_proxies():
+    """
+    Test that the contexts opened together get different proxies and that a
+    context whose proxy is ejected moves to another one.
+    """
+    pool = ProxyPool(["http://proxy1:8080", "http://proxy2:8080"])
+    client = await _open(
+        AsyncPlaywrightClient(pool_size=4, block_mode="none", proxy_pool=pool)
+    )
+    servers = [context.proxy["server"] for context in client.browser.contexts]
+    assert sorted(servers) == ["http://proxy1:8080"] * 2 + ["http://proxy2:8080"] * 2
+
+    pool.proxies[0].ejected_until = time.monotonic() + 60
+    pooled_page = next(
+        p for p in client._pooled_pages if p.proxy.url == "http://proxy1:8080"
+    )
+    await client._release_page(pooled_page)
+
+    assert pooled_page.context.closed is True
+    assert client._pooled_pages[-1].proxy.url == "http://proxy2:8080"
+    assert client._contexts_per_proxy == {
+        "http://proxy1:8080": 1,
+        "http://proxy2:8080": 3,
+    }
+
+
+@pytest.mark.asyncio
+async def test_only_proxy_errors_eject_proxy():
+    """
+    Test that a target the browser can't reach through a proxy doesn't count
+    against the proxy, while Chromium's proxy errors do.
+    """
+    pool = ProxyPool(["http://proxy1:8080"], max_failures=2)
+    client = await _open(
+        AsyncPlaywrightClient(pool_size=1, block_mode="none", proxy_pool=pool)
+    )
+    proxy = pool.proxies[0]
+
+    for error, expected in [
+        ("net::ERR_NAME_NOT_RESOLVED at https://dead.example.com", httpx.ConnectError),
+        ("net::ERR_CONNECTION_REFUSED at https://dead.example.com", httpx.ConnectError),
+        (
+            "net::ERR_TUNNEL_CONNECTION_FAILED at https://dead.example.com",
+            httpx.ProxyError,
+        ),
+    ]:
+        for _ in range(2):
+            client._pooled_pages[0].page.error = error
+            with pytest.raises(expected):
+                await client.request("https://dead.example.com")
+    assert proxy.is_available(time.monotonic()) is True
+
+    for _ in range(2):
+        client._pooled_pages[0].page.error = "net::ERR_PROXY_CONNECTION_FAILED at x"
+        with pytest.raises(httpx.ProxyError):
+            await client.request("https://example.com")
+    assert proxy.is_available(time.monotonic()) is False
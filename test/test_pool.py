@@ -0,0 +1,315 @@
+import asyncio
+import functools
+import random
+
+import httpx
+import pytest
+
+from reachable.main import get_transient_error, is_timeout
+from reachable.pool import AIMDLimiter, TaskPool
+from reachable.scheduler import HostScheduler
+
+
+async def _job(value):
+    await asyncio.sleep(random.random() / 100)
+    return value
+
+
+@pytest.mark.asyncio
+async def test_results_in_submission_order():
+    """
+    Test that results are ordered by submission, not by completion.
+    """
+    pool = TaskPool(workers=5, use_tqdm=False)
+    for i in range(30):
+        assert await pool.put(_job(i)) == i
+    await pool.join()
+
+    assert pool.results == list(range(30))
+
+
+@pytest.mark.asyncio
+async def test_workers_bound_concurrency():
+    """
+    Test that no more than `workers` tasks run at the same time and that `put()`
+    waits once the queue is full.
+    """
+    in_flight = 0
+    max_in_flight = 0
+
+    async def job():
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+
+    pool = TaskPool(workers=3, use_tqdm=False, queue_size=2)
+    for _ in range(20):
+        await pool.put(job())
+        assert pool._queue.qsize() <= 2
+    await pool.join()
+
+    assert max_in_flight == 3
+
+
+@pytest.mark.asyncio
+async def test_on_result_callback():
+    """
+    Test that `on_result` receives the key of each task and results are not kept.
+    """
+    received = {}
+
+    async def on_result(key, result):
+        received[key] = result
+
+    async with TaskPool(workers=4, use_tqdm=False, on_result=on_result) as pool:
+        for i in range(10):
+            await pool.put(_job(i * 2), key=f"url{i}")
+
+    assert received == {f"url{i}": i * 2 for i in range(10)}
+    assert pool.results == []
+
+
+@pytest.mark.asyncio
+async def test_failed_task_keeps_its_slot():
+    """
+    Test that a failing task doesn't stop the workers and that its error takes
+    its place in the results, so results still match submissions.
+    """
+
+    async def fail():
+        raise ValueError("boom")
+
+    pool = TaskPool(workers=2, use_tqdm=False)
+    await pool.put(_job(1))
+    await pool.put(fail())
+    await pool.put(_job(3))
+    await pool.join()
+
+    assert pool.results[0] == 1
+    assert pool.results[1]["error_name"] == "ValueError"
+    assert isinstance(pool.results[1]["error"], ValueError)
+    assert pool.results[2] == 3
+
+    received = {}
+    pool = TaskPool(
+        workers=2,
+        use_tqdm=False,
+        on_result=lambda key, res: received.__setitem__(key, res),
+    )
+    await pool.put(fail(), key="a")
+    await pool.join()
+    assert received["a"]["error_name"] == "ValueError"
+
+
+@pytest.mark.asyncio
+async def test_transient_failures_are_retried_last():
+    """
+    Test that transient failures are retried after the other tasks, and that the
+    retries are recorded in the result.
+    """
+    attempts = {}
+    completed = []
+    received = {}
+
+    async def check(url):
+        attempts[url] = attempts.get(url, 0) + 1
+        error_name = None
+        if url == "flaky" and attempts[url] < 3:
+            error_name = "ReadTimeout"
+        return {"original_url": url, "error_name": error_name}
+
+    def on_result(key, result):
+        completed.append(key)
+        received[key] = result
+
+    pool = TaskPool(
+        workers=2,
+        use_tqdm=False,
+        on_result=on_result,
+        retry_on=get_transient_error,
+        backoff=0.01,
+    )
+    for url in ["flaky", "a", "b", "c"]:
+        await pool.put(functools.partial(check, url), key=url)
+    await pool.join()
+
+    assert completed == ["a", "b", "c", "flaky"]
+    assert attempts["flaky"] == 3
+    assert received["flaky"]["error_name"] is None
+    assert received["flaky"]["retries"] == 2
+    assert received["flaky"]["retry_history"] == ["ReadTimeout", "ReadTimeout"]
+    assert received["a"]["retries"] == 0
+
+
+@pytest.mark.asyncio
+async def test_raised_exceptions_are_retried():
+    """
+    Test that exceptions go through `retry_on` too and that the last one is
+    kept with the history of the attempts.
+    """
+    attempts = {"flaky": 0, "dead": 0}
+
+    async def check(url):
+        attempts[url] += 1
+        if url == "dead" or attempts[url] < 2:
+            raise httpx.ReadTimeout("timed out")
+        return {"original_url": url, "error_name": None}
+
+    pool = TaskPool(
+        workers=2,
+        use_tqdm=False,
+        retry_on=get_transient_error,
+        max_retries=1,
+        backoff=0.01,
+    )
+    await pool.put(functools.partial(check, "flaky"))
+    await pool.put(functools.partial(check, "dead"))
+    await pool.join()
+
+    flaky, dead = pool.results
+    assert flaky["error_name"] is None
+    assert flaky["retry_history"] == ["ReadTimeout"]
+    assert attempts["dead"] == 2
+    assert isinstance(dead["error"], httpx.ReadTimeout)
+    assert dead["retries"] == 1
+    assert dead["retry_history"] == ["ReadTimeout", "ReadTimeout"]
+
+
+@pytest.mark.asyncio
+async def test_retry_budget():
+    """
+    Test that the retry budget bounds the number of retries of the whole pool.
+    """
+    calls = 0
+
+    async def check():
+        nonlocal calls
+        calls += 1
+        return {"error_name": "RemoteProtocolError"}
+
+    pool = TaskPool(
+        workers=4,
+        use_tqdm=False,
+        retry_on=get_transient_error,
+        max_retries=5,
+        retry_budget=3,
+        backoff=0.01,
+    )
+    for _ in range(10):
+        await pool.put(check)
+    await pool.join()
+
+    assert calls == 13
+    assert len(pool.results) == 10
+    assert sum(r["retries"] for r in pool.results) == 3
+    assert all(r["error_name"] == "RemoteProtocolError" for r in pool.results)
+
+
+def test_aimd_limiter_adjusts_limit():
+    """
+    Test that the limit grows additively when healthy and is cut on failures or
+    latency spikes.
+    """
+    limiter = AIMDLimiter(initial=10, min_limit=2, max_limit=25, increase=10)
+    for _ in range(10):
+        limiter._record(0.1, False)
+    assert limiter.limit == 20
+
+    # Too many failures
+    for i in range(20):
+        limiter._record(0.1, i < 5)
+    assert limiter.limit == 10
+
+    # Latency far above the best one seen
+    for _ in range(10):
+        limiter._record(1, False)
+    assert limiter.limit == 5
+
+    # Bounded by max_limit and min_limit
+    for _ in range(10):
+        for _ in range(limiter.limit):
+            limiter._record(0.1, False)
+    assert limiter.limit == 25
+    for _ in range(10):
+        for _ in range(limiter.limit):
+            limiter._record(0.1, True)
+    assert limiter.limit == 2
+
+
+def test_aimd_limiter_rebaselines_latency():
+    """
+    Test that a lasting latency rise without failures only cuts the limit once.
+    """
+    limiter = AIMDLimiter(initial=10, max_limit=1000, increase=10)
+    for _ in range(10):
+        for _ in range(limiter.limit):
+            limiter._record(0.1, False)
+    assert limiter.limit == 110
+
+    for _ in range(10):
+        for _ in range(limiter.limit):
+            limiter._record(0.35, False)
+    assert limiter.limit == 55 + 9 * 10
+
+
+@pytest.mark.asyncio
+async def test_limiter_latency_excludes_scheduler_waits():
+    """
+    Test that the waits between requests to the same host are not taken for
+    latency by the limiter.
+    """
+    latencies = []
+
+    class SpyLimiter(AIMDLimiter):
+        async def release(self, latency, failed):
+            latencies.append(latency)
+            await super().release(latency, failed)
+
+    scheduler = HostScheduler(min_delay=0.2, max_delay=0.2)
+
+    async def check():
+        await scheduler.wait_async("https://a.com")
+
+    pool = TaskPool(workers=1, use_tqdm=False, limiter=SpyLimiter(max_limit=1))
+    for _ in range(3):
+        await pool.put(check())
+    await pool.join()
+
+    assert max(latencies) < 0.1
+
+
+@pytest.mark.asyncio
+async def test_pool_follows_limiter():
+    """
+    Test that the pool never runs more tasks than the current limit and that
+    timeouts reduce it.
+    """
+    in_flight = 0
+    max_in_flight = 0
+
+    async def check(i):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.001)
+        in_flight -= 1
+        return {"error_name": "ConnectTimeout" if i >= 100 else None}
+
+    limiter = AIMDLimiter(initial=4, max_limit=50, increase=4, failure_on=is_timeout)
+    pool = TaskPool(workers=10, use_tqdm=False, limiter=limiter)
+    for i in range(100):
+        await pool.put(check(i))
+        assert in_flight <= pool.limit
+    await asyncio.sleep(0.05)
+    grown = pool.limit
+    assert grown > 4
+
+    for i in range(100, 200):
+        await pool.put(check(i))
+    await pool.join()
+
+    assert pool.limit < grown
+    assert max_in_flight <= 50
+    assert len(pool.results) == 200
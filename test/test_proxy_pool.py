@@ -0,0 +1,124 @@
+import ssl
+import time
+
+import httpx
+import pytest
+
+from reachable import is_reachable_async
+from reachable.client import AsyncClient
+from reachable.proxy import ProxyPool
+
+
+PROXIES = ["http://proxy1:8080", "http://proxy2:8080"]
+
+
+def test_least_loaded():
+    """
+    Test that requests go to the proxy with the fewest requests in flight.
+    """
+    pool = ProxyPool(PROXIES)
+    first = pool.acquire()
+    second = pool.acquire()
+    assert first.url != second.url
+
+    pool.release(first, 0.1)
+    assert pool.acquire().url == first.url
+
+
+def test_latency_weighted():
+    """
+    Test that the latency strategy prefers the fastest proxy.
+    """
+    pool = ProxyPool(PROXIES, strategy="latency")
+    for url, latency in zip(PROXIES, (1.0, 0.1)):
+        proxy = next(p for p in pool.proxies if p.url == url)
+        pool.release(pool.acquire(proxy), latency)
+
+    assert pool.acquire().url == "http://proxy2:8080"
+    # Still preferred with a request in flight, being 10 times faster
+    assert pool.acquire().url == "http://proxy2:8080"
+
+
+def test_ejection_and_cooldown():
+    """
+    Test that a proxy failing repeatedly is ejected, then comes back.
+    """
+    pool = ProxyPool(PROXIES, max_failures=2, cooldown=0.05)
+    bad = pool.proxies[0]
+    for _ in range(2):
+        pool.release(pool.acquire(bad), 0, httpx.ConnectError("refused"))
+
+    assert [pool.acquire().url for _ in range(3)] == ["http://proxy2:8080"] * 3
+    assert pool.stats()[0]["available"] is False
+
+    time.sleep(0.06)
+    assert pool.stats()[0]["available"] is True
+    assert pool.select().url == "http://proxy1:8080"
+
+
+def _ssl_connect_error():
+    try:
+        try:
+            raise ssl.SSLError("certificate verify failed")
+        except ssl.SSLError as e:
+            raise httpx.ConnectError("certificate verify failed") from e
+    except httpx.ConnectError as e:
+        return e
+
+
+@pytest.mark.parametrize(
+    "error, ejected",
+    [
+        (httpx.ConnectError("Connection refused"), True),
+        (httpx.ConnectTimeout("timed out"), True),
+        (httpx.ProxyError("407 Proxy Authentication Required"), True),
+        # The target is down, the proxy answered
+        (httpx.ProxyError("502 Bad Gateway"), False),
+        (httpx.ProxyError("504 Gateway Timeout"), False),
+        # TLS with the target, through the tunnel
+        (_ssl_connect_error(), False),
+        (httpx.ReadTimeout("timed out"), False),
+    ],
+)
+def test_only_proxy_failures_eject(error, ejected):
+    """
+    Test that a proxy is only ejected for failures of the proxy itself, not for
+    targets that can't be reached through it.
+    """
+    pool = ProxyPool(PROXIES, max_failures=3)
+    proxy = pool.proxies[0]
+    for _ in range(3):
+        pool.release(pool.acquire(proxy), 0, error)
+
+    assert proxy.is_available(time.monotonic()) is not ejected
+
+
+@pytest.mark.asyncio
+async def test_result_records_proxy():
+    """
+    Test that each result tells which proxy served it and that a dead proxy
+    stops being used.
+    """
+
+    def handler(request):
+        return httpx.Response(200)
+
+    def dead_handler(request):
+        raise httpx.ConnectError("Connection refused")
+
+    pool = ProxyPool(PROXIES, max_failures=1)
+    client = AsyncClient(proxy_pool=pool)
+    client.transport.transports["http://proxy1:8080"] = httpx.MockTransport(
+        dead_handler
+    )
+    client.transport.transports["http://proxy2:8080"] = httpx.MockTransport(handler)
+
+    urls = [f"https://host{i}.example.com" for i in range(4)]
+    async with client:
+        results = await is_reachable_async(
+            urls, client=client, sleep_between_requests=False, concurrency=1
+        )
+
+    succeeded = [r for r in results if r["success"] is True]
+    assert len(succeeded) == 3
+    assert all(r["proxy"] == "http://proxy2:8080" for r in succeeded)
@@ -0,0 +1,113 @@
+import csv
+import sys
+
+import httpx
+import pytest
+
+from reachable import is_reachable_async
+from reachable.client import AsyncClient
+from reachable.result import ReachabilityResult, ResultCollector
+
+
+REDIRECTED = {
+    "original_url": "https://a.com",
+    "status_code": 200,
+    "success": True,
+    "error_name": None,
+    "cloudflare_protection": False,
+    "has_js_redirect": False,
+    "redirect": {
+        "chain": ["https://www.a.com/"],
+        "final_url": "https://www.a.com/",
+        "tld_match": True,
+    },
+    "final_url": "https://www.a.com/",
+}
+FAILED = {
+    "original_url": "https://b.com",
+    "status_code": -1,
+    "success": False,
+    "error_name": "ConnectError",
+    "cloudflare_protection": False,
+    "has_js_redirect": False,
+    "retries": 2,
+}
+
+
+def test_round_trip():
+    """
+    Test that a compact result gives back the same dict and reads like one.
+    """
+    result = ReachabilityResult.from_dict(REDIRECTED)
+    assert result.to_dict() == REDIRECTED
+    assert list(result.to_dict()) == list(REDIRECTED)
+    assert result == REDIRECTED
+    assert result["redirect"]["tld_match"] is True
+    assert result.success is True
+
+    assert "proxy" not in result
+    assert result.get("proxy") is None
+    with pytest.raises(KeyError):
+        result["proxy"]
+
+    result["custom"] = 1
+    assert result.to_dict() == {**REDIRECTED, "custom": 1}
+
+
+def test_smaller_than_dict():
+    """
+    Test that a compact result takes less memory than the dict.
+    """
+    result = ReachabilityResult.from_dict(REDIRECTED)
+    assert sys.getsizeof(result) < sys.getsizeof(REDIRECTED) + sys.getsizeof(
+        REDIRECTED["redirect"]
+    )
+
+
+@pytest.mark.asyncio
+async def test_is_reachable_async_compact():
+    """
+    Test that is_reachable_async gives compact results when asked.
+    """
+    client = AsyncClient()
+    client.transport = httpx.MockTransport(lambda request: httpx.Response(200))
+    urls = ["https://a.example.com", "https://b.example.com"]
+    async with client:
+        results = await is_reachable_async(
+            urls, client=client, sleep_between_requests=False, compact=True
+        )
+
+    assert all(isinstance(r, ReachabilityResult) for r in results)
+    assert sorted(r["original_url"] for r in results) == urls
+    assert all(r["success"] is True for r in results)
+
+
+def test_collector_csv(tmp_path):
+    """
+    Test that collected results are written as CSV, one column per field.
+    """
+    collector = ResultCollector([REDIRECTED, ReachabilityResult.from_dict(FAILED)])
+    assert len(collector) == 2
+
+    path = tmp_path / "results.csv"
+    collector.to_csv(str(path))
+    with open(path, newline="") as f:
+        rows = list(csv.DictReader(f))
+
+    assert rows[0]["redirect_chain"] == "https://www.a.com/"
+    assert rows[0]["tld_match"] == "True"
+    assert rows[1]["error_name"] == "ConnectError"
+    assert rows[1]["final_url"] == ""
+    assert rows[1]["retries"] == "2"
+
+
+def test_collector_arrow():
+    """
+    Test the Arrow export, when pyarrow is installed.
+    """
+    pytest.importorskip("pyarrow")
+
+    table = ResultCollector([REDIRECTED, FAILED]).to_arrow()
+    assert table.num_rows == 2
+    assert table.column("redirect_chain").to_pylist() == [["https://www.a.com/"], None]
+    assert table.column("success").to_pylist() == [True, False]
@@ -0,0 +1,70 @@
+import asyncio
+import time
+
+import pytest
+
+from reachable.scheduler import HostScheduler, get_host
+
+
+def test_first_request_is_not_delayed():
+    """
+    Test that the first request to a host can be sent right away.
+    """
+    scheduler = HostScheduler(min_delay=1, max_delay=2)
+    assert scheduler.reserve("https://example.com") == 0
+
+
+def test_same_host_is_delayed():
+    """
+    Test that consecutive requests to the same host are spread by the delay.
+    """
+    scheduler = HostScheduler(min_delay=1, max_delay=2)
+    scheduler.reserve("https://example.com/a")
+    delay = scheduler.reserve("https://example.com/b")
+    assert 1 - 0.1 <= delay <= 2
+
+    # The third request is queued after the second one
+    assert scheduler.reserve("https://example.com/c") >= delay + 1 - 0.1
+
+
+def test_distinct_hosts_are_not_delayed():
+    """
+    Test that requests to distinct hosts go out back-to-back.
+    """
+    scheduler = HostScheduler(min_delay=1, max_delay=2)
+    for i in range(10):
+        assert scheduler.reserve(f"https://host{i}.example.com") == 0
+
+
+def test_prune_is_amortized(monkeypatch):
+    """
+    Test that hosts with future slots don't make every reservation prune.
+    """
+    monkeypatch.setattr("reachable.scheduler.PRUNE_ABOVE", 10)
+    scheduler = HostScheduler(min_delay=60, max_delay=60)
+    prunes = []
+    prune = scheduler._prune
+    monkeypatch.setattr(scheduler, "_prune", lambda now: prunes.append(prune(now)))
+
+    for i in range(200):
+        scheduler.reserve(f"https://host{i}.example.com")
+        scheduler.reserve(f"https://host{i}.example.com")
+
+    assert len(scheduler._next_allowed) == 200
+    assert len(prunes) <= 5
+
+
+@pytest.mark.asyncio
+async def test_wait_async():
+    scheduler = HostScheduler(min_delay=0.1, max_delay=0.1)
+    start = time.monotonic()
+    await asyncio.gather(
+        *[scheduler.wait_async("https://example.com") for _ in range(3)]
+    )
+    assert time.monotonic() - start >= 0.2 - 0.01
+
+
+def test_get_host():
+    assert get_host("https://Example.com:443/path") == "example.com"
+    assert get_host("example.com/path") == "example.com"
+    assert get_host("/path") == ""
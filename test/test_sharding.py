@@ -0,0 +1,55 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from reachable.sharding import get_shard, run_sharded
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_get_shard_is_stable():
+    """
+    Test that URLs of the same host always go to the same shard.
+    """
+    assert get_shard("https://example.com/a", 8) == get_shard(
+        "http://EXAMPLE.com/b?c=d", 8
+    )
+    assert all(0 <= get_shard(f"https://host{i}.com", 4) < 4 for i in range(100))
+
+
+def test_run_sharded(server_url):
+    """
+    Test that every URL gets exactly one result when checked by several processes.
+    """
+    urls = [f"{server_url}/page{i}" for i in range(20)]
+    results = list(
+        run_sharded(
+            iter(urls),
+            processes=2,
+            concurrency_per_process=5,
+            queue_size=4,
+            sleep_between_requests=False,
+        )
+    )
+
+    assert sorted(r["original_url"] for r in results) == sorted(urls)
+    assert all(r["success"] is True for r in results)
@@ -0,0 +1,86 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from reachable import is_reachable, is_reachable_async
+from reachable.scheduler import HostScheduler
+from reachable.timing import summarize_timings
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_HEAD(self):
+        if self.path == "/old":
+            self.send_response(301)
+            self.send_header("Location", "/new")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.asyncio
+async def test_timings_per_request(server_url):
+    """
+    Test that each request of the redirect chain is timed, along with the wait
+    between the two requests to the same host.
+    """
+    result = await is_reachable_async(
+        f"{server_url}/old",
+        scheduler=HostScheduler(min_delay=0.5, max_delay=0.5),
+        timings=True,
+    )
+
+    assert result["success"] is True
+    timings = result["timings"]
+    assert [r["url"] for r in timings["requests"]] == [
+        f"{server_url}/old",
+        f"{server_url}/new",
+    ]
+    assert all(r["method"] == "HEAD" for r in timings["requests"])
+    assert timings["requests"][0]["connect"] > 0
+    # The connection is reused for the redirect
+    assert timings["requests"][1]["connect"] == 0
+    assert timings["ttfb"] > 0
+    assert timings["sleep"] > 0
+    assert timings["total"] >= timings["sleep"] + timings["ttfb"]
+
+
+def test_timings_sync_and_summary(server_url):
+    """
+    Test that the sync client is timed too and that a batch can be summarized.
+    """
+    results = is_reachable(
+        [f"{server_url}/a", f"{server_url}/b"],
+        sleep_between_requests=False,
+        timings=True,
+    )
+    assert all(len(r["timings"]["requests"]) == 1 for r in results)
+
+    summary = summarize_timings(results + [{"success": True}])
+    assert set(summary) == {"dns", "sleep", "connect", "tls", "ttfb", "total"}
+    assert summary["total"]["max"] >= summary["total"]["p50"] > 0
+    assert summary["tls"]["mean"] == 0
+
+
+def test_no_timings_by_default(server_url):
+    """
+    Test that timings are only collected when asked.
+    """
+    result = is_reachable(f"{server_url}/a", sleep_between_requests=False)
+    assert "timings" not in result
@@ -4,6 +4,7 @@ from tqdm.asyncio import tqdm
 
 from reachable import is_reachable, is_reachable_async
 from reachable.client import AsyncClient
+from reachable.url import canonicalize_url, dedupe_urls
 
 
 def test_serp():
@@ -16,7 +17,8 @@ def test_serp():
 def test_same_urls():
     result = is_reachable(["https://google.com", "https://google.com"])
     assert isinstance(result, list)
-    assert len(result) == 1
+    assert len(result) == 2
+    assert result[0] == result[1]
     assert result[0]["status_code"] == 200
 
 
@@ -24,10 +26,40 @@ def test_same_urls_async():
     urls = ["https://google.com", "https://google.com"]
     result = asyncio.run(is_reachable_async(urls))
     assert isinstance(result, list)
-    assert len(result) == 1
+    assert len(result) == 2
+    assert result[0] == result[1]
     assert result[0]["status_code"] == 200
 
 
+def test_canonicalize_url():
+    """
+    Test that trivially equivalent URLs have the same canonical form.
+    """
+    assert canonicalize_url(" HTTPS://Example.COM:443/Path/#top") == (
+        "https://example.com/Path"
+    )
+    assert canonicalize_url("http://example.com") == "http://example.com/"
+    assert canonicalize_url("http://example.com:8080/") == "http://example.com:8080/"
+    assert canonicalize_url("https://bücher.de/") == "https://xn--bcher-kva.de/"
+    assert canonicalize_url("https://user@[::1]:443/a?b=C") == (
+        "https://user@[::1]/a?b=C"
+    )
+    # Path and query are case sensitive
+    assert canonicalize_url("https://a.com/A?q=B") != canonicalize_url(
+        "https://a.com/a?q=b"
+    )
+
+
+def test_dedupe_urls():
+    """
+    Test that equivalent URLs are checked once, in order of first appearance.
+    """
+    urls = ["https://b.com", "https://A.com/", "https://b.com/#x", "https://a.com"]
+    unique, indexes = dedupe_urls(urls)
+    assert unique == ["https://b.com", "https://A.com/"]
+    assert indexes == [0, 1, 0, 1]
+
+
 def test_async():
     urls = ["https://google.com", "https://bing.com"]
 